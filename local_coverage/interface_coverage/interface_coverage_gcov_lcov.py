@@ -85,31 +85,15 @@ def load_json_data():
     return json_data_dic
 
 
-def get_file_list(find_path, postfix):
-    file_names = os.listdir(find_path)
-    file_list = []
-    if len(file_names) > 0:
-        for fn in file_names:
-            if fn.find(postfix) != -1 and fn[-len(postfix):] == postfix:
-                file_list.append(fn)
-    return file_list
-
-
 def get_file_list_by_postfix(path, postfix, filter_jar=""):
+    from local_coverage.utils import iter_file_endswith
     file_list = []
-    for dirs in os.walk(path):
-        files = get_file_list(find_path=dirs[0], postfix=postfix)
-        for file_path in files:
-            if "" == file_path or -1 != file_path.find(__file__):
-                continue
-
-            pos = file_path.rfind(os.sep)
-            file_name = file_path[pos + 1:]
-            file_path = os.path.join(dirs[0], file_path)
-            if filter_jar != "" and file_name == filter_jar:
-                print("Skipped %s" % file_path)
-                continue
-            file_list.append(file_path)
+    for file_path in iter_file_endswith(path, postfix):
+        file_name = os.path.basename(file_path)
+        if filter_jar != "" and file_name == filter_jar:
+            print("Skipped %s" % file_path)
+            continue
+        file_list.append(file_path)
     return file_list
 
 
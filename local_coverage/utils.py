@@ -137,15 +137,33 @@ def tree_find_file_endswith(path, suffix, file_list=None):
     :param file_list:
     :return:
     """
-    for f in os.listdir(path):
-        full_path = os.path.join(path, f)
-        if os.path.isfile(full_path) and full_path.endswith(suffix):
-            file_list.append(full_path)
-        if os.path.isdir(full_path):
-            tree_find_file_endswith(full_path, suffix, file_list)
+    if file_list is None:
+        file_list = []
+    file_list.extend(iter_file_endswith(path, suffix))
     return file_list
 
 
+def iter_file_endswith(path, suffix=""):
+    """
+    基于os.scandir遍历目录，逐个返回以指定字符串结尾的文件
+    :param path: 需要遍历的目录
+    :param suffix: 后缀
+    :return: 文件路径生成器
+    """
+    sub_dir_list = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    sub_dir_list.append(entry.path)
+                elif entry.name.endswith(suffix) and entry.is_file():
+                    yield entry.path
+    except OSError:
+        return
+    for sub_dir in sub_dir_list:
+        yield from iter_file_endswith(sub_dir, suffix)
+
+
 class FoundationServer:
     """
     foundation拆分的进程和其对应的so之间的对应关系
@@ -19,7 +19,7 @@
 import os
 import json
 from xdevice import platform_logger
-from core.utils import get_file_list_by_postfix
+from core.utils import iter_dir_file_list
 from core.utils import get_build_output_path
 from core.config.parse_parts_config import ParsePartsConfig
 
@@ -131,26 +131,27 @@ class SelectTargets(object):
         return target_list
 
     def _get_target_list_from_path(self, typelist, check_path):
+        return self._get_target_list_from_path_list(typelist, [check_path])
+
+    def _get_target_list_from_path_list(self, typelist, check_path_list):
         target_list = []
-        if os.path.exists(check_path):
-            # 获取部件编译输出目录（~/OpenHarmony/out/rk3568/module_list_files/部件名1）中.mlf文件列表
-            mlf_file_list = get_file_list_by_postfix(
-                check_path, ".mlf")
-            # 遍历mlf_file_list中所有目录下面mlf文件中的label列表
-            for filepath in mlf_file_list:
-                # 获取mlf文件中的JSON数据信息列表
-                mlf_info_list = self._get_mlf_data_from_file(filepath)
-                for data in mlf_info_list:
-                    # 举例："test_type": "moduletest"
-                    test_type = data.get("test_type")
-                    # 举例："label": "//base/accessibility/services/test:aams_accessibility_keyevent_filter_test
-                    # (//build/toolchain/ohos:ohos_clang_arm)"
-                    target_path = data.get("label")
-                    if "ALL" in typelist:
-                        target_list.append(target_path)
-                        continue
-                    if test_type in typelist:
-                        target_list.append(target_path)
+        check_path_list = [path for path in check_path_list
+                           if os.path.exists(path)]
+        # 并发遍历部件编译输出目录（~/OpenHarmony/out/rk3568/module_list_files/部件名1）中.mlf文件
+        for _, filepath in iter_dir_file_list(check_path_list, ".mlf"):
+            # 获取mlf文件中的JSON数据信息列表
+            mlf_info_list = self._get_mlf_data_from_file(filepath)
+            for data in mlf_info_list:
+                # 举例："test_type": "moduletest"
+                test_type = data.get("test_type")
+                # 举例："label": "//base/accessibility/services/test:aams_accessibility_keyevent_filter_test
+                # (//build/toolchain/ohos:ohos_clang_arm)"
+                target_path = data.get("label")
+                if "ALL" in typelist:
+                    target_list.append(target_path)
+                    continue
+                if test_type in typelist:
+                    target_list.append(target_path)
         return target_list
 
     def _get_target_list_by_type(self, productform, typelist):
@@ -159,24 +160,24 @@ class SelectTargets(object):
         # 或者{“部件名1”：[~/OpenHarmony/out/rk3568/module_list_files/部件名1，
         # ~/OpenHarmony/out/rk3568/编译目录build_out_dir/module_list_files/部件名1]}
         part_path_dic = self._get_part_path_data(productform)
+        check_path_list = []
         for item in part_path_dic:
             part_path_list = part_path_dic.get(item)
             for part_path in part_path_list:
                 print("part_path = %s" % part_path)
-                temp_list = self._get_target_list_from_path(typelist,
-                    part_path)
-                target_list.extend(temp_list)
+                check_path_list.append(part_path)
+        target_list.extend(self._get_target_list_from_path_list(
+            typelist, check_path_list))
         return target_list
 
     def _get_target_list_by_part(self, productform, typelist, partlist):
         target_list = []
         part_path_dic = self._get_part_path_data(productform)
+        check_path_list = []
         for partname in partlist:
-            part_path_list = part_path_dic.get(partname, [])
-            for part_path in part_path_list:
-                temp_list = self._get_target_list_from_path(typelist,
-                    part_path)
-                target_list.extend(temp_list)
+            check_path_list.extend(part_path_dic.get(partname, []))
+        target_list.extend(self._get_target_list_from_path_list(
+            typelist, check_path_list))
         return target_list
 
     def _get_target_list_by_module(self, productform, typelist, partlist,
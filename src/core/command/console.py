@@ -17,6 +17,7 @@
 #
 
 import argparse
+import os
 import sys
 import signal
 import platform
@@ -27,6 +28,7 @@ from xdevice import platform_logger
 from xdevice import EnvironmentManager
 from xdevice._core.utils import SplicingAction
 from core.command.run import Run
+from core.testcase.suite_catalog import SuiteCatalog
 from core.command.gen import Gen
 from core.command.display import display_help_info
 from core.command.display import display_show_info
@@ -281,6 +283,74 @@ class Console(object):
                                 default="",
                                 help="The console does not print operation hilog logs"
                                 )
+            parser.add_argument("--rebuild-index",
+                                action="store_true",
+                                dest="rebuild_index",
+                                default=False,
+                                help="Rebuild the test suite index before discovery"
+                                )
+            parser.add_argument("--stream",
+                                action="store_true",
+                                dest="stream",
+                                default=False,
+                                help="Start executing test suites while the rest are still being discovered"
+                                )
+            parser.add_argument("--bundle-push",
+                                action="store_true",
+                                dest="bundle_push",
+                                default=False,
+                                help="Push the test suite and its resources to the device in one archive"
+                                )
+            parser.add_argument("--lpt",
+                                action="store_true",
+                                dest="lpt",
+                                default=False,
+                                help="Run the longest test suites first, based on the recorded suite durations"
+                                )
+            parser.add_argument("--live-result",
+                                action="store_true",
+                                dest="live_result",
+                                default=False,
+                                help="Report gtest case results from the test output while the suite runs"
+                                )
+            parser.add_argument("--shell-session",
+                                action="store_true",
+                                dest="shell_session",
+                                default=False,
+                                help="Run short device shell commands through one persistent hdc shell per device"
+                                )
+            parser.add_argument("--pipeline",
+                                action="store_true",
+                                dest="pipeline",
+                                default=False,
+                                help="Push the next test suite and pull coverage data while a test suite runs"
+                                )
+            parser.add_argument("--adaptive-timeout",
+                                action="store_true",
+                                dest="adaptive_timeout",
+                                default=False,
+                                help="Use per suite timeouts learned from history and stop suites without output"
+                                )
+            parser.add_argument("--gtest-shard",
+                                action="store",
+                                type=int,
+                                dest="gtest_shard",
+                                default=0,
+                                help="Split gtest suites with a shard node in ohos_test.xml into this number of shards"
+                                )
+            parser.add_argument("--share-resource",
+                                action="store_true",
+                                dest="share_resource",
+                                default=False,
+                                help="Keep resources pushed by preparers on the device for following suites pushing the same"
+                                )
+            parser.add_argument("--batch-suites",
+                                action="store",
+                                type=int,
+                                dest="batch_suites",
+                                default=0,
+                                help="Run up to this number of short gtest suites on the device with one script"
+                                )
 
             # 解析部分命令行参数，会返回一个由两个条目构成的元组，其中包含带成员的命名空间（options）和剩余参数字符串的列表（unparsed）
             cls._params_pre_processing(para_list)
@@ -364,9 +434,26 @@ class Console(object):
             LOG.error("Wrong list command.")
         return
 
+    @classmethod
+    def _process_command_watch(cls, command, para_list, productform):
+        if command != ToolCommandType.TOOLCMD_KEY_WATCH:
+            LOG.error("Wrong watch command.")
+            return
+        if len(para_list) > 1 and para_list[1] == "stop":
+            SuiteCatalog.stop_watch()
+            LOG.info("Stop watching the test case directories.")
+            return
+        # 监控用例输出目录和resource目录，后续run命令直接使用内存中的用例目录索引
+        watch_path_list = [
+            Run.get_tests_out_path(productform),
+            os.path.abspath(os.path.join(sys.framework_root_dir, "..", "resource"))
+        ]
+        SuiteCatalog.start_watch(watch_path_list)
+
     @classmethod
     def _process_command_quit(cls, command):
         if command == ToolCommandType.TOOLCMD_KEY_QUIT:
+            SuiteCatalog.stop_watch()
             env_manager = EnvironmentManager()
             env_manager.env_stop()
             sys.exit(0)
@@ -441,6 +528,8 @@ class Console(object):
                 self._process_command_device(command)
             elif command.startswith(ToolCommandType.TOOLCMD_KEY_VERSION):
                 self._process_command_version(command)
+            elif command.startswith(ToolCommandType.TOOLCMD_KEY_WATCH):
+                self._process_command_watch(command, para_list, productform)
             else:
                 print("The %s command is not supported." % command)
         except (AttributeError, IOError, IndexError, ImportError, NameError,
@@ -80,6 +80,9 @@ HLEP_COMMAND_INFOMATION = """use help [follow command] for more information:
                           "run:  " + """Display a list of supported run command.
     """ + \
                           "list: " + """Display a list of supported device.
+    """ + \
+                          "watch: " + """Keep the test case list in memory and update it on file changes,
+           use "watch stop" to stop.
     """ + \
                           "quit: " + """Exit the test framework application.
 """
@@ -17,6 +17,7 @@
 #
 import platform
 import random
+import copy
 import shutil
 import subprocess
 from pydoc import classname
@@ -39,6 +40,21 @@ from core.common import is_open_source_product
 from core.command.parameter import Parameter
 from core.command.distribute_execute import DbinderTest
 from core.testcase.testcase_manager import TestCaseManager
+from core.testcase.testcase_manager import TESTFILE_TYPE_DATA_DIC
+from core.command.suite_stream import SuiteStreamPipeline
+from core.command.suite_stream import merge_summary_reports
+from core.command.suite_stream import copy_summary_report
+from core.config.suite_duration import SuiteDurationHistory
+from core.config.suite_duration import predict_makespan
+from core.config.suite_duration import write_makespan_report
+from core.driver.suite_pipeline import SuitePipeline
+from core.driver.coverage_extractor import CoverageExtractor
+from core.driver.test_log import TestLogCompressor
+from core.config.resource_lifetime import DeviceResourceLifetime
+from core.driver.suite_batch import SuiteBatchRunner
+from core.driver.binary_cache import DeviceBinaryCache
+from core.driver.suite_timeout import SuiteTimeoutModel
+from core.driver.gtest_shard import get_online_device_sn_list
 from core.config.config_manager import UserConfigManager
 from core.config.parse_parts_config import ParsePartsConfig
 from core.config.resource_manager import ResourceManager
@@ -307,10 +323,13 @@ class Run(object):
             test_dict = self.get_xts_test_dict(options)
             options.testcases_path = self.get_xts_tests_out_path(options.productform, options.testtype)
             options.resource_path = self.get_xts_tests_out_path(options.productform, options.testtype)
+        elif self._is_stream_mode(options):
+            # 流式执行时用例边发现边提交给调度器，不预先生成完整的test_dict
+            test_dict = None
         else:
             test_dict = self.get_test_dict(options)
 
-        if not self._check_test_dictionary(test_dict):
+        if test_dict is not None and not self._check_test_dictionary(test_dict):
             LOG.error("The test file list is empty.")
             return
         if options.coverage and platform.system() != "Windows":
@@ -407,7 +426,12 @@ class Run(object):
                                 "BIN", DeviceTestType.ctest_lite)
                         else:
                             print("productform is not wifiiot")
-                    scheduler.exec_command(command, options)
+                    if test_dict is None:
+                        if not self.exec_stream_command(scheduler, command,
+                                                        options):
+                            return
+                    else:
+                        self.exec_scheduler_command(scheduler, command, options)
         if need_record_history:
             #读文件获取运行结果
             from xdevice import Variables
@@ -449,6 +473,134 @@ class Run(object):
                     print(f"{cov_main_file_path} not exists.")
         return
 
+    @classmethod
+    def _is_stream_mode(cls, options):
+        if not getattr(options, "stream", False):
+            return False
+        # 分布式用例和arktstdd用例不经过xdevice调度器，不支持流式执行
+        return "distributedtest" not in options.testtype and \
+            "arktstdd" not in options.testtype
+
+    @classmethod
+    def exec_scheduler_command(cls, scheduler, command, options):
+        # resource配置的缓存只在一次执行内有效
+        ResourceManager.clear_cache()
+        cls._dispatch_scheduler_command(scheduler, command, options)
+        cls._finish_scheduler_command(options)
+
+    @classmethod
+    def _dispatch_scheduler_command(cls, scheduler, command, options):
+        if getattr(options, "lpt", False):
+            cls._exec_lpt_command(scheduler, command, options)
+        else:
+            scheduler.exec_command(command, options)
+
+    @classmethod
+    def _finish_scheduler_command(cls, options):
+        # 所有用例执行完成后的收尾处理，流式执行时在最后一批之后只执行一次
+        if getattr(options, "pipeline", False):
+            # 等待后台拉取覆盖率数据的任务结束，再进行后续的覆盖率处理
+            SuitePipeline.wait_all()
+        if options.coverage:
+            CoverageExtractor.wait_all(os.path.join(
+                sys.framework_root_dir, "reports", "coverage",
+                "extract_metrics.json"))
+        if getattr(options, "hidelog", False):
+            TestLogCompressor.wait_all()
+        if getattr(options, "share_resource", False):
+            # 运行推迟到最后一个使用者之后的cleaner
+            DeviceResourceLifetime.release_all()
+        if getattr(options, "batch_suites", 0):
+            # 删除批量执行时拉取到本地的结果，保存用于判断短测试套的耗时
+            SuiteBatchRunner.clear_all()
+            SuiteDurationHistory.get_instance().save()
+        if getattr(options, "adaptive_timeout", False):
+            # 保存本次各用例的执行耗时，用于计算后续执行的超时时间
+            SuiteTimeoutModel.save()
+        # 未开启设备侧用例缓存时不保存
+        DeviceBinaryCache.save_all()
+
+    @classmethod
+    def _exec_lpt_command(cls, scheduler, command, options):
+        # 按历史耗时从长到短下发用例，执行后记录本次耗时并输出预测与实际总耗时的对比
+        history = SuiteDurationHistory.get_instance()
+        lpt_options = copy.copy(options)
+        lpt_options.testdict, estimate_dic = history.sort_test_dict(
+            options.testdict)
+        if not getattr(options, "report_path", ""):
+            lpt_options.report_path = time.strftime('%Y-%m-%d-%H-%M-%S',
+                                                    time.localtime())
+        predicted, device_count = cls._predict_makespan(lpt_options,
+                                                        estimate_dic)
+        start_time = time.time()
+        scheduler.exec_command(command, lpt_options)
+        actual = time.time() - start_time
+
+        report_path = os.path.join(sys.framework_root_dir, "reports",
+                                   lpt_options.report_path)
+        duration_dic = history.record_report(report_path,
+                                             list(estimate_dic.keys()))
+        history.save()
+        write_makespan_report(report_path, predicted, actual, device_count,
+                              estimate_dic, duration_dic)
+
+    @classmethod
+    def _predict_makespan(cls, options, estimate_dic):
+        # 调度器在所有在线设备上并行执行用例，同时执行的驱动数不超过max_driver_threads
+        from xdevice import Variables
+        device_count = max(min(
+            len(get_online_device_sn_list(options.device_sn)),
+            Variables.config.get_max_driver_threads()), 1)
+        return predict_makespan(
+            [estimate_dic[suite_file] for suite_list in
+             options.testdict.values() for suite_file in suite_list],
+            device_count), device_count
+
+    def exec_stream_command(self, scheduler, command, options):
+        test_case_path = self.get_tests_out_path(options.productform)
+        pipeline = SuiteStreamPipeline(
+            TestCaseManager().iter_test_files(test_case_path, options))
+        pipeline.start()
+
+        # 每一批用例使用独立的报告目录，全部执行完成后再合并为一份总报告
+        create_time = time.strftime('%Y-%m-%d-%H-%M-%S', time.localtime())
+        result_rootpath = os.path.join(sys.framework_root_dir, "reports",
+                                       create_time)
+        report_path_list = []
+        ResourceManager.clear_cache()
+        for index, test_dict in enumerate(
+                pipeline.iter_test_dict(TESTFILE_TYPE_DATA_DIC)):
+            batch_name = "batch_%03d" % index
+            LOG.info("Stream batch %s: %s test files" % (
+                batch_name, sum(len(value) for value in test_dict.values())))
+            batch_options = copy.copy(options)
+            batch_options.testdict = test_dict
+            # 发现线程仍在写入用例字典，每一批使用独立的快照
+            batch_options.testcase_dict, batch_options.test_level_dict = \
+                pipeline.snapshot((options.testcase_dict,
+                                   options.test_level_dict))
+            batch_options.report_path = os.path.join(create_time, batch_name)
+            self._dispatch_scheduler_command(scheduler, command,
+                                             batch_options)
+            report_path_list.append(os.path.join(result_rootpath, batch_name))
+        pipeline.join()
+        self._finish_scheduler_command(options)
+
+        if pipeline.suite_count == 0:
+            LOG.error("The test file list is empty.")
+            return False
+        summary_path = os.path.join(result_rootpath, "summary_report.xml")
+        if merge_summary_reports(report_path_list, summary_path):
+            from xdevice import Variables
+            copy_summary_report(summary_path,
+                                os.path.join(Variables.temp_dir, "latest"))
+        # 发现过程异常退出时只执行了部分用例，报告不完整，本次执行视为失败
+        if pipeline.error is not None:
+            LOG.error("Discover test suites failed, only %s test files were "
+                      "executed: %s" % (pipeline.suite_count, pipeline.error))
+            return False
+        return True
+
     def get_xts_test_dict(self, options):
         # 获取XTS测试用例编译结果路径
         xts_test_case_path = self.get_xts_tests_out_path(options.productform, options.testtype)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import copy
+import queue
+import shutil
+import threading
+import xml.etree.ElementTree as ElementTree
+
+from xdevice import platform_logger
+
+__all__ = ["SuiteStreamPipeline", "merge_summary_reports",
+           "copy_summary_report"]
+
+LOG = platform_logger("SuiteStream")
+
+STREAM_QUEUE_SIZE = 256
+# 第一批用例的数量上限，之后每批取走发现的所有用例
+STREAM_FIRST_BATCH_SIZE = 16
+STREAM_BATCH_WAIT_TIME = 1
+SUMMARY_REPORT_FILE_NAME = "summary_report.xml"
+SUMMARY_COUNT_ATTRIBUTES = ["tests", "failures", "errors", "disabled",
+                            "unavailable", "ignored"]
+
+
+class SuiteStreamPipeline(object):
+    """
+    Producer/consumer pipeline between suite discovery and the scheduler.
+
+    A producer thread puts (type_key, suite_file) items into a bounded
+    queue, so discovery blocks when the scheduler falls behind. The
+    consumer takes the queued suites as test_dict batches while discovery
+    of the rest of the tree is still running: a small first batch lets the
+    devices start early, every later batch takes all suites discovered
+    while the previous one was running.
+    """
+    _END = None
+
+    def __init__(self, suite_iterator, queue_size=STREAM_QUEUE_SIZE):
+        self.suite_iterator = suite_iterator
+        self.suite_queue = queue.Queue(maxsize=queue_size)
+        self.producer = threading.Thread(target=self._produce,
+                                         name="SuiteStreamProducer",
+                                         daemon=True)
+        self.suite_count = 0
+        self.error = None
+        # 发现线程在生成用例时会写入options中的用例字典，取快照时需要互斥
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.producer.start()
+
+    def join(self):
+        self.producer.join()
+
+    def snapshot(self, value):
+        # 深拷贝发现线程仍在写入的数据，给每一批用例独立使用
+        with self.lock:
+            return copy.deepcopy(value)
+
+    def iter_test_dict(self, empty_test_dict,
+                       first_batch_size=STREAM_FIRST_BATCH_SIZE):
+        # 阻塞等待每批的第一个用例，之后取走队列中的用例，直到发现暂停超过等待时间
+        # 只有第一批限制数量，每一批都是调度器的一次完整执行，批次越少越好
+        batch_size = first_batch_size
+        is_finished = False
+        while not is_finished:
+            item = self.suite_queue.get()
+            if item is self._END:
+                break
+            test_dict = copy.deepcopy(empty_test_dict)
+            batch_count = 0
+            while item is not self._END:
+                type_key, suite_file = item
+                test_dict.setdefault(type_key, []).append(suite_file)
+                batch_count += 1
+                if batch_size and batch_count >= batch_size:
+                    break
+                try:
+                    item = self.suite_queue.get(timeout=STREAM_BATCH_WAIT_TIME)
+                except queue.Empty:
+                    break
+            else:
+                is_finished = True
+            batch_size = 0
+            yield test_dict
+
+    def _produce(self):
+        try:
+            while True:
+                with self.lock:
+                    item = next(self.suite_iterator, self._END)
+                if item is self._END:
+                    break
+                self.suite_queue.put(item)
+                self.suite_count += 1
+        except Exception as error:
+            LOG.error("Discover test suites failed: %s" % error)
+            self.error = error
+        finally:
+            self.suite_queue.put(self._END)
+
+
+def merge_summary_reports(report_path_list, summary_path):
+    # 将各批次的summary_report.xml合并为一份，统计值累加，测试套依次追加
+    summary_root = None
+    for report_path in report_path_list:
+        report_file = os.path.join(report_path, SUMMARY_REPORT_FILE_NAME)
+        if not os.path.exists(report_file):
+            LOG.warning("%s is not exist." % report_file)
+            continue
+        try:
+            report_root = ElementTree.parse(report_file).getroot()
+        except ElementTree.ParseError as error:
+            LOG.warning("Parse %s failed: %s" % (report_file, error))
+            continue
+        if summary_root is None:
+            summary_root = report_root
+            continue
+        for attribute in SUMMARY_COUNT_ATTRIBUTES:
+            if attribute in report_root.attrib:
+                count = int(summary_root.get(attribute, "0") or 0) + \
+                    int(report_root.get(attribute, "0") or 0)
+                summary_root.set(attribute, str(count))
+        for test_suite in report_root:
+            summary_root.append(test_suite)
+
+    if summary_root is None:
+        return False
+    os.makedirs(os.path.dirname(summary_path), exist_ok=True)
+    ElementTree.ElementTree(summary_root).write(
+        summary_path, encoding="UTF-8", xml_declaration=True)
+    LOG.info("Generate merged summary report: %s" % summary_path)
+    return True
+
+
+def copy_summary_report(summary_path, latest_path):
+    if not os.path.exists(summary_path):
+        return
+    os.makedirs(latest_path, exist_ok=True)
+    shutil.copyfile(summary_path,
+                    os.path.join(latest_path, SUMMARY_REPORT_FILE_NAME))
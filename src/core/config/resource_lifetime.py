@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+import hashlib
+import threading
+
+from xdevice import platform_logger
+from xdevice import ExecuteTerminate
+from xdevice import DeviceError
+from core.config.resource_manager import ResourceManager
+from core.driver.device_stat import stat_device_files
+
+__all__ = ["DeviceResourceLifetime"]
+
+LOG = platform_logger("ResourceLifetime")
+
+# 清空测试目录时暂存仍被持有的资源的目录，以"."开头不会被"rm -rf <path>/*"删除
+KEEP_DIR_NAME = ".resource_keep"
+
+
+def _get_source_hash(src):
+    # 按文件的相对路径、大小和修改时间计算，不读取文件内容，源文件不存在时抛出OSError
+    if not os.path.isdir(src):
+        file_stat = os.stat(src)
+        signature = [[os.path.basename(src), file_stat.st_size,
+                      file_stat.st_mtime_ns]]
+    else:
+        signature = []
+        for root, dirs, files in os.walk(src):
+            dirs.sort()
+            for file in sorted(files):
+                file_path = os.path.join(root, file)
+                file_stat = os.stat(file_path)
+                signature.append([
+                    os.path.relpath(file_path, src).replace(os.sep, "/"),
+                    file_stat.st_size, file_stat.st_mtime_ns])
+    return hashlib.sha256(json.dumps(signature).encode("utf-8")).hexdigest()
+
+
+def _get_device_path(src, dst):
+    # push目录时get_push_item已在dst后加上目录名，push文件时文件位于dst下
+    if os.path.isdir(src):
+        return dst
+    return "%s/%s" % (dst.rstrip("/"), os.path.basename(src))
+
+
+class _ResourceConsumer(object):
+    def __init__(self, key_set, resource_dir, cleaner_list):
+        self.key_set = key_set
+        self.resource_dir = resource_dir
+        self.cleaner_list = cleaner_list
+
+    def get_cleaner_key(self):
+        return self.resource_dir, json.dumps(self.cleaner_list,
+                                             sort_keys=True)
+
+
+class DeviceResourceLifetime(object):
+    """
+    Keeps the resources pushed by the preparers of ohos_test.xml on the
+    device while consecutive suites push the same ones.
+
+    A pushed resource is identified by (source hash, destination) and is
+    referenced by every finished suite that pushed it, whose cleaner is
+    deferred. The next suite pushes only the resources not already on the
+    device; the deferred cleaners run when a suite needs a different set
+    of resources (including a conflicting push to the same destination)
+    or when the run ends, after which their resources are pushed again
+    when needed.
+    """
+    _lifetime_dic = {}
+    _lock = threading.Lock()
+
+    def __init__(self, device):
+        self.device = device
+        # (源文件hash, 目的路径) -> 设备上的资源路径
+        self.entry_dic = {}
+        self.consumer_list = []
+        self.current_key_set = set()
+        self.pending_dic = {}
+
+    @classmethod
+    def get_device_lifetime(cls, device):
+        with cls._lock:
+            serial = str(device.__get_serial__())
+            lifetime = cls._lifetime_dic.get(serial)
+            if lifetime is None:
+                lifetime = DeviceResourceLifetime(device)
+                cls._lifetime_dic[serial] = lifetime
+            lifetime.device = device
+            return lifetime
+
+    @classmethod
+    def release_all(cls):
+        # 执行结束时运行所有推迟的cleaner
+        with cls._lock:
+            lifetime_list = list(cls._lifetime_dic.values())
+            cls._lifetime_dic = {}
+        for lifetime in lifetime_list:
+            lifetime.release_consumers(set())
+
+    def acquire(self, resource_dir, preparer_list):
+        # 返回还需要执行的preparer，设备上已有的相同push项被去掉
+        key_list = []
+        for item in preparer_list:
+            key_list.append(self._get_item_key(resource_dir, item))
+        key_set = set([key for key, _ in key_list if key is not None])
+        self.release_consumers(key_set)
+        held_set = self._get_existing_keys(
+            [key for key in key_set if key in self.entry_dic])
+        self.current_key_set = key_set
+        self.pending_dic = dict([item for item in key_list
+                                 if item[0] is not None and
+                                 item[0] not in held_set])
+
+        result_list = []
+        for item, (key, _) in zip(preparer_list, key_list):
+            if key in held_set:
+                LOG.info("Reuse %s on the device" % self.entry_dic.get(key))
+                continue
+            result_list.append(item)
+        return result_list
+
+    def commit(self):
+        # preparer执行成功后记录新push的资源，同一路径上的旧资源已被覆盖
+        path_set = set(self.pending_dic.values())
+        for key, path in list(self.entry_dic.items()):
+            if path in path_set:
+                self.entry_dic.pop(key)
+        self.entry_dic.update(self.pending_dic)
+        self.pending_dic = {}
+
+    def defer_cleaner(self, resource_dir, cleaner_list):
+        # 测试套push过资源时推迟执行cleaner并返回True，否则由调用方立即执行
+        if not self.current_key_set:
+            return False
+        self.consumer_list.append(_ResourceConsumer(
+            frozenset(self.current_key_set), resource_dir, cleaner_list))
+        self.current_key_set = set()
+        return True
+
+    def release_consumers(self, key_set):
+        # 需要的资源不都在key_set中的测试套不再持有资源，运行其cleaner
+        # cleaner可能删除了这些测试套的所有资源，之后需要时重新push
+        keep_list = []
+        cleaner_key_set = set()
+        for consumer in self.consumer_list:
+            if consumer.key_set <= key_set:
+                keep_list.append(consumer)
+                continue
+            for key in consumer.key_set:
+                self.entry_dic.pop(key, None)
+            if consumer.get_cleaner_key() in cleaner_key_set:
+                continue
+            cleaner_key_set.add(consumer.get_cleaner_key())
+            try:
+                ResourceManager().process_resource_file(
+                    consumer.resource_dir, consumer.cleaner_list, self.device)
+            except (ExecuteTerminate, DeviceError) as error:
+                LOG.warning("Run cleaner failed: %s" % error)
+        self.consumer_list = keep_list
+
+    def clear_test_path(self, test_path):
+        # 清空测试目录，其中仍被持有的资源先移到隐藏目录，清空后再移回
+        test_dir = test_path.rstrip("/")
+        path_list = sorted(set([path for path in self.entry_dic.values()
+                                if path.startswith(test_dir + "/")]))
+        if not path_list:
+            self.device.execute_shell_command("rm -rf %s/*" % test_dir)
+            return
+        keep_dir = "%s/%s" % (test_dir, KEEP_DIR_NAME)
+        command_list = ["rm -rf %s" % keep_dir, "mkdir -p %s" % keep_dir]
+        for index, path in enumerate(path_list):
+            command_list.append("mv %s %s/%s 2>/dev/null" % (
+                path, keep_dir, index))
+        command_list.append("rm -rf %s/*" % test_dir)
+        for index, path in enumerate(path_list):
+            command_list.append(
+                "mkdir -p {0} && mv {1}/{2} {3} 2>/dev/null".format(
+                    os.path.dirname(path), keep_dir, index, path))
+        command_list.append("rm -rf %s" % keep_dir)
+        self.device.execute_shell_command("; ".join(command_list))
+        LOG.info("Kept %s resources in %s" % (len(path_list), test_dir))
+
+    def _get_item_key(self, resource_dir, item):
+        if item.get("name") != "push":
+            return None, ""
+        src, dst = ResourceManager().get_push_item(resource_dir, item["value"])
+        try:
+            return (_get_source_hash(src), dst), _get_device_path(src, dst)
+        except OSError as error:
+            LOG.warning("Get hash of %s failed: %s" % (src, error))
+            return None, ""
+
+    def _get_existing_keys(self, key_list):
+        # 资源可能被其他驱动清空测试目录时删除，使用前确认仍在设备上
+        if not key_list:
+            return set()
+        path_list = [self.entry_dic.get(key) for key in key_list]
+        stat_dic = stat_device_files(self.device, path_list)
+        existing_set = set()
+        for key, path in zip(key_list, path_list):
+            if stat_dic is not None:
+                is_exist = stat_dic.get(path).exists
+            else:
+                is_exist = self.device.is_file_exist(path)
+            if is_exist:
+                existing_set.add(key)
+            else:
+                self.entry_dic.pop(key)
+        return existing_set
@@ -18,10 +18,12 @@
 
 import os
 import shutil
+import threading
 import xml.etree.ElementTree as ElementTree
 from xdevice import platform_logger
 from xdevice import DeviceTestType
 from core.constants import ConfigFileConst
+from core.testcase.suite_catalog import SuiteCatalog
 
 LOG = platform_logger("ResourceManager")
 
@@ -29,14 +31,81 @@ LOG = platform_logger("ResourceManager")
 ##############################################################################
 ##############################################################################
 
+class _ResourceTargetIndex(object):
+    """
+    Targets of one resource xml file indexed by name, with the data of
+    each target parsed once and shared by all the suites using it.
+    """
+
+    def __init__(self, mtime, root=None):
+        self.mtime = mtime
+        self.node_dic = {}
+        self.data_dic = {}
+        if root is None:
+            return
+        for target in root.iter("target"):
+            name = target.attrib.get("name")
+            # 同名target以文件中第一个为准
+            if name is not None and name not in self.node_dic:
+                self.node_dic[name] = target
+
+    def find_name(self, target_name):
+        # 优先完全匹配，其次匹配最长的前缀
+        for index in range(len(target_name), -1, -1):
+            if target_name[:index] in self.node_dic:
+                return target_name[:index]
+        return None
+
+    def get_node(self, target_name):
+        name = self.find_name(target_name)
+        return None if name is None else self.node_dic.get(name)
+
+
 class ResourceManager(object):
+    # 一次执行内缓存：用例目录 -> resource配置文件，配置文件 -> target索引
+    _xml_path_dic = {}
+    _target_index_dic = {}
+    _cache_lock = threading.Lock()
+
     def __init__(self):
         pass
 
+    @classmethod
+    def clear_cache(cls):
+        with cls._cache_lock:
+            cls._xml_path_dic = {}
+            cls._target_index_dic = {}
+
     @staticmethod
     def get_resource_xml_file_path(test_suit_file_path):
-        current_dir = os.path.dirname(test_suit_file_path)
+        # console处于watch模式时，resource配置文件的位置由常驻内存的用例目录缓存
+        suite_catalog = SuiteCatalog.get_watching_catalog()
+        if suite_catalog is not None:
+            return suite_catalog.get_resource_xml_file_path(
+                test_suit_file_path, ResourceManager.find_resource_xml_file_path)
+        return ResourceManager.find_resource_xml_file_path(test_suit_file_path)
+
+    @staticmethod
+    def find_resource_xml_file_path(test_suit_file_path):
+        suite_dir = os.path.dirname(test_suit_file_path)
+        xml_filepath = ResourceManager._xml_path_dic.get(suite_dir)
+        if xml_filepath is None:
+            xml_filepath = ResourceManager._find_resource_xml_file_path(
+                suite_dir)
+        LOG.info("xml_filepath = %s" % xml_filepath)
+        return xml_filepath
+
+    @staticmethod
+    def _find_resource_xml_file_path(suite_dir):
+        # 查找结果只与目录有关，向上查找时经过的目录都记录同一个结果
+        visited_list = []
+        current_dir = suite_dir
+        xml_filepath = None
         while True:
+            if current_dir in ResourceManager._xml_path_dic:
+                xml_filepath = ResourceManager._xml_path_dic.get(current_dir)
+                break
+            visited_list.append(current_dir)
             if current_dir.endswith(os.sep + "tests"):
                 current_dir = ""
                 break
@@ -47,6 +116,15 @@ class ResourceManager(object):
                 break
             current_dir = os.path.dirname(current_dir)
 
+        if xml_filepath is None:
+            xml_filepath = ResourceManager._get_xml_file_path(current_dir)
+        with ResourceManager._cache_lock:
+            for visited_dir in visited_list:
+                ResourceManager._xml_path_dic[visited_dir] = xml_filepath
+        return xml_filepath
+
+    @staticmethod
+    def _get_xml_file_path(current_dir):
         if current_dir != "":
             xml_filepath = os.path.join(
                 current_dir,
@@ -59,27 +137,38 @@ class ResourceManager(object):
                     ConfigFileConst.CASE_RESOURCE_FILEPATH)
         else:
             xml_filepath = ""
-        LOG.info("xml_filepath = %s" % xml_filepath)
         return xml_filepath
 
     @staticmethod
-    def find_node_by_target(file_path, targe_tname):
-        node = None
+    def get_target_index(file_path):
+        # 配置文件修改后重新解析，文件不存在时返回None
         try:
-            if os.path.exists(file_path):
-                tree = ElementTree.parse(file_path)
-                root = tree.getroot()
-                targets = root.iter("target")
-                for target in targets:
-                    curr_dic = target.attrib
-                    if curr_dic.get("name") == targe_tname or \
-                            targe_tname.startswith(curr_dic.get("name")):
-                        node = target
-                        break
-        except ElementTree.ParseError as xml_exception:
-            LOG.error("resource_test.xml parsing failed." +
-                      xml_exception.args)
-        return node
+            mtime = os.path.getmtime(file_path)
+        except OSError:
+            return None
+        target_index = ResourceManager._target_index_dic.get(file_path)
+        if target_index is not None and target_index.mtime == mtime:
+            return target_index
+        with ResourceManager._cache_lock:
+            target_index = ResourceManager._target_index_dic.get(file_path)
+            if target_index is not None and target_index.mtime == mtime:
+                return target_index
+            try:
+                target_index = _ResourceTargetIndex(
+                    mtime, ElementTree.parse(file_path).getroot())
+            except ElementTree.ParseError as xml_exception:
+                LOG.error("resource_test.xml parsing failed: %s" %
+                          xml_exception)
+                target_index = _ResourceTargetIndex(mtime)
+            ResourceManager._target_index_dic[file_path] = target_index
+        return target_index
+
+    @staticmethod
+    def find_node_by_target(file_path, targe_tname):
+        target_index = ResourceManager.get_target_index(file_path)
+        if target_index is None:
+            return None
+        return target_index.get_node(targe_tname)
 
     @classmethod
     def _get_file_name_extension(cls, filepath):
@@ -160,21 +249,36 @@ class ResourceManager(object):
     ##########################################################################
     ##########################################################################
 
+    def get_push_item(self, resource_dir, push_value):
+        find_key = "->"
+        pos = push_value.find(find_key)
+        src = os.path.join(resource_dir, push_value[0:pos].strip())
+        dst = push_value[pos + len(find_key):len(push_value)].strip()
+        src = src.replace("/", os.sep)
+        dir_name = self.get_dir_name(src)
+        if dir_name != "":
+            dst = dst.rstrip("/") + "/" + dir_name
+        return src, dst
+
+    def split_push_items(self, resource_dir, preparer_list):
+        # 取出preparer开头连续的push项，后面的项仍按原顺序逐条执行
+        push_list = []
+        for index, item in enumerate(preparer_list):
+            # 列表第一项是preparer节点自身的属性，没有name，与process_resource_file一样跳过
+            if "name" not in item.keys():
+                continue
+            if item.get("name") != "push":
+                return push_list, preparer_list[index:]
+            push_list.append(self.get_push_item(resource_dir, item["value"]))
+        return push_list, []
+
     def process_resource_file(self, resource_dir, preparer_list, device):
         for item in preparer_list:
             if "name" not in item.keys():
                 continue
 
             if item["name"] == "push":
-                push_value = item["value"]
-                find_key = "->"
-                pos = push_value.find(find_key)
-                src = os.path.join(resource_dir, push_value[0:pos].strip())
-                dst = push_value[pos + len(find_key):len(push_value)].strip()
-                src = src.replace("/", os.sep)
-                dir_name = self.get_dir_name(src)
-                if dir_name != "":
-                    dst = dst.rstrip("/") + "/" + dir_name
+                src, dst = self.get_push_item(resource_dir, item["value"])
                 device.execute_shell_command("mkdir -p %s" % dst)
                 device.push_file(src, dst)
             elif item["name"] == "pull":
@@ -225,11 +329,17 @@ class ResourceManager(object):
             env_data_dic = self.get_env_data(environment_list)
         return env_data_dic
 
-    def process_preparer_data(self, data_dic, resource_dir, device):
+    def process_preparer_data(self, data_dic, resource_dir, device,
+                              lifetime=None):
+        # lifetime为DeviceResourceLifetime时，设备上已有的相同资源不再push
         if "preparer" in data_dic.keys():
             LOG.info("++++++++++++++preparer+++++++++++++++")
             preparer_list = data_dic["preparer"]
+            if lifetime is not None:
+                preparer_list = lifetime.acquire(resource_dir, preparer_list)
             self.process_resource_file(resource_dir, preparer_list, device)
+            if lifetime is not None:
+                lifetime.commit()
         return
 
     def lite_process_preparer_data(self, data_dic, resource_dir):
@@ -239,18 +349,35 @@ class ResourceManager(object):
             self.lite_process_resource_file(resource_dir, preparer_list)
         return
 
-    def process_cleaner_data(self, data_dic, resource_dir, device):
+    def process_cleaner_data(self, data_dic, resource_dir, device,
+                             lifetime=None):
         if "cleaner" in data_dic.keys():
             LOG.info("++++++++++++++cleaner+++++++++++++++")
             cleaner_list = data_dic["cleaner"]
+            if lifetime is not None and \
+                    lifetime.defer_cleaner(resource_dir, cleaner_list):
+                return
             self.process_resource_file(resource_dir, cleaner_list, device)
         return
     
     def _parse_resource_test_xml_file(self, filepath, targetname):
-        data_dic = {}
+        target_index = self.get_target_index(filepath)
+        if target_index is None:
+            return {}
+        name = target_index.find_name(targetname)
+        if name is None:
+            return {}
+        data_dic = target_index.data_dic.get(name)
+        if data_dic is None:
+            data_dic = self._parse_target_node(target_index.node_dic.get(name))
+            target_index.data_dic[name] = data_dic
+        # 解析结果由多个测试套共用，返回副本避免调用方修改缓存
+        return dict([(key, list(value)) for key, value in data_dic.items()])
 
-        node = self.find_node_by_target(filepath, targetname)
-        if node:
+    @classmethod
+    def _parse_target_node(cls, node):
+        data_dic = {}
+        if len(node):
             target_attrib_list = []
             target_attrib_list.append(node.attrib)
             environment_data_list = []
@@ -276,10 +403,19 @@ class ResourceManager(object):
                 for element in clr_node.findall("option"):
                     cleaner_data_list.append(element.attrib)
 
+            # gtest用例的分片配置，子节点option可以没有，不能用节点的真值判断
+            shard_data_list = []
+            shard_node = node.find("shard")
+            if shard_node is not None:
+                shard_data_list.append(shard_node.attrib)
+                for element in shard_node.findall("option"):
+                    shard_data_list.append(element.attrib)
+
             data_dic["nodeattrib"] = target_attrib_list
             data_dic["environment"] = environment_data_list
             data_dic["preparer"] = preparer_data_list
             data_dic["cleaner"] = cleaner_data_list
+            data_dic["shard"] = shard_data_list
 
         return data_dic
 
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import sys
+import json
+import stat
+import heapq
+import threading
+from json import JSONDecodeError
+from xml.etree import ElementTree
+
+from xdevice import platform_logger
+
+__all__ = ["SuiteDurationHistory", "predict_makespan",
+           "write_makespan_report"]
+
+LOG = platform_logger("SuiteDuration")
+
+SUITE_DURATION_FILE_NAME = "suite_duration.json"
+SUITE_DURATION_VERSION = 1
+MAKESPAN_REPORT_FILE_NAME = "makespan_report.json"
+# 没有任何历史数据时未知用例的预估耗时，单位秒
+DEFAULT_SUITE_DURATION = 60.0
+# 新的耗时记录所占的权重
+DURATION_WEIGHT = 0.5
+# 每个用例保留的最近执行耗时的个数
+MAX_DURATION_SAMPLES = 20
+
+FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+MODES = stat.S_IWUSR | stat.S_IRUSR
+
+
+class SuiteDurationHistory(object):
+    """
+    Local store of the execution time of each test suite.
+
+    Durations are read from the result xml files of each run and kept as
+    a weighted average by suite name. Suites without history are
+    estimated from their file size, using the seconds per byte of the
+    suites with history. The drivers add the most recent execution times
+    of each suite as samples, see add_sample().
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, history_path=""):
+        if history_path == "":
+            # 变量注释 history_path = OpenHarmony/test/developer_test/reports/suite_duration.json
+            history_path = os.path.join(sys.framework_root_dir, "reports",
+                                        SUITE_DURATION_FILE_NAME)
+        self.history_path = history_path
+        self.suite_dic = {}
+        self.is_modified = False
+        self.lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def get_instance(cls):
+        # 同一进程内共用一份历史记录，避免各自保存时相互覆盖
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = SuiteDurationHistory()
+            return cls._instance
+
+    @classmethod
+    def get_suite_name(cls, suite_file):
+        return os.path.splitext(os.path.basename(suite_file))[0]
+
+    def get_duration(self, suite_file):
+        record = self.suite_dic.get(self.get_suite_name(suite_file))
+        return record.get("time") if record else None
+
+    def get_samples(self, suite_file):
+        with self.lock:
+            record = self.suite_dic.get(self.get_suite_name(suite_file))
+            return list(record.get("samples", [])) if record else []
+
+    def add_sample(self, suite_file, duration):
+        with self.lock:
+            suite_name = self.get_suite_name(suite_file)
+            record = dict(self.suite_dic.get(suite_name, {}))
+            sample_list = record.get("samples", [])
+            sample_list.append(round(duration, 3))
+            record["samples"] = sample_list[-MAX_DURATION_SAMPLES:]
+            self.suite_dic[suite_name] = record
+            self.is_modified = True
+
+    def estimate(self, suite_file):
+        duration = self.get_duration(suite_file)
+        if duration is not None:
+            return duration
+        try:
+            suite_size = os.path.getsize(suite_file)
+        except OSError:
+            suite_size = 0
+        size_sum = sum(record.get("size", 0)
+                       for record in self.suite_dic.values()
+                       if record.get("time"))
+        time_sum = sum(record.get("time", 0)
+                       for record in self.suite_dic.values()
+                       if record.get("size", 0) > 0 and record.get("time"))
+        if suite_size <= 0 or size_sum <= 0 or time_sum <= 0:
+            return DEFAULT_SUITE_DURATION
+        return suite_size * time_sum / size_sum
+
+    def sort_test_dict(self, test_dict):
+        # 最长耗时优先：用例类型按其中最长的用例排序，类型内的用例按预估耗时降序排列
+        sorted_dict = {}
+        estimate_dic = {}
+        for key, suite_list in test_dict.items():
+            for suite_file in suite_list:
+                estimate_dic[suite_file] = self.estimate(suite_file)
+            sorted_dict[key] = sorted(suite_list, reverse=True,
+                                      key=lambda item: estimate_dic[item])
+        key_list = sorted(sorted_dict.keys(), reverse=True, key=lambda key: (
+            estimate_dic[sorted_dict[key][0]] if sorted_dict[key] else 0))
+        return dict([(key, sorted_dict[key]) for key in key_list]), \
+            estimate_dic
+
+    def record_report(self, report_path, suite_file_list):
+        # 从本次执行的result目录下读取每个用例的耗时
+        suite_file_dic = dict([(self.get_suite_name(suite_file), suite_file)
+                               for suite_file in suite_file_list])
+        duration_dic = {}
+        for root, _, files in os.walk(report_path):
+            if "result" not in root.split(os.sep):
+                continue
+            for file_name in files:
+                if not file_name.endswith(".xml"):
+                    continue
+                suite_name = file_name[:-4]
+                if suite_name not in suite_file_dic:
+                    continue
+                duration = self.get_report_duration(
+                    os.path.join(root, file_name))
+                if duration is not None:
+                    duration_dic[suite_name] = duration
+        for suite_name, duration in duration_dic.items():
+            self.record_duration(suite_file_dic[suite_name], duration)
+        return duration_dic
+
+    def record_duration(self, suite_file, duration):
+        # 与已有记录按权重合并为用例的耗时
+        try:
+            suite_size = os.path.getsize(suite_file)
+        except OSError:
+            suite_size = 0
+        with self.lock:
+            suite_name = self.get_suite_name(suite_file)
+            record = dict(self.suite_dic.get(suite_name, {}))
+            if record.get("time"):
+                duration = record.get("time") * (
+                    1 - DURATION_WEIGHT) + duration * DURATION_WEIGHT
+            record["time"] = round(duration, 3)
+            record["size"] = suite_size
+            self.suite_dic[suite_name] = record
+            self.is_modified = True
+
+    @classmethod
+    def get_report_duration(cls, report_file):
+        try:
+            report_root = ElementTree.parse(report_file).getroot()
+        except (ElementTree.ParseError, OSError) as error:
+            LOG.warning("Parse %s failed: %s" % (report_file, error))
+            return None
+        if report_root.get("unavailable") == "1":
+            # 用例未执行完时生成的空结果，其中的耗时为0
+            return None
+        try:
+            if report_root.get("time"):
+                return float(report_root.get("time"))
+            suite_time_list = [float(suite.get("time"))
+                               for suite in report_root.iter("testsuite")
+                               if suite.get("time")]
+        except ValueError:
+            return None
+        return sum(suite_time_list) if suite_time_list else None
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        if not self.is_modified:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
+            temp_path = "%s.tmp" % self.history_path
+            with os.fdopen(os.open(temp_path, FLAGS, MODES), "w") as file_desc:
+                json.dump({"version": SUITE_DURATION_VERSION,
+                           "suites": self.suite_dic}, file_desc)
+            os.replace(temp_path, self.history_path)
+            self.is_modified = False
+        except OSError as error:
+            LOG.warning("Save suite duration history %s failed: %s" %
+                        (self.history_path, error))
+
+    def _load(self):
+        if not os.path.exists(self.history_path):
+            return
+        try:
+            with open(self.history_path, "r") as file_desc:
+                data_dic = json.load(file_desc)
+            if data_dic.get("version") == SUITE_DURATION_VERSION:
+                self.suite_dic = data_dic.get("suites", {})
+        except (OSError, JSONDecodeError, AttributeError) as error:
+            LOG.warning("Load suite duration history %s failed: %s" %
+                        (self.history_path, error))
+
+
+def predict_makespan(duration_list, device_count):
+    # 按给定顺序把每个用例分给最先空闲的设备，与xdevice的调度方式一致
+    device_heap = [0.0] * max(device_count, 1)
+    for duration in duration_list:
+        heapq.heapreplace(device_heap, device_heap[0] + duration)
+    return max(device_heap)
+
+
+def write_makespan_report(report_path, predicted, actual, device_count,
+                          estimate_dic, duration_dic):
+    suite_list = []
+    for suite_file, estimate in estimate_dic.items():
+        suite_name = SuiteDurationHistory.get_suite_name(suite_file)
+        suite_list.append({"name": suite_name,
+                           "predicted": round(estimate, 3),
+                           "actual": duration_dic.get(suite_name)})
+    report_dic = {"device_count": device_count,
+                  "predicted_makespan": round(predicted, 3),
+                  "actual_makespan": round(actual, 3),
+                  "suites": suite_list}
+    LOG.info("Predicted makespan %.1fs, actual makespan %.1fs on %s device" %
+             (predicted, actual, device_count))
+    report_file = os.path.join(report_path, MAKESPAN_REPORT_FILE_NAME)
+    try:
+        os.makedirs(report_path, exist_ok=True)
+        with os.fdopen(os.open(report_file, FLAGS, MODES), "w") as file_desc:
+            json.dump(report_dic, file_desc, indent=4)
+    except OSError as error:
+        LOG.warning("Write makespan report %s failed: %s" %
+                    (report_file, error))
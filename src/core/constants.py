@@ -48,6 +48,7 @@ class ToolCommandType(object):
     TOOLCMD_KEY_LIST = "list"
     TOOLCMD_KEY_GEN = "gen"
     TOOLCMD_KEY_VERSION = "version"
+    TOOLCMD_KEY_WATCH = "watch"
 
     @property
     def run_command(self):
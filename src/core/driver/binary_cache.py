@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import sys
+import json
+import stat
+import time
+import hashlib
+import threading
+from json import JSONDecodeError
+
+from xdevice import platform_logger
+from core.config.config_manager import UserConfigManager
+
+__all__ = ["DeviceBinaryCache", "BinaryHashCache"]
+
+LOG = platform_logger("BinaryCache")
+
+BINARY_CACHE_FILE_NAME = "binary_cache.json"
+BINARY_CACHE_VERSION = 1
+DEVICE_CACHE_DIR = "/data/local/tmp/developer_test_cache"
+DEVICE_MANIFEST_NAME = "manifest.txt"
+DEFAULT_MIN_FREE_SIZE = 2048
+HASH_BLOCK_SIZE = 1024 * 1024
+COPY_DONE_MARK = "BINARY_CACHE_COPIED"
+
+FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+MODES = stat.S_IWUSR | stat.S_IRUSR
+
+
+class BinaryHashCache(object):
+    """
+    Host side mirror of the device binary caches.
+
+    Holds the SHA-256 of each pushed binary, reused while its (mtime, size)
+    is unchanged, and the cached entries of every device by serial.
+    """
+
+    def __init__(self, cache_path=""):
+        if cache_path == "":
+            # 变量注释 cache_path = OpenHarmony/test/developer_test/reports/binary_cache.json
+            cache_path = os.path.join(sys.framework_root_dir, "reports",
+                                      BINARY_CACHE_FILE_NAME)
+        self.cache_path = cache_path
+        self.hash_dic = {}
+        self.device_dic = {}
+        self.is_modified = False
+        self.lock = threading.Lock()
+        self._load()
+
+    def get_file_hash(self, file_path):
+        file_stat = os.stat(file_path)
+        signature = [file_stat.st_mtime_ns, file_stat.st_size]
+        with self.lock:
+            record = self.hash_dic.get(file_path)
+        if record and record[:2] == signature:
+            return record[2]
+
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as file_desc:
+            for block in iter(lambda: file_desc.read(HASH_BLOCK_SIZE), b""):
+                sha256.update(block)
+        file_hash = sha256.hexdigest()
+        with self.lock:
+            self.hash_dic[file_path] = signature + [file_hash]
+            self.is_modified = True
+        return file_hash
+
+    def get_device_entries(self, serial):
+        with self.lock:
+            return dict(self.device_dic.get(serial, {}))
+
+    def set_device_entries(self, serial, entry_dic):
+        with self.lock:
+            self.device_dic[serial] = dict(entry_dic)
+            self.is_modified = True
+
+    def save(self):
+        with self.lock:
+            if not self.is_modified:
+                return
+            data_dic = {"version": BINARY_CACHE_VERSION,
+                        "hashes": dict(self.hash_dic),
+                        "devices": dict(self.device_dic)}
+            self.is_modified = False
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = "%s.%s.tmp" % (self.cache_path, threading.get_ident())
+            with os.fdopen(os.open(temp_path, FLAGS, MODES), "w") as file_desc:
+                json.dump(data_dic, file_desc)
+            os.replace(temp_path, self.cache_path)
+        except OSError as error:
+            LOG.warning("Save binary cache %s failed: %s" %
+                        (self.cache_path, error))
+            with self.lock:
+                self.is_modified = True
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r") as file_desc:
+                data_dic = json.load(file_desc)
+            if data_dic.get("version") == BINARY_CACHE_VERSION:
+                self.hash_dic = data_dic.get("hashes", {})
+                self.device_dic = data_dic.get("devices", {})
+        except (OSError, JSONDecodeError, AttributeError) as error:
+            LOG.warning("Load binary cache %s failed: %s" %
+                        (self.cache_path, error))
+
+
+class DeviceBinaryCache(object):
+    """
+    Content addressed cache of test binaries on the device.
+
+    Binaries are stored as DEVICE_CACHE_DIR/<sha256> and copied into the
+    test path, so a binary unchanged since an earlier run on the same
+    device is not pushed again. The entries are listed in a manifest on
+    the device and mirrored in reports/binary_cache.json, which is saved
+    once when the run ends; the least recently used entries are removed
+    when the free space of /data drops below the configured threshold.
+    """
+    _cache_dic = {}
+    _hash_cache = None
+    _config_dic = None
+    _lock = threading.Lock()
+
+    def __init__(self, device, serial, hash_cache, min_free_size):
+        self.device = device
+        self.serial = serial
+        self.hash_cache = hash_cache
+        self.min_free_size = min_free_size
+        self.entry_dic = {}
+        self.is_synced = False
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get_device_cache(cls, device):
+        # 在user_config.xml的<binary_cache>中开启后才使用设备侧的用例缓存
+        with cls._lock:
+            if cls._config_dic is None:
+                cls._config_dic = UserConfigManager().get_user_config(
+                    "binary_cache")
+            if cls._config_dic.get("enable", "").lower() != "true":
+                return None
+            if cls._hash_cache is None:
+                cls._hash_cache = BinaryHashCache()
+            serial = str(device.__get_serial__())
+            device_cache = cls._cache_dic.get(serial)
+            if device_cache is None or device_cache.device is not device:
+                device_cache = DeviceBinaryCache(
+                    device, serial, cls._hash_cache,
+                    cls._get_min_free_size(cls._config_dic))
+                cls._cache_dic[serial] = device_cache
+            return device_cache
+
+    @classmethod
+    def save_all(cls):
+        # 执行结束时保存主机上的hash和各设备的缓存清单
+        with cls._lock:
+            hash_cache = cls._hash_cache
+        if hash_cache is not None:
+            hash_cache.save()
+
+    @classmethod
+    def _get_min_free_size(cls, config_dic):
+        try:
+            return int(config_dic.get("min_free_size") or
+                       DEFAULT_MIN_FREE_SIZE) * 1024 * 1024
+        except ValueError:
+            LOG.warning("min_free_size of binary_cache is not a number")
+            return DEFAULT_MIN_FREE_SIZE * 1024 * 1024
+
+    def push_file(self, local_file, remote_dir):
+        try:
+            file_hash = self.hash_cache.get_file_hash(local_file)
+            file_size = os.path.getsize(local_file)
+        except OSError as error:
+            LOG.warning("Hash %s failed: %s" % (local_file, error))
+            self.device.push_file(local_file, remote_dir)
+            return False
+
+        file_name = os.path.basename(local_file)
+        remote_file = "%s/%s" % (remote_dir.rstrip("/"), file_name)
+        with self.lock:
+            self._sync()
+            if file_hash in self.entry_dic:
+                if self._copy(file_hash, remote_file):
+                    LOG.info("Reuse %s cached on device %s" %
+                             (file_name, self.serial))
+                    self.entry_dic[file_hash]["used"] = time.time()
+                    self._save_host_manifest()
+                    return True
+                self.entry_dic.pop(file_hash)
+
+            if self._reserve_space(file_size):
+                cache_file = self._get_cache_file(file_hash)
+                self.device.push_file(local_file, cache_file)
+                self.device.execute_shell_command("chmod 755 %s" % cache_file)
+                if self._copy(file_hash, remote_file):
+                    self.entry_dic[file_hash] = {
+                        "name": file_name,
+                        "size": file_size,
+                        "used": time.time()
+                    }
+                    self._save_manifest()
+                    return False
+                self.device.execute_shell_command("rm -f %s" % cache_file)
+
+        self.device.push_file(local_file, remote_dir)
+        return False
+
+    def _get_cache_file(self, file_hash):
+        return "%s/%s" % (DEVICE_CACHE_DIR, file_hash)
+
+    def _copy(self, file_hash, remote_file):
+        # 不使用硬链接：之后对测试目录中文件的push、chmod或截断会同时改掉缓存文件
+        cache_file = self._get_cache_file(file_hash)
+        output = self.device.execute_shell_command(
+            "rm -f {1} && cp {0} {1} && echo {2}".format(
+                cache_file, remote_file, COPY_DONE_MARK))
+        return COPY_DONE_MARK in str(output)
+
+    def _sync(self):
+        # 每个设备只同步一次：以设备上实际存在的缓存文件为准，合并设备和主机上的清单
+        if self.is_synced:
+            return
+        self.is_synced = True
+        output = self.device.execute_shell_command(
+            "mkdir -p {0}; ls -1 {0}; cat {0}/{1}".format(
+                DEVICE_CACHE_DIR, DEVICE_MANIFEST_NAME))
+        file_hash_set = set()
+        device_entry_dic = {}
+        for line in str(output).splitlines():
+            items = line.strip().split(" ", 3)
+            if len(items) == 1 and len(items[0]) == 64:
+                file_hash_set.add(items[0])
+            elif len(items) == 4 and len(items[0]) == 64:
+                try:
+                    device_entry_dic[items[0]] = {
+                        "name": items[3],
+                        "size": int(items[1]),
+                        "used": float(items[2])
+                    }
+                except ValueError:
+                    continue
+        host_entry_dic = self.hash_cache.get_device_entries(self.serial)
+        for file_hash in file_hash_set:
+            entry = host_entry_dic.get(file_hash) or \
+                device_entry_dic.get(file_hash)
+            if entry:
+                self.entry_dic[file_hash] = entry
+        LOG.info("Device %s has %s cached binaries" %
+                 (self.serial, len(self.entry_dic)))
+        self._save_host_manifest()
+
+    def _get_free_size(self):
+        output = self.device.execute_shell_command("df -k /data")
+        for line in reversed(str(output).splitlines()):
+            items = line.split()
+            if len(items) >= 4 and items[3].isdigit():
+                return int(items[3]) * 1024
+        return None
+
+    def _reserve_space(self, file_size):
+        free_size = self._get_free_size()
+        if free_size is None:
+            LOG.warning("Get free space of /data on %s failed" % self.serial)
+            return False
+        evict_list = []
+        lru_list = sorted(self.entry_dic.items(),
+                          key=lambda item: item[1].get("used", 0))
+        while free_size - file_size < self.min_free_size and lru_list:
+            file_hash, entry = lru_list.pop(0)
+            evict_list.append(file_hash)
+            free_size += entry.get("size", 0)
+        if evict_list:
+            LOG.info("Evict %s cached binaries from device %s" %
+                     (len(evict_list), self.serial))
+            self.device.execute_shell_command("rm -f %s" % " ".join(
+                [self._get_cache_file(file_hash) for file_hash in evict_list]))
+            for file_hash in evict_list:
+                self.entry_dic.pop(file_hash, None)
+            self._save_manifest()
+        return free_size - file_size >= self.min_free_size
+
+    def _save_host_manifest(self):
+        # 只更新内存中的清单，执行结束时由save_all()写入文件
+        self.hash_cache.set_device_entries(self.serial, self.entry_dic)
+
+    def _save_manifest(self):
+        self._save_host_manifest()
+        manifest_path = "%s.%s.manifest" % (self.hash_cache.cache_path,
+                                            self.serial.replace(":", "_"))
+        try:
+            os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+            with os.fdopen(os.open(manifest_path, FLAGS, MODES), "w") as file_desc:
+                for file_hash, entry in self.entry_dic.items():
+                    file_desc.write("%s %s %s %s\n" % (
+                        file_hash, entry.get("size", 0),
+                        entry.get("used", 0), entry.get("name", "")))
+            self.device.push_file(manifest_path, "%s/%s" % (
+                DEVICE_CACHE_DIR, DEVICE_MANIFEST_NAME))
+        except OSError as error:
+            LOG.warning("Write binary cache manifest failed: %s" % error)
+        finally:
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import sys
+import json
+import stat
+import shutil
+import hashlib
+import tarfile
+import tempfile
+from json import JSONDecodeError
+
+from xdevice import platform_logger
+from xdevice import ExecuteTerminate
+from xdevice import DeviceError
+
+__all__ = ["CorpusSync", "get_corpus_manifest"]
+
+LOG = platform_logger("CorpusSync")
+
+# 以"."开头，不会被每个测试套执行前的"rm -rf <target_test_path>/*"删除
+DEVICE_CACHE_DIR_NAME = ".corpus"
+CORPUS_DIR_NAME = "corpus"
+# 主机缓存的语料旁保存各文件md5的文件，{相对路径: [大小, 修改时间, md5]}
+CORPUS_DIGEST_FILE_NAME = "corpus_md5.json"
+SYNC_DONE_MARK = "CORPUS_SYNC_DONE"
+READ_SIZE = 64 * 1024
+# 单条rm命令中删除的文件个数
+REMOVE_BATCH_SIZE = 200
+
+FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+MODES = stat.S_IWUSR | stat.S_IRUSR
+
+
+def _get_file_md5(file_path):
+    md5 = hashlib.md5()
+    with open(file_path, "rb") as file_desc:
+        for chunk in iter(lambda: file_desc.read(READ_SIZE), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def get_corpus_manifest(corpus_path, digest_dic=None):
+    # 返回{相对路径: md5}，相对路径使用"/"分隔，与设备上md5sum的输出一致
+    # digest_dic中大小和修改时间未变的文件直接使用记录的md5，新计算的md5写回digest_dic
+    manifest = {}
+    for root, _, files in os.walk(corpus_path):
+        for file in files:
+            file_path = os.path.join(root, file)
+            rel_path = os.path.relpath(file_path, corpus_path).replace(
+                os.sep, "/")
+            if digest_dic is None:
+                manifest[rel_path] = _get_file_md5(file_path)
+                continue
+            file_stat = os.stat(file_path)
+            signature = [file_stat.st_size, file_stat.st_mtime_ns]
+            record = digest_dic.get(rel_path)
+            if not record or record[:2] != signature:
+                record = signature + [_get_file_md5(file_path)]
+                digest_dic[rel_path] = record
+            manifest[rel_path] = record[2]
+    if digest_dic is not None:
+        for rel_path in [item for item in digest_dic if item not in manifest]:
+            digest_dic.pop(rel_path)
+    return manifest
+
+
+def _parse_md5sum_output(output):
+    # md5sum的输出格式为"<md5>  ./<相对路径>"
+    manifest = {}
+    for line in output.splitlines():
+        line = line.rstrip("\r")
+        if len(line) < 35 or line[32:34] != "  ":
+            continue
+        rel_path = line[34:]
+        if rel_path.startswith("./"):
+            rel_path = rel_path[2:]
+        manifest[rel_path] = line[:32].lower()
+    return manifest
+
+
+class CorpusSync(object):
+    """
+    Incremental transfer of a fuzz corpus between the host and a device.
+
+    Both sides are described by a manifest of md5 per relative path. Only
+    the files missing or different on the other side are sent, packed in
+    one compressed archive, so a grown corpus costs one push or pull of
+    its changes instead of one transfer per file.
+
+    The device keeps a copy of each pushed corpus in
+    <device_root>/.corpus/<suite_name>, which survives the cleanup of the
+    test directory between suites; the host keeps the pulled corpus in
+    reports/corpus_cache/<suite_name>.
+    """
+
+    def __init__(self, device, suite_name, device_root):
+        self.device = device
+        self.suite_name = suite_name
+        device_root = device_root.rstrip("/")
+        self.device_corpus = "%s/%s" % (device_root, CORPUS_DIR_NAME)
+        self.device_cache_root = "%s/%s" % (device_root,
+                                            DEVICE_CACHE_DIR_NAME)
+        self.device_cache = "%s/%s" % (self.device_cache_root, suite_name)
+        self.host_cache = os.path.join(
+            sys.framework_root_dir, "reports", "corpus_cache", suite_name,
+            CORPUS_DIR_NAME)
+        self.host_digest_file = os.path.join(
+            os.path.dirname(self.host_cache), CORPUS_DIGEST_FILE_NAME)
+
+    def push(self, corpus_path):
+        # 将主机上的语料同步到设备的缓存目录，再复制为测试目录下的corpus
+        # 设备不支持时返回False，由调用方逐个推送
+        local_manifest = get_corpus_manifest(corpus_path)
+        device_manifest = self._get_device_manifest(self.device_cache)
+        if device_manifest is None:
+            self._execute("rm -rf %s" % self.device_cache)
+            device_manifest = {}
+        changed_list = sorted([rel_path for rel_path, md5 in
+                               local_manifest.items()
+                               if device_manifest.get(rel_path) != md5])
+        removed_list = sorted([rel_path for rel_path in device_manifest
+                               if rel_path not in local_manifest])
+        temp_dir = tempfile.mkdtemp(prefix="corpus_")
+        try:
+            if changed_list and not self._push_archive(
+                    corpus_path, changed_list, temp_dir):
+                return False
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        self._remove_device_files(self.device_cache, removed_list)
+        output = self._execute("rm -rf {0} && cp -r {1} {0} && echo {2}".format(
+            self.device_corpus, self.device_cache, SYNC_DONE_MARK))
+        if SYNC_DONE_MARK not in str(output):
+            LOG.warning("Copy corpus cache to %s failed: %s" % (
+                self.device_corpus, output))
+            return False
+        LOG.info("Corpus of %s: %s files, pushed %s, removed %s" % (
+            self.suite_name, len(local_manifest), len(changed_list),
+            len(removed_list)))
+        return True
+
+    def pull(self, save_path):
+        # 只拉取主机缓存中没有的语料，再在主机上生成完整的<suite_name>_corpus.tar.gz
+        # 设备不支持时返回False，由调用方在设备上打包整个语料目录
+        device_manifest = self._get_device_manifest(self.device_corpus)
+        if device_manifest is None:
+            return False
+        os.makedirs(self.host_cache, exist_ok=True)
+        digest_dic = self._load_host_digests()
+        local_manifest = get_corpus_manifest(self.host_cache, digest_dic)
+        new_list = sorted([rel_path for rel_path, md5 in
+                           device_manifest.items()
+                           if local_manifest.get(rel_path) != md5])
+        for rel_path in local_manifest:
+            if rel_path not in device_manifest:
+                os.remove(os.path.join(self.host_cache, rel_path))
+                digest_dic.pop(rel_path, None)
+
+        temp_dir = tempfile.mkdtemp(prefix="corpus_")
+        try:
+            if new_list and not self._pull_archive(new_list, temp_dir):
+                self._save_host_digests(digest_dic)
+                return False
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        # 拉取的文件使用设备上计算的md5，下次不再重新计算
+        for rel_path in new_list:
+            file_path = os.path.join(self.host_cache, rel_path)
+            if os.path.isfile(file_path):
+                file_stat = os.stat(file_path)
+                digest_dic[rel_path] = [file_stat.st_size,
+                                        file_stat.st_mtime_ns,
+                                        device_manifest[rel_path]]
+        self._save_host_digests(digest_dic)
+
+        os.makedirs(save_path, exist_ok=True)
+        archive_path = os.path.join(save_path,
+                                    "%s_corpus.tar.gz" % self.suite_name)
+        with tarfile.open(archive_path, "w:gz") as archive:
+            archive.add(self.host_cache, arcname=CORPUS_DIR_NAME)
+        LOG.info("Corpus of %s: %s files, pulled %s" % (
+            self.suite_name, len(device_manifest), len(new_list)))
+        return True
+
+    def _load_host_digests(self):
+        if not os.path.exists(self.host_digest_file):
+            return {}
+        try:
+            with open(self.host_digest_file, "r") as file_desc:
+                digest_dic = json.load(file_desc)
+            return digest_dic if isinstance(digest_dic, dict) else {}
+        except (OSError, JSONDecodeError) as error:
+            LOG.warning("Load corpus digests %s failed: %s" % (
+                self.host_digest_file, error))
+            return {}
+
+    def _save_host_digests(self, digest_dic):
+        try:
+            with os.fdopen(os.open(self.host_digest_file, FLAGS, MODES),
+                           "w") as file_desc:
+                json.dump(digest_dic, file_desc)
+        except OSError as error:
+            LOG.warning("Save corpus digests %s failed: %s" % (
+                self.host_digest_file, error))
+
+    def _get_device_manifest(self, remote_dir):
+        remote_manifest = "%s/%s.md5" % (self.device_cache_root,
+                                         self.suite_name)
+        output = self._execute(
+            "mkdir -p {0} {1} && (cd {1} && find . -type f -exec md5sum {{}} + "
+            "> {2}) && echo {3}".format(self.device_cache_root, remote_dir,
+                                       remote_manifest, SYNC_DONE_MARK))
+        if SYNC_DONE_MARK not in str(output):
+            LOG.warning("Get corpus manifest of %s failed: %s" % (
+                remote_dir, output))
+            return None
+        temp_dir = tempfile.mkdtemp(prefix="corpus_")
+        local_manifest = os.path.join(temp_dir, "manifest.md5")
+        try:
+            self.device.pull_file(remote_manifest, local_manifest)
+            with open(local_manifest, "r", encoding="utf-8",
+                      errors="ignore") as file_desc:
+                return _parse_md5sum_output(file_desc.read())
+        except (ExecuteTerminate, DeviceError, OSError) as error:
+            LOG.warning("Pull corpus manifest failed: %s" % error)
+            return None
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            self._execute("rm -f %s" % remote_manifest)
+
+    def _push_archive(self, corpus_path, file_list, temp_dir):
+        archive_path = os.path.join(temp_dir,
+                                    "%s_push.tar.gz" % self.suite_name)
+        remote_archive = "%s/%s" % (self.device_cache_root,
+                                    os.path.basename(archive_path))
+        try:
+            with tarfile.open(archive_path, "w:gz") as archive:
+                for rel_path in file_list:
+                    archive.add(os.path.join(corpus_path, rel_path),
+                                arcname=rel_path)
+            self.device.push_file(archive_path, remote_archive)
+        except (ExecuteTerminate, DeviceError, OSError,
+                tarfile.TarError) as error:
+            LOG.warning("Push corpus archive failed: %s" % error)
+            return False
+        output = self._execute(
+            "mkdir -p {0} && tar -xzf {1} -C {0} && echo {2}; rm -f {1}".format(
+                self.device_cache, remote_archive, SYNC_DONE_MARK))
+        if SYNC_DONE_MARK not in str(output):
+            LOG.warning("Unpack corpus archive on device failed: %s" % output)
+            self._execute("rm -rf %s" % self.device_cache)
+            return False
+        return True
+
+    def _pull_archive(self, file_list, temp_dir):
+        list_path = os.path.join(temp_dir, "%s_pull.list" % self.suite_name)
+        archive_path = os.path.join(temp_dir,
+                                    "%s_pull.tar.gz" % self.suite_name)
+        remote_list = "%s/%s" % (self.device_cache_root,
+                                 os.path.basename(list_path))
+        remote_archive = "%s/%s" % (self.device_cache_root,
+                                    os.path.basename(archive_path))
+        try:
+            with open(list_path, "w", encoding="utf-8", newline="\n") as file_desc:
+                file_desc.write("".join(["./%s\n" % rel_path
+                                         for rel_path in file_list]))
+            self.device.push_file(list_path, remote_list)
+            output = self._execute(
+                "(cd {0} && tar -czf {1} -T {2}) && echo {3}; rm -f {2}".format(
+                    self.device_corpus, remote_archive, remote_list,
+                    SYNC_DONE_MARK))
+            if SYNC_DONE_MARK not in str(output):
+                LOG.warning("Pack corpus on device failed: %s" % output)
+                return False
+            self.device.pull_file(remote_archive, archive_path)
+            with tarfile.open(archive_path, "r:gz") as archive:
+                archive.extractall(self.host_cache,
+                                   members=self._get_safe_members(archive))
+        except (ExecuteTerminate, DeviceError, OSError,
+                tarfile.TarError) as error:
+            LOG.warning("Pull corpus archive failed: %s" % error)
+            return False
+        finally:
+            self._execute("rm -f %s" % remote_archive)
+        return True
+
+    @classmethod
+    def _get_safe_members(cls, archive):
+        # 只解压语料目录内的普通文件和目录
+        for member in archive.getmembers():
+            name = os.path.normpath(member.name)
+            if os.path.isabs(name) or name.startswith(".."):
+                continue
+            if member.isfile() or member.isdir():
+                yield member
+
+    def _remove_device_files(self, remote_dir, file_list):
+        for index in range(0, len(file_list), REMOVE_BATCH_SIZE):
+            self._execute("(cd %s && rm -f %s)" % (remote_dir, " ".join(
+                ["'%s'" % rel_path for rel_path in
+                 file_list[index:index + REMOVE_BATCH_SIZE]])))
+
+    def _execute(self, command):
+        try:
+            return self.device.execute_shell_command(command)
+        except (ExecuteTerminate, DeviceError) as error:
+            LOG.warning("Execute %s failed: %s" % (command, error))
+            return ""
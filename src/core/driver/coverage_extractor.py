@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+import stat
+import time
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from xdevice import platform_logger
+
+__all__ = ["CoverageExtractor"]
+
+LOG = platform_logger("CoverageExtractor")
+
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+# 成员路径已经检查过，支持解压过滤器的python版本上不再额外过滤
+EXTRACT_KWARGS = {"filter": "fully_trusted"} \
+    if hasattr(tarfile, "fully_trusted_filter") else {}
+
+FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+MODES = stat.S_IWUSR | stat.S_IRUSR
+
+
+class CoverageExtractor(object):
+    """
+    Unpacks the coverage archives pulled from the device on a pool of
+    worker threads, reading each archive as a stream and writing the
+    members straight to their destination, so the next suite does not
+    wait for the gcda data of the previous one.
+
+    The archive size, the unpacked size and the time taken are recorded
+    per suite; wait_all() waits for the pending archives and returns them.
+    """
+    _executor = None
+    _future_list = []
+    _metric_list = []
+    _lock = threading.Lock()
+
+    @classmethod
+    def submit(cls, suite_name, tar_path, dest_dir, src_name, dst_name):
+        # 包内以src_name开头的路径解压到dest_dir/dst_name下，解压后删除压缩包
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=MAX_WORKERS,
+                    thread_name_prefix="CoverageExtractor")
+            future = cls._executor.submit(cls.extract, suite_name, tar_path,
+                                          dest_dir, src_name, dst_name)
+            cls._future_list.append(future)
+
+    @classmethod
+    def wait_all(cls, metrics_path=""):
+        with cls._lock:
+            future_list = cls._future_list
+            cls._future_list = []
+        if future_list:
+            LOG.info("Wait for %s coverage archives to be unpacked" %
+                     len(future_list))
+        for future in future_list:
+            future.result()
+        with cls._lock:
+            metric_list = cls._metric_list
+            cls._metric_list = []
+        if metric_list:
+            LOG.info("Unpacked %s coverage archives: %s bytes to %s bytes "
+                     "in %.2fs" % (
+                         len(metric_list),
+                         sum([metric["archive_bytes"] for metric in metric_list]),
+                         sum([metric["unpacked_bytes"] for metric in metric_list]),
+                         sum([metric["seconds"] for metric in metric_list])))
+            if metrics_path:
+                cls._write_metrics(metrics_path, metric_list)
+        return metric_list
+
+    @classmethod
+    def extract(cls, suite_name, tar_path, dest_dir, src_name, dst_name):
+        start_time = time.time()
+        archive_bytes = 0
+        unpacked_bytes = 0
+        try:
+            archive_bytes = os.path.getsize(tar_path)
+            with tarfile.open(tar_path, "r|gz") as archive:
+                for member in archive:
+                    if not cls._rename_member(member, src_name, dst_name):
+                        continue
+                    archive.extract(member, dest_dir, set_attrs=False,
+                                    **EXTRACT_KWARGS)
+                    if member.isfile():
+                        unpacked_bytes += member.size
+            os.remove(tar_path)
+        except (OSError, tarfile.TarError) as error:
+            LOG.error("Unpack %s failed: %s" % (tar_path, error))
+        metric = {
+            "suite": suite_name,
+            "archive_bytes": archive_bytes,
+            "unpacked_bytes": unpacked_bytes,
+            "seconds": round(time.time() - start_time, 3)
+        }
+        LOG.info("Unpacked coverage of %s: %s bytes to %s bytes in %.2fs" % (
+            suite_name, archive_bytes, unpacked_bytes, metric["seconds"]))
+        with cls._lock:
+            cls._metric_list.append(metric)
+        return metric
+
+    @classmethod
+    def _rename_member(cls, member, src_name, dst_name):
+        # 只解压普通文件和目录，忽略绝对路径和包含".."的路径
+        if not (member.isfile() or member.isdir()):
+            return False
+        name = member.name.replace("\\", "/")
+        while name.startswith("./"):
+            name = name[2:]
+        part_list = name.split("/")
+        if name.startswith("/") or ".." in part_list:
+            return False
+        if part_list[0] == src_name:
+            part_list[0] = dst_name
+        member.name = "/".join(part_list)
+        return True
+
+    @classmethod
+    def _write_metrics(cls, metrics_path, metric_list):
+        os.makedirs(os.path.dirname(metrics_path), exist_ok=True)
+        if os.path.exists(metrics_path):
+            os.remove(metrics_path)
+        with os.fdopen(os.open(metrics_path, FLAGS, MODES), "w") as file_desc:
+            json.dump(metric_list, file_desc, indent=4)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import time
+
+from xdevice import platform_logger
+from xdevice import ExecuteTerminate
+from xdevice import DeviceError
+
+__all__ = ["DeviceProbe", "wait_until"]
+
+LOG = platform_logger("DeviceProbe")
+
+PROBE_INTERVAL = 0.05
+PROBE_MAX_INTERVAL = 0.4
+PROBE_COMMAND_TIMEOUT = 5 * 1000
+# bm dump查询不到应用时的输出，查询到时输出以"<包名>:"开头的应用信息
+BM_DUMP_FAILED = "error: failed to get information"
+
+
+def wait_until(check_func, timeout, interval=PROBE_INTERVAL,
+               max_interval=PROBE_MAX_INTERVAL):
+    # 以指数退避的间隔轮询，状态满足时返回True，超时返回False
+    # check_func返回None表示无法判断状态，此时等满timeout，与原先固定等待一致
+    deadline = time.time() + timeout
+    while True:
+        state = check_func()
+        if state:
+            return True
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+        if state is None:
+            time.sleep(remaining)
+            return False
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, max_interval)
+
+
+class DeviceProbe(object):
+    """
+    Readiness probes of a device, used instead of fixed sleeps.
+
+    Each wait polls the real state until it is reached or the sleep it
+    replaces has passed, so a probe never waits longer than before. The
+    time saved against the fixed sleeps is summed in saved_time.
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.saved_time = 0.0
+
+    def _execute(self, command):
+        try:
+            return str(self.device.execute_shell_command(
+                command, timeout=PROBE_COMMAND_TIMEOUT))
+        except (ExecuteTerminate, DeviceError) as error:
+            LOG.debug("Probe command %s failed: %s" % (command, error))
+            return None
+
+    def _wait(self, name, check_func, sleep_time):
+        start_time = time.time()
+        is_ready = wait_until(check_func, sleep_time)
+        used_time = time.time() - start_time
+        self.saved_time += max(sleep_time - used_time, 0)
+        LOG.debug("Probe %s %s in %.2fs" % (
+            name, "ready" if is_ready else "not ready", used_time))
+        return is_ready
+
+    def is_screen_on(self):
+        output = self._execute("hidumper -s PowerManagerService -a -s")
+        if output is None:
+            return None
+        output = output.upper()
+        if "AWAKE" in output:
+            return True
+        if "INACTIVE" in output or "SLEEP" in output:
+            return False
+        return None
+
+    def is_bundle_installed(self, package_name):
+        output = self._execute("bm dump -n %s" % package_name)
+        if output is None:
+            return None
+        return package_name in output and \
+            not output.strip().startswith(BM_DUMP_FAILED)
+
+    def is_ability_started(self, package_name):
+        output = self._execute("aa dump -a")
+        if output is None:
+            return None
+        return package_name in output
+
+    def wait_screen_on(self, sleep_time=1):
+        return self._wait("screen on", self.is_screen_on, sleep_time)
+
+    def wait_bundle_installed(self, package_name, sleep_time=1):
+        return self._wait("%s installed" % package_name,
+                          lambda: self.is_bundle_installed(package_name),
+                          sleep_time)
+
+    def wait_bundle_uninstalled(self, package_name, sleep_time=1):
+        def _is_uninstalled():
+            is_installed = self.is_bundle_installed(package_name)
+            return None if is_installed is None else not is_installed
+        return self._wait("%s uninstalled" % package_name,
+                          _is_uninstalled, sleep_time)
+
+    def wait_ability_started(self, package_name, sleep_time=1):
+        return self._wait("%s started" % package_name,
+                          lambda: self.is_ability_started(package_name),
+                          sleep_time)
+
+    def skip_wait(self, sleep_time=1):
+        # 后续操作不依赖该命令的结果，不需要等待
+        self.saved_time += sleep_time
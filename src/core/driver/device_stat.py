@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from dataclasses import dataclass
+
+from xdevice import platform_logger
+from xdevice import ExecuteTerminate
+from xdevice import DeviceError
+
+__all__ = ["DeviceFileStat", "stat_device_files"]
+
+LOG = platform_logger("DeviceStat")
+
+STAT_MARK = "DEVICE_STAT"
+STAT_END_MARK = "DEVICE_STAT_END"
+# 单条stat命令查询的路径个数，避免命令行过长
+STAT_BATCH_SIZE = 100
+# shell找不到或无法执行命令时的退出码
+COMMAND_NOT_FOUND_CODES = ["126", "127"]
+
+
+@dataclass
+class DeviceFileStat:
+    path: str
+    exists: bool = False
+    size: int = 0
+    mtime: int = 0
+
+
+def stat_device_files(device, path_list):
+    # 一次查询多个路径是否存在及其大小和修改时间，返回{路径: DeviceFileStat}
+    # 设备不支持stat命令或查询失败时返回None，由调用方逐个查询
+    stat_dic = {}
+    for path in path_list:
+        stat_dic[path] = DeviceFileStat(path)
+    for index in range(0, len(path_list), STAT_BATCH_SIZE):
+        batch_list = path_list[index:index + STAT_BATCH_SIZE]
+        command = "stat -c %s:%%s:%%Y:%%n %s 2>/dev/null; echo %s:$?" % (
+            STAT_MARK, " ".join(batch_list), STAT_END_MARK)
+        try:
+            output = str(device.execute_shell_command(command))
+        except (ExecuteTerminate, DeviceError) as error:
+            LOG.warning("Stat device files failed: %s" % error)
+            return None
+        if not _parse_stat_output(output, stat_dic):
+            LOG.debug("Stat is not supported: %s" % output)
+            return None
+    return stat_dic
+
+
+def _parse_stat_output(output, stat_dic):
+    is_ended = False
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith("%s:" % STAT_END_MARK):
+            is_ended = line.split(":", 1)[1] not in COMMAND_NOT_FOUND_CODES
+            continue
+        if not line.startswith("%s:" % STAT_MARK):
+            continue
+        field_list = line.split(":", 3)
+        if len(field_list) != 4 or field_list[3] not in stat_dic:
+            continue
+        try:
+            size, mtime = int(field_list[1]), int(field_list[2])
+        except ValueError:
+            continue
+        stat_dic[field_list[3]] = DeviceFileStat(field_list[3], True,
+                                                 size, mtime)
+    return is_ended
@@ -20,7 +20,6 @@ import json
 import os
 import re
 import shutil
-import subprocess
 import sys
 import time
 import platform
@@ -48,10 +47,34 @@ from xdevice import platform_logger
 from xdevice import Plugin
 from xdevice import get_plugin
 from ohos.environment.dmlib import process_command_ret
-from core.utils import get_decode
 from core.utils import get_fuzzer_path
 from core.config.resource_manager import ResourceManager
 from core.config.config_manager import FuzzerConfigManager
+from core.driver.binary_cache import DeviceBinaryCache
+from core.driver.push_bundle import PushBundle
+from core.driver.output_receiver import CollectingOutputReceiver
+from core.driver.output_receiver import DisplayOutputReceiver
+from core.driver.output_receiver import OutputTail
+from core.driver.output_receiver import TeeOutputReceiver
+from core.driver.gtest_stream import GTestStreamParser
+from core.driver.gtest_stream import get_live_listeners
+from core.driver.log_follower import DeviceLogFollower
+from core.driver.device_probe import DeviceProbe
+from core.driver.shell_session import ShellSession
+from core.driver.shell_session import ShellSessionDevice
+from core.driver.suite_pipeline import SuitePipeline
+from core.driver.corpus_sync import CorpusSync
+from core.driver.coverage_extractor import CoverageExtractor
+from core.driver.device_stat import stat_device_files
+from core.driver.suite_timeout import SuiteTimeoutModel
+from core.driver.suite_timeout import InactivityWatchdog
+from core.driver.suite_timeout import get_kill_command
+from core.driver.gtest_shard import GTestShardRunner
+from core.driver.gtest_shard import merge_gtest_xml
+from core.driver.test_log import scan_test_log
+from core.driver.test_log import TestLogCompressor
+from core.config.resource_lifetime import DeviceResourceLifetime
+from core.driver.suite_batch import SuiteBatchRunner
 
 __all__ = [
     "CppTestDriver",
@@ -71,52 +94,6 @@ FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL
 MODES = stat.S_IWUSR | stat.S_IRUSR
 
 
-class CollectingOutputReceiver:
-    def __init__(self):
-        self.output = ""
-
-    def __read__(self, output):
-        self.output = "%s%s" % (self.output, output)
-
-    def __error__(self, message):
-        pass
-
-    def __done__(self, result_code="", message=""):
-        pass
-
-
-class DisplayOutputReceiver:
-    def __init__(self):
-        self.output = ""
-        self.unfinished_line = ""
-
-    def __read__(self, output):
-        self.output = "%s%s" % (self.output, output)
-        lines = self._process_output(output)
-        for line in lines:
-            line = line.strip()
-            if line:
-                LOG.info(get_decode(line))
-
-    def __error__(self, message):
-        pass
-
-    def __done__(self, result_code="", message=""):
-        pass
-
-    def _process_output(self, output, end_mark="\n"):
-        content = output
-        if self.unfinished_line:
-            content = "".join((self.unfinished_line, content))
-            self.unfinished_line = ""
-        lines = content.split(end_mark)
-        if content.endswith(end_mark):
-            return lines[:-1]
-        else:
-            self.unfinished_line = lines[-1]
-            return lines[:-1]
-
-
 @dataclass
 class GTestConst(object):
     exec_para_filter = "--gtest_filter"
@@ -136,6 +113,48 @@ def get_device_log_file(report_path, serial=None, log_name="device_log"):
     return device_log_file
 
 
+def _get_test_device(config):
+    # 开启--shell-session时，短命令通过设备的持久shell会话执行，只支持Linux
+    device = config.environment.devices[0]
+    if device and getattr(config, "shell_session", False) and \
+            ShellSession.is_supported():
+        return ShellSessionDevice.wrap(device)
+    return device
+
+
+def _is_pipeline_enabled(config):
+    # --bundle-push时测试套随资源一起push，不经过流水线的暂存目录，推送和拉取结果都不使用流水线
+    return getattr(config, "pipeline", False) and \
+        not getattr(config, "bundle_push", False)
+
+
+def _get_suite_timeout(config, suite_file, default_timeout):
+    # 开启--adaptive-timeout时根据历史耗时计算用例的超时时间，单位秒
+    if not getattr(config, "adaptive_timeout", False):
+        return default_timeout
+    return SuiteTimeoutModel.get_timeout(suite_file, default_timeout)
+
+
+def _get_inactivity_watchdog(config, suite_file, timeout):
+    # 用例没有输出的时间过长时结束设备上的用例进程，使shell命令提前返回
+    if not getattr(config, "adaptive_timeout", False):
+        return None
+    inactivity_timeout = SuiteTimeoutModel.get_inactivity_timeout(timeout)
+    if inactivity_timeout <= 0:
+        return None
+    device = config.device
+    filename = os.path.basename(suite_file)
+    return InactivityWatchdog(
+        inactivity_timeout,
+        lambda: device.execute_shell_command(get_kill_command(filename)),
+        filename)
+
+
+def _record_suite_duration(config, suite_file, duration):
+    if getattr(config, "adaptive_timeout", False):
+        SuiteTimeoutModel.record(suite_file, duration)
+
+
 def get_level_para_string(level_string):
     level_list = list(set(level_string.split(",")))
     level_para_string = ""
@@ -244,21 +263,28 @@ def _create_empty_result_file(filepath, filename, error_message):
     return
 
 
-def _unlock_screen(device):
+def _unlock_screen(device, probe=None):
     device.execute_shell_command("svc power stayon true")
-    time.sleep(1)
+    if probe:
+        probe.wait_screen_on()
+    else:
+        time.sleep(1)
 
 
 def _unlock_device(device):
+    # 屏幕在解锁前已点亮，亮屏探测会立即返回，解锁仍固定等待
     device.execute_shell_command("input keyevent 82")
     time.sleep(1)
     device.execute_shell_command("wm dismiss-keyguard")
     time.sleep(1)
 
 
-def _lock_screen(device):
+def _lock_screen(device, probe=None):
     device.execute_shell_command("svc power stayon false")
-    time.sleep(1)
+    if probe:
+        probe.skip_wait()
+    else:
+        time.sleep(1)
 
 
 def disable_keyguard(device):
@@ -266,11 +292,6 @@ def disable_keyguard(device):
     _unlock_device(device)
 
 
-def _sleep_according_to_result(result):
-    if result:
-        time.sleep(1)
-
-
 def _create_fuzz_crash_file(filepath, filename):
     if not os.path.exists(filepath):
         with os.fdopen(os.open(filepath, FLAGS, MODES), 'w') as file_desc:
@@ -349,6 +370,11 @@ class ResultManager(object):
             self.device_testpath = self.config.target_test_path
         self.testsuite_name = os.path.basename(self.testsuite_path)
         self.is_coverage = False
+        self.device_stat_dic = None
+        self.pipeline = None
+        if _is_pipeline_enabled(self.config) and self.device:
+            self.pipeline = SuitePipeline.get_pipeline(self.device,
+                                                       DEFAULT_TEST_PATH)
 
     def set_is_coverage(self, is_coverage):
         self.is_coverage = is_coverage
@@ -374,18 +400,58 @@ class ResultManager(object):
 
         return filepath
 
+    def get_test_results_live(self, live_parser, error_message=""):
+        # 设备上的xml为准，用解析结果补充xml中缺少的用例，没有xml时保留已执行完的用例
+        result_file_path, _ = self.obtain_test_result_file()
+        if os.path.exists(result_file_path):
+            if result_file_path.endswith(".xml"):
+                live_parser.reconcile_result_file(result_file_path,
+                                                  error_message)
+        elif live_parser.case_count:
+            live_parser.write_result_file(result_file_path, error_message)
+        else:
+            _create_empty_result_file(result_file_path, self.testsuite_name,
+                                      error_message)
+        # Get coverage data files
+        if self.is_coverage:
+            self.obtain_coverage_data()
+
+        return result_file_path
+
+    def get_test_results_shard(self, xml_list, error_message="",
+                               elapsed_time=None):
+        # 分片执行时合并各分片的结果文件，不再拉取设备上的xml
+        result_file_path = os.path.join(
+            get_result_savepath(self.testsuite_path, self.result_rootpath),
+            "%s.xml" % self.testsuite_name)
+        if not merge_gtest_xml(xml_list, result_file_path, elapsed_time):
+            _create_empty_result_file(result_file_path, self.testsuite_name,
+                                      error_message)
+        return result_file_path
+
+    def get_test_results_batch(self, batch_result):
+        # 批量执行时结果文件已随整批拉取到本地，不再查询和拉取设备上的文件
+        result_file_path = os.path.join(
+            get_result_savepath(self.testsuite_path, self.result_rootpath),
+            "%s.xml" % self.testsuite_name)
+        if batch_result.xml_file:
+            shutil.move(batch_result.xml_file, result_file_path)
+        else:
+            _create_empty_result_file(result_file_path, self.testsuite_name,
+                                      batch_result.message)
+        return result_file_path
+
     def get_test_results_hidelog(self, error_message=""):
         # Get test result files
         result_file_path, test_log_path = self.obtain_test_result_file()
-        log_content = ""
-        if not error_message:
-            if os.path.exists(test_log_path):
-                with open(test_log_path, "r") as log:
-                    log_content = log.readlines()
-            else:
-                LOG.error("{}: Test log not exist.".format(test_log_path))
-        else:
-            log_content = error_message
+        log_content = error_message
+        if os.path.exists(test_log_path):
+            # 日志可能很大，只保留标记所在行和末尾部分作为错误信息，完整日志压缩保存
+            if not error_message:
+                log_content = scan_test_log(test_log_path)
+            TestLogCompressor.submit(test_log_path)
+        elif not error_message:
+            LOG.error("{}: Test log not exist.".format(test_log_path))
 
         if "fuzztest" == self.config.testtype[0]:
             LOG.info("create fuzz test report")
@@ -425,21 +491,13 @@ class ResultManager(object):
         result_josn_file_path = os.path.join(result_save_path,
                                              "%s.json" % self.testsuite_name)
 
-        if self.testsuite_path.endswith('.hap'):
-            remote_result_file = os.path.join(self.device_testpath,
-                                              "testcase_result.xml")
-            remote_json_result_file = os.path.join(self.device_testpath,
-                                                   "%s.json" % self.testsuite_name)
-        else:
-            remote_result_file = os.path.join(self.device_testpath,
-                                              "%s.xml" % self.testsuite_name)
-            remote_json_result_file = os.path.join(self.device_testpath,
-                                                   "%s.json" % self.testsuite_name)
+        remote_result_file, remote_json_result_file = \
+            self._get_remote_result_files()
 
         if self.config.testtype[0] != "fuzztest":
-            if self.device.is_file_exist(remote_result_file):
+            if self.is_device_file_exist(remote_result_file):
                 self.device.pull_file(remote_result_file, result_file_path)
-            elif self.device.is_file_exist(remote_json_result_file):
+            elif self.is_device_file_exist(remote_json_result_file):
                 self.device.pull_file(remote_json_result_file,
                                       result_josn_file_path)
                 result_file_path = result_josn_file_path
@@ -447,16 +505,59 @@ class ResultManager(object):
                 LOG.info("%s not exist", remote_result_file)
 
         if self.config.hidelog:
-            remote_log_result_file = os.path.join(self.device_testpath,
-                                                  "%s.log" % self.testsuite_name)
+            remote_log_result_file = self._get_remote_log_file()
             test_log_save_path = get_test_log_savepath(self.result_rootpath, result_save_path)
             test_log_file_path = os.path.join(test_log_save_path,
                                               "%s.log" % self.testsuite_name)
-            self.device.pull_file(remote_log_result_file, test_log_file_path)
+            if self.is_device_file_exist(remote_log_result_file):
+                self.device.pull_file(remote_log_result_file, test_log_file_path)
             return result_file_path, test_log_file_path
 
         return result_file_path, ""
 
+    def _get_remote_result_files(self):
+        if self.testsuite_path.endswith('.hap'):
+            remote_result_file = os.path.join(self.device_testpath,
+                                              "testcase_result.xml")
+        else:
+            remote_result_file = os.path.join(self.device_testpath,
+                                              "%s.xml" % self.testsuite_name)
+        remote_json_result_file = os.path.join(self.device_testpath,
+                                               "%s.json" % self.testsuite_name)
+        return remote_result_file, remote_json_result_file
+
+    def _get_remote_log_file(self):
+        return os.path.join(self.device_testpath,
+                            "%s.log" % self.testsuite_name)
+
+    def _get_coverage_target_name(self):
+        if os.path.basename(self.testsuite_name).startswith("rust_"):
+            return "lib.unstripped"
+        return OBJ
+
+    def _get_expected_artifacts(self):
+        # 本测试套执行后可能需要从设备拉取的文件
+        path_list = list(self._get_remote_result_files())
+        if self.config.hidelog:
+            path_list.append(self._get_remote_log_file())
+        if self.is_coverage:
+            path_list.append(os.path.join(DEFAULT_TEST_PATH,
+                                          self._get_coverage_target_name()))
+        return path_list
+
+    def is_device_file_exist(self, remote_file, check_func=None):
+        # 首次判断时用一条命令查询所有可能拉取的文件，之后的判断都使用该结果
+        # 设备不支持批量查询时逐个查询
+        if self.device_stat_dic is None:
+            self.device_stat_dic = stat_device_files(
+                self.device, self._get_expected_artifacts()) or {}
+        file_stat = self.device_stat_dic.get(remote_file)
+        if file_stat is not None:
+            return file_stat.exists
+        if check_func is not None:
+            return check_func()
+        return self.device.is_file_exist(remote_file)
+
     def make_empty_result_file(self, error_message=""):
         result_savepath = get_result_savepath(self.testsuite_path,
                                               self.result_rootpath)
@@ -497,11 +598,11 @@ class ResultManager(object):
             "cxx",
             self.testsuite_name + '_' + test_type))
 
-        if os.path.basename(self.testsuite_name).startswith("rust_"):
-            target_name = "lib.unstripped"
-        else:
-            target_name = OBJ
-        if self.is_exist_target_in_device(DEFAULT_TEST_PATH, target_name):
+        target_name = self._get_coverage_target_name()
+        if self.is_device_file_exist(
+                os.path.join(DEFAULT_TEST_PATH, target_name),
+                lambda: self.is_exist_target_in_device(DEFAULT_TEST_PATH,
+                                                       target_name)):
             if not os.path.exists(cxx_cov_path):
                 os.makedirs(cxx_cov_path)
             else:
@@ -509,26 +610,37 @@ class ResultManager(object):
             self.config.device.execute_shell_command(
                 "cd %s; tar -czf %s.tar.gz %s" % (DEFAULT_TEST_PATH, target_name, target_name))
             src_file_tar = os.path.join(DEFAULT_TEST_PATH, "%s.tar.gz" % target_name)
-            self.device.pull_file(src_file_tar, cxx_cov_path, is_create=True, timeout=TIME_OUT)
-            tar_path = os.path.join(cxx_cov_path, "%s.tar.gz" % target_name)
-            if platform.system() == "Windows":
-                process = subprocess.Popen("tar -zxf %s -C %s" % (tar_path, cxx_cov_path), shell=True)
-                process.communicate()
-                os.remove(tar_path)
-                os.rename(os.path.join(cxx_cov_path, target_name), os.path.join(cxx_cov_path, OBJ))
-            else:
-                subprocess.Popen("tar -zxf %s -C %s > /dev/null 2>&1" %
-                                 (tar_path, cxx_cov_path), shell=True).communicate()
-                subprocess.Popen("rm -rf %s" % tar_path, shell=True).communicate()
-                if target_name != OBJ:
-                    subprocess.Popen("mv %s %s" % (os.path.join(cxx_cov_path, target_name),
-                                                   os.path.join(cxx_cov_path, OBJ)), shell=True).communicate()
+            if self.pipeline is not None:
+                # 覆盖率数据移出测试目录后在后台拉取，不阻塞下一个测试套
+                stage_file_tar = self.pipeline.move_to_stage(
+                    src_file_tar, "%s_%s.tar.gz" % (self.testsuite_name,
+                                                    target_name))
+                if stage_file_tar:
+                    self.pipeline.submit(
+                        "coverage of %s" % self.testsuite_name,
+                        self._pull_coverage_data, stage_file_tar,
+                        cxx_cov_path, target_name)
+                    return
+            self._pull_coverage_data(src_file_tar, cxx_cov_path, target_name)
+
+    def _pull_coverage_data(self, src_file_tar, cxx_cov_path, target_name):
+        self.device.pull_file(src_file_tar, cxx_cov_path, is_create=True, timeout=TIME_OUT)
+        tar_path = os.path.join(cxx_cov_path, os.path.basename(src_file_tar))
+        if self.pipeline is not None:
+            self.device.execute_shell_command("rm -f %s" % src_file_tar)
+        # 在后台线程中解压，target_name目录解压为OBJ目录
+        CoverageExtractor.submit(self.testsuite_name, tar_path, cxx_cov_path,
+                                 target_name, OBJ)
     
     def _obtain_fuzz_corpus(self):
-        command = f"cd {DEFAULT_TEST_PATH}; tar czf {self.testsuite_name}_corpus.tar.gz corpus;"
-        self.config.device.execute_shell_command(command)
         result_save_path = get_result_savepath(self.testsuite_path, self.result_rootpath)
         LOG.info(f"fuzz_dir = {result_save_path}")
+        corpus_sync = CorpusSync(self.config.device, self.testsuite_name,
+                                 DEFAULT_TEST_PATH)
+        if corpus_sync.pull(result_save_path):
+            return
+        command = f"cd {DEFAULT_TEST_PATH}; tar czf {self.testsuite_name}_corpus.tar.gz corpus;"
+        self.config.device.execute_shell_command(command)
         self.device.pull_file(f"{DEFAULT_TEST_PATH}/{self.testsuite_name}_corpus.tar.gz", result_save_path)
 
     def _obtain_benchmark_result(self):
@@ -539,12 +651,16 @@ class ResultManager(object):
                          self.get_result_sub_save_path(),
                          self.testsuite_name))
 
+        _, remote_json_result_file = self._get_remote_result_files()
+        if not self.is_device_file_exist(remote_json_result_file):
+            LOG.info("%s not exist", remote_json_result_file)
+            return benchmark_dir
+
         if not os.path.exists(benchmark_dir):
             os.makedirs(benchmark_dir)
 
         LOG.info("benchmark_dir = %s" % benchmark_dir)
-        self.device.pull_file(os.path.join(self.device_testpath,
-                                           "%s.json" % self.testsuite_name), benchmark_dir)
+        self.device.pull_file(remote_json_result_file, benchmark_dir)
         if not os.path.exists(os.path.join(benchmark_dir,
                                            "%s.json" % self.testsuite_name)):
             os.rmdir(benchmark_dir)
@@ -578,7 +694,7 @@ class CppTestDriver(IDriver):
         try:
             self.config = request.config
             self.config.target_test_path = DEFAULT_TEST_PATH
-            self.config.device = request.config.environment.devices[0]
+            self.config.device = _get_test_device(request.config)
             self.config.test_level_dict = request.config.test_level_dict
 
             suite_file = request.root.source.source_file
@@ -650,8 +766,12 @@ class CppTestDriver(IDriver):
     def _init_gtest(self):
         self.config.device.connector_command("target mount")
         if self._check_shell_path(self.config.target_test_path):
-            self.config.device.execute_shell_command(
-                f"rm -rf {os.path.join(self.config.target_test_path, '*')}")
+            lifetime = self._get_resource_lifetime()
+            if lifetime is not None:
+                lifetime.clear_test_path(self.config.target_test_path)
+            else:
+                self.config.device.execute_shell_command(
+                    f"rm -rf {os.path.join(self.config.target_test_path, '*')}")
         else:
             self.config.device.execute_shell_command(
             "mkdir -p %s" % self.config.target_test_path)
@@ -715,20 +835,24 @@ class CppTestDriver(IDriver):
         else:
             self.rerun = True
 
-    def _gtest_command(self, suite_file):
+    def _get_gtest_para(self, suite_file):
         filename = os.path.basename(suite_file)
         if self.config.testcase:
             testcase = self.config.testcase
         else:
             testcase = self.config.testcase_dict.get("CXX", {}).get(filename, "")
-        test_para = self._get_test_para(testcase,
-                                        self.config.testlevel,
-                                        self.config.testtype,
-                                        self.config.target_test_path,
-                                        suite_file,
-                                        filename,
-                                        self.config.iteration,
-                                        self.config.test_level_dict.get(suite_file, ""))
+        return self._get_test_para(testcase,
+                                   self.config.testlevel,
+                                   self.config.testtype,
+                                   self.config.target_test_path,
+                                   suite_file,
+                                   filename,
+                                   self.config.iteration,
+                                   self.config.test_level_dict.get(suite_file, ""))
+
+    def _gtest_command(self, suite_file):
+        filename = os.path.basename(suite_file)
+        test_para = self._get_gtest_para(suite_file)
 
         # execute testcase
         if not self.config.coverage:
@@ -779,58 +903,281 @@ class CppTestDriver(IDriver):
     def _run_gtest(self, suite_file, request=None):
         from xdevice import Variables
         is_coverage_test = True if self.config.coverage else False
+        if self._run_gtest_batch(suite_file):
+            return
 
-        # push testsuite file
-        self.config.device.push_file(suite_file, self.config.target_test_path)
-        if self.config.hilogswitch != "0":
-            self.config.device.execute_shell_command(
-                "hilog -d %s" % (os.path.join(self.config.target_test_path,
-                                              os.path.basename(suite_file)))
-            )
-        self._push_corpus_if_exist(suite_file)
-
-        # push resource files
         resource_manager = ResourceManager()
         resource_data_dic, resource_dir = resource_manager.get_resource_data_dic(suite_file)
-        resource_manager.process_preparer_data(resource_data_dic, resource_dir,
-                                               self.config.device)
+        if getattr(self.config, "bundle_push", False):
+            self._push_suite_bundle(suite_file, resource_manager,
+                                    resource_data_dic, resource_dir)
+        else:
+            # push testsuite file
+            pipeline = self._get_pipeline()
+            if pipeline is None or not pipeline.take_staged_suite(
+                    suite_file, self.config.target_test_path):
+                self._push_suite_file(suite_file)
+            if self.config.hilogswitch != "0":
+                self.config.device.execute_shell_command(
+                    self._hilog_command(suite_file))
+            self._push_corpus_if_exist(suite_file)
+
+            # push resource files
+            resource_manager.process_preparer_data(
+                resource_data_dic, resource_dir, self.config.device,
+                self._get_resource_lifetime())
 
-        command = self._gtest_command(suite_file)
         result = ResultManager(suite_file, self.config)
         result.set_is_coverage(is_coverage_test)
+        if self._run_gtest_shards(suite_file, result, resource_data_dic,
+                                  resource_dir):
+            self._clean_gtest(request, resource_manager, resource_data_dic,
+                              resource_dir)
+            return
 
+        command = self._gtest_command(suite_file)
+
+        # 完整的shell输出写入日志文件，内存中只保留末尾部分
+        output_log_file = get_device_log_file(
+            self.config.report_path, self.config.device.__get_serial__(),
+            "shell_output_%s" % os.path.basename(suite_file))
+        live_parser = self._get_live_parser(suite_file, request)
+        timeout = _get_suite_timeout(self.config, suite_file, TIME_OUT / 1000)
+        # hidelog时输出重定向到设备上的文件，无法根据输出判断是否挂死
+        watchdog = None if self.config.hidelog else \
+            _get_inactivity_watchdog(self.config, suite_file, timeout)
+        pipeline = self._get_pipeline()
+        if pipeline is not None:
+            # 执行当前测试套的同时预取下一个测试套
+            testdict = getattr(self.config, "testdict", None) or {}
+            pipeline.stage_next_suite(suite_file, testdict.get("CXX", []))
+        start_time = time.time()
+        is_finished = False
         try:
             # get result
             if self.config.hidelog:
                 return_message = ""
-                display_receiver = CollectingOutputReceiver()
+                display_receiver = CollectingOutputReceiver(output_log_file)
                 self.config.device.execute_shell_command(
                     command,
                     receiver=display_receiver,
-                    timeout=TIME_OUT,
+                    timeout=int(timeout * 1000),
                     retry=0)
             else:
-                display_receiver = DisplayOutputReceiver()
+                display_receiver = DisplayOutputReceiver(output_log_file)
+                receiver_list = [display_receiver]
+                if live_parser is not None:
+                    receiver_list.append(live_parser)
+                if watchdog is not None:
+                    receiver_list.append(watchdog)
+                    watchdog.start()
+                receiver = display_receiver if len(receiver_list) == 1 else \
+                    TeeOutputReceiver(receiver_list)
                 self.config.device.execute_shell_command(
                     command,
-                    receiver=display_receiver,
-                    timeout=TIME_OUT,
+                    receiver=receiver,
+                    timeout=int(timeout * 1000),
                     retry=0)
                 return_message = display_receiver.output
+            is_finished = True
         except (ExecuteTerminate, DeviceError) as exception:
-            return_message = str(exception.args)
-
-        if self.config.hidelog:
+            return_message = OutputTail.truncate(str(exception.args))
+        finally:
+            display_receiver.close()
+            if live_parser is not None:
+                live_parser.__done__()
+            if watchdog is not None:
+                watchdog.stop()
+        duration = time.time() - start_time
+        # 超时结束的耗时作为下限记录，挂死的用例不记录
+        if (is_finished or duration >= timeout) and \
+                not (watchdog is not None and watchdog.is_triggered):
+            _record_suite_duration(self.config, suite_file, duration)
+
+        if live_parser is not None:
+            self.result = result.get_test_results_live(live_parser,
+                                                       return_message)
+        elif self.config.hidelog:
             self.result = result.get_test_results_hidelog(return_message)
         else:
             self.result = result.get_test_results(return_message)
+        if (getattr(self.config, "batch_suites", 0) or 0) >= 2:
+            # 记录单独执行的测试套的耗时，耗时短的测试套之后可以批量执行
+            SuiteBatchRunner.record_duration(suite_file, self.result)
 
+        self._clean_gtest(request, resource_manager, resource_data_dic,
+                          resource_dir)
+
+    def _clean_gtest(self, request, resource_manager, resource_data_dic,
+                     resource_dir):
         if request and request.root.source.config_file:
             do_module_kit_teardown(request)
         else:
-            resource_manager.process_cleaner_data(resource_data_dic,
-                                                  resource_dir,
-                                                  self.config.device)
+            resource_manager.process_cleaner_data(
+                resource_data_dic, resource_dir, self.config.device,
+                self._get_resource_lifetime())
+
+    def _run_gtest_batch(self, suite_file):
+        # 开启--batch-suites时，多个短测试套由设备上的一个脚本连续执行，返回是否已有结果
+        batch_size = getattr(self.config, "batch_suites", 0) or 0
+        if batch_size < 2:
+            return False
+        batch_result = SuiteBatchRunner.take_result(suite_file)
+        if batch_result is None and self._is_batch_suite(suite_file):
+            hilog_command = "hilog -d" if self.config.hilogswitch != "0" \
+                else ""
+            batch_runner = SuiteBatchRunner(
+                self.config.device, batch_size, self.config.target_test_path,
+                self._get_batch_suite_setting,
+                lambda serial, name: get_device_log_file(
+                    self.config.report_path, serial, name), hilog_command)
+            testdict = getattr(self.config, "testdict", None) or {}
+            if batch_runner.run_batch(suite_file, testdict.get("CXX", []),
+                                      self._is_batch_suite):
+                batch_result = SuiteBatchRunner.take_result(suite_file)
+        if batch_result is None:
+            return False
+        result = ResultManager(suite_file, self.config)
+        self.result = result.get_test_results_batch(batch_result)
+        return True
+
+    def _is_batch_suite(self, suite_file):
+        # 只批量执行历史耗时短、没有resource配置、不分片的普通gtest测试套
+        if self.config.coverage or self.config.hidelog or \
+                self.config.testtype[0] in ["fuzztest", "benchmark",
+                                            "acts", "hits"]:
+            return False
+        if not os.path.isfile(suite_file) or \
+                not SuiteBatchRunner.is_short_suite(suite_file):
+            return False
+        resource_data_dic, _ = ResourceManager().get_resource_data_dic(
+            suite_file)
+        for key in ["preparer", "cleaner"]:
+            if [item for item in resource_data_dic.get(key, [])
+                    if "name" in item.keys()]:
+                return False
+        if (getattr(self.config, "gtest_shard", 0) or 0) >= 2 and \
+                GTestShardRunner.get_shard_setting(resource_data_dic):
+            return False
+        return True
+
+    def _get_batch_suite_setting(self, suite_file):
+        test_para = self._get_gtest_para(suite_file)
+        if self.config.random == "random":
+            test_para += " --gtest_shuffle --gtest_random_seed=%d" % \
+                random.randint(1, 100)
+        return test_para, _get_suite_timeout(self.config, suite_file,
+                                             TIME_OUT / 1000)
+
+    def _get_resource_lifetime(self):
+        # 开启--share-resource时，连续的测试套push相同资源只push一次
+        if not getattr(self.config, "share_resource", False):
+            return None
+        return DeviceResourceLifetime.get_device_lifetime(self.config.device)
+
+    def _run_gtest_shards(self, suite_file, result, resource_data_dic,
+                          resource_dir):
+        # 开启--gtest-shard且ohos_test.xml中配置了<shard>时分片执行，返回是否已执行
+        shard_count = getattr(self.config, "gtest_shard", 0) or 0
+        if shard_count < 2 or self.config.coverage or \
+                self.config.testtype[0] in ["fuzztest", "benchmark"]:
+            return False
+        filename = os.path.basename(suite_file)
+        if self.config.testcase or \
+                self.config.testcase_dict.get("CXX", {}).get(filename, ""):
+            # 指定了用例时不分片
+            return False
+        shard_setting = GTestShardRunner.get_shard_setting(resource_data_dic)
+        if shard_setting is None:
+            return False
+        test_para = self._get_test_para("",
+                                        self.config.testlevel,
+                                        self.config.testtype,
+                                        self.config.target_test_path,
+                                        suite_file,
+                                        filename,
+                                        self.config.iteration,
+                                        self.config.test_level_dict.get(suite_file, ""))
+        timeout = _get_suite_timeout(self.config, suite_file, TIME_OUT / 1000)
+        shard_runner = GTestShardRunner(self.config, suite_file, test_para,
+                                        shard_setting, timeout)
+        try:
+            shard_count = shard_runner.prepare(shard_count, resource_data_dic,
+                                               resource_dir)
+            if shard_count < 2:
+                LOG.info("No idle device to shard %s, run it as a whole" %
+                         filename)
+                return False
+            xml_list, return_message, elapsed_time = shard_runner.run(
+                shard_count, lambda serial, name: get_device_log_file(
+                    self.config.report_path, serial, name))
+            self.result = result.get_test_results_shard(
+                xml_list, return_message, elapsed_time)
+            shard_runner.clean(resource_data_dic, resource_dir)
+        finally:
+            shard_runner.release()
+        return True
+
+    def _get_pipeline(self):
+        if not _is_pipeline_enabled(self.config):
+            return None
+        return SuitePipeline.get_pipeline(self.config.device,
+                                          self.config.target_test_path)
+
+    def _get_live_parser(self, suite_file, request):
+        # 实时解析gtest输出并上报用例结果，fuzz和benchmark用例的输出格式不同，不做解析
+        if not getattr(self.config, "live_result", False) or \
+                self.config.hidelog or \
+                self.config.testtype[0] in ["fuzztest", "benchmark"]:
+            return None
+        listeners = []
+        if request:
+            listeners = get_live_listeners(request.listeners)
+            for listener in listeners:
+                listener.device_sn = self.config.device.device_sn
+        return GTestStreamParser(os.path.basename(suite_file), listeners)
+
+    def _hilog_command(self, suite_file):
+        return "hilog -d %s" % (os.path.join(self.config.target_test_path,
+                                             os.path.basename(suite_file)))
+
+    def _push_suite_file(self, suite_file):
+        binary_cache = DeviceBinaryCache.get_device_cache(self.config.device)
+        if binary_cache is not None:
+            return binary_cache.push_file(suite_file, self.config.target_test_path)
+        self.config.device.push_file(suite_file, self.config.target_test_path)
+        return False
+
+    def _push_suite_bundle(self, suite_file, resource_manager,
+                           resource_data_dic, resource_dir):
+        # 测试套和preparer开头的push资源打包后一次传输，在设备上用一条命令解包
+        push_bundle = PushBundle(self.config.device,
+                                 os.path.basename(suite_file))
+        binary_cache = DeviceBinaryCache.get_device_cache(self.config.device)
+        if binary_cache is not None:
+            binary_cache.push_file(suite_file, self.config.target_test_path)
+        else:
+            push_bundle.add(suite_file, self.config.target_test_path)
+
+        preparer_list = resource_data_dic.get("preparer", [])
+        lifetime = self._get_resource_lifetime()
+        if lifetime is not None:
+            preparer_list = lifetime.acquire(resource_dir, preparer_list)
+        push_list, preparer_list = resource_manager.split_push_items(
+            resource_dir, preparer_list)
+        for src, dst in push_list:
+            push_bundle.add(src, dst)
+        post_command = ""
+        if self.config.hilogswitch != "0":
+            post_command = self._hilog_command(suite_file)
+        push_bundle.send(post_command)
+        self._push_corpus_if_exist(suite_file)
+
+        if preparer_list:
+            resource_manager.process_resource_file(resource_dir, preparer_list,
+                                                   self.config.device)
+        if lifetime is not None:
+            lifetime.commit()
 
     def _push_corpus_cov_if_exist(self, suite_file):
         corpus_path = suite_file.split("fuzztest")[-1].strip(os.sep)
@@ -845,6 +1192,18 @@ class CppTestDriver(IDriver):
             if not os.path.isdir(corpus_path):
                 return
 
+            corpus_init_list = []
+            for root, _, files in os.walk(corpus_path):
+                if "init" in files:
+                    corpus_init_list.append(os.path.join(root, "init"))
+            for init_file in corpus_init_list:
+                self._alter_init(init_file)
+            corpus_sync = CorpusSync(self.config.device,
+                                     os.path.basename(suite_file),
+                                     self.config.target_test_path)
+            if corpus_sync.push(corpus_path):
+                return
+
             corpus_dirs = []
             corpus_file_list = []
 
@@ -859,8 +1218,6 @@ class CppTestDriver(IDriver):
                 for file in files:
                     cp_file = os.path.normcase(os.path.join(root, file))
                     corpus_file_list.append(cp_file)
-                    if file == "init":
-                        self._alter_init(cp_file)
 
             # mkdir corpus files dir
             if corpus_dirs:
@@ -935,6 +1292,8 @@ class JSUnitTestDriver(IDriver):
         # log
         self.hilog = None
         self.hilog_proc = None
+        self.log_follower = None
+        self.probe = None
     
     def __check_environment__(self, device_options):
         pass
@@ -950,7 +1309,8 @@ class JSUnitTestDriver(IDriver):
             LOG.info("developer_test driver")
             self.config = request.config
             self.config.target_test_path = DEFAULT_TEST_PATH
-            self.config.device = request.config.environment.devices[0]
+            self.config.device = _get_test_device(request.config)
+            self.probe = DeviceProbe(self.config.device)
 
             self.suite_file = request.root.source.source_file
             result_save_path = get_result_savepath(self.suite_file, self.config.report_path)
@@ -997,6 +1357,9 @@ class JSUnitTestDriver(IDriver):
                     '.'.join((request.get_module_name(), "xml")))
                 shutil.move(xml_path, self.result)
         finally:
+            if self.probe and self.probe.saved_time:
+                LOG.info("Readiness probes saved %.1fs in %s" % (
+                    self.probe.saved_time, request.get_module_name()))
             self.config.device.device_log_collector.remove_log_address(None, self.hilog)
             self.config.device.device_log_collector.stop_catch_device_log(self.hilog_proc)
             update_xml(request.root.source.source_file, self.result)
@@ -1120,7 +1483,10 @@ class JSUnitTestDriver(IDriver):
         return package_name, ability_name
 
     def generate_console_output(self, device_log_file, request):
-        result_message = self.read_device_log(device_log_file)
+        if self.log_follower is not None:
+            result_message = self.log_follower.get_result_message()
+        else:
+            result_message = self.read_device_log(device_log_file)
 
         report_name = request.get_module_name()
         parsers = get_plugin(
@@ -1170,7 +1536,8 @@ class JSUnitTestDriver(IDriver):
                 LOG.info("execute %s's testcase failed. result value=%s"
                          % (self.package_name, result_value))
 
-            _sleep_according_to_result(result_value)
+            if result_value:
+                self.probe.wait_ability_started(self.package_name)
             return_message = result_value
         except (ExecuteTerminate, DeviceError) as exception:
             return_message = exception.args
@@ -1204,32 +1571,31 @@ class JSUnitTestDriver(IDriver):
         main_result = self._install_hap(suite_file)
         result = ResultManager(suite_file, self.config)
         if main_result:
-            self._execute_hapfile_jsunittest()
+            # 边写边读设备日志，出现结束标记后立即结束等待
+            self.log_follower = DeviceLogFollower(device_log_file,
+                                                  _ACE_LOG_MARKER)
             try:
-                status = False
-                actiontime = JS_TIMEOUT
-                times = CYCLE_TIMES
-                if timeout:
-                    actiontime = timeout
-                    times = 1
-                with open(device_log_file, "r", encoding='utf-8',
-                          errors='ignore') as file_read_pipe:
-                    for i in range(0, times):
-                        if status:
-                            break
-                        else:
-                            time.sleep(float(actiontime))
-                        start_time = int(time.time())
-                        while True:
-                            data = file_read_pipe.readline()
-                            if data.lower().find(_ACE_LOG_MARKER) != -1 and data.find("[end] run suites end") != -1:
-                                LOG.info("execute testcase successfully.")
-                                status = True
-                                break
-                            if int(time.time()) - start_time > 5:
-                                break
+                self.log_follower.start()
+                self._execute_hapfile_jsunittest()
+                # 用例配置了超时时间时以配置为准
+                wait_time = float(timeout) if timeout else \
+                    _get_suite_timeout(self.config, suite_file,
+                                       JS_TIMEOUT * CYCLE_TIMES)
+                inactivity_timeout = SuiteTimeoutModel.get_inactivity_timeout(
+                    wait_time) if getattr(self.config, "adaptive_timeout",
+                                          False) else 0
+                if self.log_follower.wait(wait_time, inactivity_timeout):
+                    LOG.info("execute testcase successfully.")
+                    _record_suite_duration(self.config, suite_file,
+                                           time.time() - self.start_time)
+                elif self.log_follower.is_inactive:
+                    LOG.error("%s is hung, stop waiting" % self.package_name)
+                else:
+                    LOG.warning("run suites end is not found in %ss" %
+                                wait_time)
             finally:
-                _lock_screen(self.config.device)
+                self.log_follower.stop()
+                _lock_screen(self.config.device, self.probe)
                 self._uninstall_hap(self.package_name)
         else:
             self.result = result.get_test_results("Error: install hap failed")
@@ -1238,7 +1604,7 @@ class JSUnitTestDriver(IDriver):
         resource_manager.process_cleaner_data(resource_data_dic, resource_dir, self.config.device)
 
     def _execute_hapfile_jsunittest(self):
-        _unlock_screen(self.config.device)
+        _unlock_screen(self.config.device, self.probe)
         _unlock_device(self.config.device)
 
         try:
@@ -1260,13 +1626,15 @@ class JSUnitTestDriver(IDriver):
             if message != "":
                 LOG.warning(message)
 
-        _sleep_according_to_result(return_code)
+        if return_code:
+            self.probe.wait_bundle_installed(self.package_name)
         return return_code
 
     def _uninstall_hap(self, package_name):
         return_message = self.config.device.execute_shell_command(
             "bm uninstall -n %s" % package_name)
-        _sleep_according_to_result(return_message)
+        if return_message:
+            self.probe.wait_bundle_uninstalled(package_name)
         return return_message
 
 
@@ -1287,7 +1655,7 @@ class OHRustTestDriver(IDriver):
         try:
             LOG.debug("Start to execute open harmony rust test")
             self.config = request.config
-            self.config.device = request.config.environment.devices[0]
+            self.config.device = _get_test_device(request.config)
             self.config.target_test_path = DEFAULT_TEST_PATH
             suite_file = request.root.source.source_file
             LOG.debug("Testsuite filepath:{}".format(suite_file))
@@ -1368,8 +1736,23 @@ class OHRustTestDriver(IDriver):
         else:
             command = "cd {}; chmod +x *; ./{}".format(
                 self.config.target_test_path, os.path.basename(suite_file))
-        self.config.device.execute_shell_command(
-            command, timeout=TIME_OUT, receiver=handler, retry=0)
+        timeout = _get_suite_timeout(self.config, suite_file, TIME_OUT / 1000)
+        watchdog = _get_inactivity_watchdog(self.config, suite_file, timeout)
+        receiver = handler
+        if watchdog is not None:
+            receiver = TeeOutputReceiver([handler, watchdog])
+            watchdog.start()
+        start_time = time.time()
+        try:
+            self.config.device.execute_shell_command(
+                command, timeout=int(timeout * 1000), receiver=receiver,
+                retry=0)
+        finally:
+            if watchdog is not None:
+                watchdog.stop()
+        if watchdog is None or not watchdog.is_triggered:
+            _record_suite_duration(self.config, suite_file,
+                                   time.time() - start_time)
         if self.config.coverage:
             result = ResultManager(suite_file, self.config)
             result.obtain_coverage_data()
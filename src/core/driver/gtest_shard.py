@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import stat
+import time
+import shutil
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+
+from xdevice import platform_logger
+from xdevice import ExecuteTerminate
+from xdevice import DeviceError
+from xdevice import EnvironmentManager
+from xdevice import DeviceSelectionOption
+from core.config.resource_manager import ResourceManager
+from core.driver.output_receiver import CollectingOutputReceiver
+
+__all__ = ["GTestShardRunner", "merge_gtest_xml",
+           "get_online_device_sn_list"]
+
+LOG = platform_logger("GTestShard")
+
+SHARD_NAME = "%s_shard%s"
+SERIAL_NAME = "%s_serial%s"
+# 合并结果时累加的计数属性
+COUNT_ATTRIB_LIST = ["tests", "failures", "disabled", "errors", "skipped"]
+
+FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+MODES = stat.S_IWUSR | stat.S_IRUSR
+
+
+def _add_attrib(element, other, name):
+    if element.get(name) is None and other.get(name) is None:
+        return
+    try:
+        value = float(element.get(name) or 0) + float(other.get(name) or 0)
+    except ValueError:
+        return
+    element.set(name, str(round(value, 3)) if name == "time"
+                else str(int(value)))
+
+
+def merge_gtest_xml(xml_list, result_file_path, elapsed_time=None):
+    # 将多个gtest结果文件合并为一个，同名testsuite的用例合并到一起
+    merged_root = None
+    suite_dic = {}
+    for xml_file in xml_list:
+        try:
+            root = ET.parse(xml_file).getroot()
+        except (ET.ParseError, OSError) as error:
+            LOG.warning("Parse %s failed: %s" % (xml_file, error))
+            continue
+        if merged_root is None:
+            merged_root = ET.Element(root.tag, dict(root.attrib))
+            for name in COUNT_ATTRIB_LIST + ["time"]:
+                if merged_root.get(name) is not None:
+                    merged_root.set(name, "0")
+        for name in COUNT_ATTRIB_LIST + ["time"]:
+            _add_attrib(merged_root, root, name)
+        for suite in root.iter("testsuite"):
+            merged_suite = suite_dic.get(suite.get("name"))
+            if merged_suite is None:
+                merged_suite = ET.SubElement(merged_root, "testsuite",
+                                             dict(suite.attrib))
+                suite_dic[suite.get("name")] = merged_suite
+            else:
+                for name in COUNT_ATTRIB_LIST + ["time"]:
+                    _add_attrib(merged_suite, suite, name)
+            for case in suite:
+                merged_suite.append(case)
+    if merged_root is None:
+        return False
+    if elapsed_time is not None:
+        # 分片并行执行，总耗时为实际经过的时间
+        merged_root.set("time", str(round(elapsed_time, 3)))
+    os.makedirs(os.path.dirname(result_file_path), exist_ok=True)
+    if os.path.exists(result_file_path):
+        os.remove(result_file_path)
+    with os.fdopen(os.open(result_file_path, FLAGS, MODES), "wb") as file_desc:
+        ET.ElementTree(merged_root).write(file_desc, encoding="UTF-8",
+                                          xml_declaration=True)
+    return True
+
+
+def get_online_device_sn_list(device_sn=""):
+    device_sn_list = []
+    env_manager = EnvironmentManager()
+    for manager in env_manager.managers.values():
+        for device in getattr(manager, "devices_list", []):
+            if device.test_device_state.value != "ONLINE":
+                continue
+            if device.device_sn not in device_sn_list:
+                device_sn_list.append(device.device_sn)
+    if device_sn:
+        # 指定了设备时只返回指定的设备
+        selected_sn_list = [sn for sn in device_sn.split(";") if sn]
+        device_sn_list = [sn for sn in device_sn_list
+                          if sn in selected_sn_list]
+    return device_sn_list
+
+
+def _split_gtest_filter(gtest_filter):
+    # gtest只认第一个"-"：之前为匹配的用例，之后为排除的用例，各自以":"分隔
+    positive, _, negative = (gtest_filter or "").partition("-")
+    return positive, [item for item in negative.split(":") if item]
+
+
+class _ShardJob(object):
+    def __init__(self, device, name, gtest_filter, shard_index=None,
+                 shard_count=None):
+        self.device = device
+        self.name = name
+        self.gtest_filter = gtest_filter
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.output = ""
+
+    @property
+    def xml_name(self):
+        return "%s.xml" % self.name
+
+
+class GTestShardRunner(object):
+    """
+    Runs one gtest suite as GTEST_TOTAL_SHARDS shards at the same time.
+
+    The shards run on idle devices borrowed from the environment, one
+    shard per device, or as processes on the device of the driver when
+    the suite declares it is safe to do so. Sharding is enabled per
+    suite by a <shard> node of its target in ohos_test.xml:
+
+        <shard process="true">
+            <option name="allow" value="KvStoreTest.*"/>
+            <option name="deny" value="KvStoreTest.Sync*"/>
+        </shard>
+
+    Only the test cases matching allow (default all) and not matching
+    deny are sharded; the others run afterwards as one ordinary run on
+    the device of the driver. The result xml files of all runs are
+    merged into one result file of the suite.
+    """
+
+    def __init__(self, config, suite_file, test_para, shard_setting,
+                 timeout):
+        self.config = config
+        self.suite_file = suite_file
+        self.filename = os.path.basename(suite_file)
+        self.test_para = test_para
+        self.shard_setting = shard_setting
+        self.timeout = timeout
+        self.device_list = [config.device]
+        self.environment_list = []
+        self.is_process_shard = False
+        self.temp_dir = ""
+
+    @classmethod
+    def get_shard_setting(cls, resource_data_dic):
+        # 返回ohos_test.xml中用例的分片配置，没有配置或未开启时返回None
+        shard_list = resource_data_dic.get("shard", [])
+        if not shard_list or \
+                str(shard_list[0].get("enable", "true")).lower() == "false":
+            return None
+        shard_setting = {
+            "process": str(shard_list[0].get("process", "false")).lower() ==
+            "true",
+            "allow": "",
+            "deny": ""
+        }
+        for option in shard_list[1:]:
+            if option.get("name") in ["allow", "deny"]:
+                shard_setting[option.get("name")] = option.get("value", "")
+        return shard_setting
+
+    def prepare(self, shard_count, resource_data_dic, resource_dir):
+        # 借用空闲设备，设备不够且用例允许时改为在本设备上多进程执行，返回分片数
+        self._borrow_devices(shard_count - 1)
+        if len(self.device_list) < shard_count and \
+                self.shard_setting.get("process"):
+            self.release()
+            self.is_process_shard = True
+            return shard_count
+        for device in self.device_list[1:]:
+            self._prepare_device(device, resource_data_dic, resource_dir)
+        return len(self.device_list)
+
+    def run(self, shard_count, get_log_file):
+        # get_log_file(serial, name)返回保存shell输出的文件
+        # 返回(结果文件列表, 输出信息, 实际耗时)，结果文件在release()时删除
+        start_time = time.time()
+        allow, negative_list = self._get_allow_filter()
+        shard_filter = "-".join([allow or "*"] + (
+            [":".join(negative_list)] if negative_list else []))
+        job_list = []
+        for shard_index in range(shard_count):
+            device = self.config.device if self.is_process_shard else \
+                self.device_list[shard_index]
+            job_list.append(_ShardJob(
+                device, SHARD_NAME % (self.filename, shard_index),
+                shard_filter, shard_index, shard_count))
+        LOG.info("Run %s in %s shards %s" % (
+            self.filename, shard_count, "as processes on one device"
+            if self.is_process_shard else "on %s devices" % shard_count))
+        thread_list = [threading.Thread(target=self._run_job,
+                                        args=(job, get_log_file), daemon=True)
+                       for job in job_list]
+        for thread in thread_list:
+            thread.start()
+        for thread in thread_list:
+            thread.join()
+
+        serial_job_list = []
+        for gtest_filter in self._get_serial_filter_list():
+            serial_job_list.append(_ShardJob(
+                self.config.device,
+                SERIAL_NAME % (self.filename, len(serial_job_list)),
+                gtest_filter))
+        for job in serial_job_list:
+            self._run_job(job, get_log_file)
+        job_list.extend(serial_job_list)
+
+        self.temp_dir = tempfile.mkdtemp(prefix="gtest_shard_")
+        xml_list = []
+        for job in job_list:
+            xml_file = self._pull_result(job)
+            if xml_file:
+                xml_list.append(xml_file)
+        return_message = "".join([job.output for job in job_list
+                                  if job.output])
+        return xml_list, return_message, time.time() - start_time
+
+    def release(self):
+        env_manager = EnvironmentManager()
+        for environment in self.environment_list:
+            env_manager.release_environment(environment)
+        self.environment_list = []
+        self.device_list = [self.config.device]
+        if self.temp_dir:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            self.temp_dir = ""
+
+    def _get_allow_filter(self):
+        # 返回allow中匹配的部分，以及allow中排除的部分与deny合并后的排除列表
+        allow, negative_list = _split_gtest_filter(
+            self.shard_setting.get("allow"))
+        deny = self.shard_setting.get("deny")
+        if deny:
+            negative_list.extend([item for item in deny.split(":") if item])
+        return allow, negative_list
+
+    def _get_serial_filter_list(self):
+        # 不分片的用例为"被排除"或"不在allow中"，拆成两次互不重叠的执行
+        allow, negative_list = self._get_allow_filter()
+        filter_list = []
+        if negative_list:
+            filter_list.append(":".join(negative_list))
+        if allow and allow != "*":
+            filter_list.append("*-%s" % ":".join([allow] + negative_list))
+        return filter_list
+
+    def _borrow_devices(self, count):
+        if count <= 0:
+            return
+        serial = self.config.device.device_sn
+        env_manager = EnvironmentManager()
+        for device_sn in get_online_device_sn_list(self.config.device_sn):
+            if len(self.device_list) > count or device_sn == serial:
+                continue
+            device_option = DeviceSelectionOption({"device_sn": device_sn})
+            device_option.required_manager = "device"
+            environment = env_manager.apply_environment([device_option])
+            if not environment.devices:
+                continue
+            self.environment_list.append(environment)
+            self.device_list.append(environment.devices[0])
+        LOG.info("Borrowed %s idle devices for %s" % (
+            len(self.device_list) - 1, self.filename))
+
+    def _prepare_device(self, device, resource_data_dic, resource_dir):
+        target_test_path = self.config.target_test_path
+        device.execute_shell_command("mkdir -p %s; rm -rf %s" % (
+            target_test_path, os.path.join(target_test_path, "*")))
+        device.push_file(self.suite_file, target_test_path)
+        ResourceManager().process_preparer_data(resource_data_dic,
+                                                resource_dir, device)
+
+    def clean(self, resource_data_dic, resource_dir):
+        for device in self.device_list[1:]:
+            try:
+                ResourceManager().process_cleaner_data(resource_data_dic,
+                                                       resource_dir, device)
+            except (ExecuteTerminate, DeviceError) as error:
+                LOG.warning("Clean %s failed: %s" % (device.device_sn, error))
+
+    def _get_command(self, job):
+        remote_xml = os.path.join(self.config.target_test_path, job.xml_name)
+        command = "cd %s; rm -rf %s; chmod +x %s; " % (
+            self.config.target_test_path, job.xml_name, self.filename)
+        if job.shard_index is not None:
+            command += "GTEST_TOTAL_SHARDS=%s GTEST_SHARD_INDEX=%s " % (
+                job.shard_count, job.shard_index)
+        return "%s./%s %s --gtest_filter=%s --gtest_output=xml:%s" % (
+            command, self.filename, self.test_para, job.gtest_filter,
+            remote_xml)
+
+    def _run_job(self, job, get_log_file):
+        receiver = CollectingOutputReceiver(get_log_file(
+            job.device.__get_serial__(), "shell_output_%s" % job.name))
+        try:
+            job.device.execute_shell_command(
+                self._get_command(job), receiver=receiver,
+                timeout=int(self.timeout * 1000), retry=0)
+        except (ExecuteTerminate, DeviceError) as error:
+            job.output = "%s: %s\n" % (job.name, error)
+        finally:
+            receiver.close()
+
+    def _pull_result(self, job):
+        remote_xml = os.path.join(self.config.target_test_path, job.xml_name)
+        local_xml = os.path.join(self.temp_dir, job.xml_name)
+        try:
+            if not job.device.is_file_exist(remote_xml):
+                LOG.warning("%s not exist on %s" % (remote_xml,
+                                                    job.device.device_sn))
+                return ""
+            job.device.pull_file(remote_xml, local_xml)
+        except (ExecuteTerminate, DeviceError) as error:
+            LOG.warning("Pull %s failed: %s" % (remote_xml, error))
+            return ""
+        return local_xml if os.path.exists(local_xml) else ""
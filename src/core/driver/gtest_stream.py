@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import re
+import copy
+import time
+import xml.etree.ElementTree as ET
+
+from xdevice import platform_logger
+from xdevice import LifeCycle
+from xdevice import ResultCode
+from xdevice import CaseResult
+from xdevice import SuiteResult
+
+__all__ = ["GTestStreamParser", "get_live_listeners"]
+
+LOG = platform_logger("GTestStream")
+
+# 单个用例保留的失败信息的最大长度
+MAX_STACKTRACE_SIZE = 64 * 1024
+# 这些监听器在测试套结束后由结果xml生成报告，实时上报用例会导致重复统计
+XML_REPORT_LISTENER_SET = {"ReportListener"}
+
+_RUN_PATTERN = re.compile(r"^\[\s*RUN\s*\]\s+(\S+)\.(\S+)")
+_CASE_END_PATTERN = re.compile(
+    r"^\[\s*(OK|FAILED|SKIPPED)\s*\]\s+(\S+)\.(\S+?)(?:,.*)?\s+\((\d+)\s*ms\)")
+_SUITE_START_PATTERN = re.compile(
+    r"^\[-{10}\]\s+(\d+)\s+tests?\s+from\s+(\S+)\s*$")
+_SUITE_END_PATTERN = re.compile(
+    r"^\[-{10}\]\s+\d+\s+tests?\s+from\s+(\S+)\s+\((\d+)\s*ms total\)")
+_ALL_END_PATTERN = re.compile(r"^\[={10}\]\s+\d+\s+tests?\s+from.*ran")
+
+
+class _GTestCase(object):
+    def __init__(self, class_name, test_name):
+        self.class_name = class_name
+        self.test_name = test_name
+        self.code = ResultCode.FAILED.value
+        self.run_time = 0
+        self.stacktrace_list = []
+        self.stacktrace_size = 0
+        self.is_completed = False
+
+    def add_stacktrace(self, line):
+        if self.stacktrace_size >= MAX_STACKTRACE_SIZE:
+            return
+        self.stacktrace_list.append(line)
+        self.stacktrace_size += len(line) + 1
+
+    @property
+    def stacktrace(self):
+        return "\n".join(self.stacktrace_list)
+
+
+class GTestStreamParser(object):
+    """
+    Shell output receiver parsing the gtest event lines while the suite
+    runs.
+
+    Each test case is reported to the listeners as soon as gtest prints
+    its result. The result xml pulled from the device stays the source of
+    the report: the parsed cases only fill in the cases missing from it,
+    or replace it when the suite crashed before gtest wrote it.
+    """
+
+    def __init__(self, suite_name, listeners=None):
+        self.suite_name = suite_name
+        self.listeners = listeners or []
+        self.unfinished_line = ""
+        self.suite_dic = {}
+        self.current_case = None
+        self.current_suite = None
+        self.is_completed = False
+        self.start_time = time.time()
+
+    def __read__(self, output):
+        content = "".join((self.unfinished_line, output))
+        lines = content.split("\n")
+        self.unfinished_line = lines.pop()
+        for line in lines:
+            self._parse_line(line.rstrip("\r"))
+
+    def __error__(self, message):
+        pass
+
+    def __done__(self, result_code="", message=""):
+        if self.unfinished_line:
+            self._parse_line(self.unfinished_line.rstrip("\r"))
+            self.unfinished_line = ""
+        if self.is_completed:
+            return
+        # 进程异常退出，正在执行的用例记为失败
+        if self.current_case is not None:
+            self.current_case.add_stacktrace(
+                "test crashed or timeout: %s" % message if message else
+                "test crashed or timeout")
+            self._end_case(self.current_case, ResultCode.FAILED.value, 0)
+        if self.current_suite is not None:
+            self._end_suite(self.current_suite, 0)
+
+    @property
+    def case_count(self):
+        return sum(len(case_list) for case_list in self.suite_dic.values())
+
+    def _parse_line(self, line):
+        matcher = _RUN_PATTERN.match(line)
+        if matcher:
+            self._start_case(matcher.group(1), matcher.group(2))
+            return
+        matcher = _CASE_END_PATTERN.match(line)
+        if matcher and self.current_case is not None and \
+                self.current_case.class_name == matcher.group(2) and \
+                self.current_case.test_name == matcher.group(3):
+            code = {"OK": ResultCode.PASSED.value,
+                    "SKIPPED": ResultCode.SKIPPED.value}.get(
+                matcher.group(1), ResultCode.FAILED.value)
+            self._end_case(self.current_case, code, int(matcher.group(4)))
+            return
+        matcher = _SUITE_START_PATTERN.match(line)
+        if matcher:
+            self._start_suite(matcher.group(2), int(matcher.group(1)))
+            return
+        matcher = _SUITE_END_PATTERN.match(line)
+        if matcher:
+            if self.current_suite is not None and \
+                    self.current_suite.suite_name == matcher.group(1):
+                self._end_suite(self.current_suite, int(matcher.group(2)))
+            return
+        if _ALL_END_PATTERN.match(line):
+            self.is_completed = True
+            return
+        if self.current_case is not None:
+            self.current_case.add_stacktrace(line)
+
+    def _start_suite(self, suite_name, test_num):
+        suite_result = SuiteResult()
+        suite_result.suite_name = suite_name
+        suite_result.test_num = test_num
+        suite_result.is_started = True
+        self.current_suite = suite_result
+        self.suite_dic.setdefault(suite_name, [])
+        self._notify("__started__", LifeCycle.TestSuite, suite_result)
+
+    def _end_suite(self, suite_result, run_time):
+        suite_result.run_time = run_time
+        suite_result.is_completed = True
+        suite_result.code = ResultCode.PASSED.value
+        for case in self.suite_dic.get(suite_result.suite_name, []):
+            if case.code == ResultCode.FAILED.value:
+                suite_result.code = ResultCode.FAILED.value
+        self.current_suite = None
+        self._notify("__ended__", LifeCycle.TestSuite, suite_result)
+
+    def _start_case(self, class_name, test_name):
+        if self.current_suite is None or \
+                self.current_suite.suite_name != class_name:
+            self._start_suite(class_name, 0)
+        case = _GTestCase(class_name, test_name)
+        self.current_case = case
+        self.suite_dic.setdefault(class_name, []).append(case)
+        self._notify("__started__", LifeCycle.TestCase,
+                     self._get_case_result(case))
+
+    def _end_case(self, case, code, run_time):
+        case.code = code
+        case.run_time = run_time
+        case.is_completed = True
+        self.current_case = None
+        case_result = self._get_case_result(case)
+        if code == ResultCode.FAILED.value:
+            self._notify("__failed__", LifeCycle.TestCase, case_result)
+        elif code == ResultCode.SKIPPED.value:
+            self._notify("__skipped__", LifeCycle.TestCase, case_result)
+        self._notify("__ended__", LifeCycle.TestCase, case_result)
+
+    @classmethod
+    def _get_case_result(cls, case):
+        case_result = CaseResult()
+        case_result.test_class = case.class_name
+        case_result.test_name = case.test_name
+        case_result.code = case.code
+        case_result.run_time = case.run_time
+        case_result.stacktrace = case.stacktrace
+        case_result.is_completed = case.is_completed
+        return case_result
+
+    def _notify(self, method_name, lifecycle, result):
+        for listener in self.listeners:
+            try:
+                getattr(listener, method_name)(lifecycle, copy.copy(result))
+            except (AttributeError, TypeError, ValueError) as error:
+                LOG.debug("Notify listener %s failed: %s" % (
+                    listener.__class__.__name__, error))
+
+    def reconcile_result_file(self, result_file_path, error_message=""):
+        # 设备上的xml为准，只补充xml中缺少的已解析用例，补充的用例计入统计值
+        try:
+            tree = ET.parse(result_file_path)
+        except (ET.ParseError, OSError) as error:
+            LOG.warning("Parse %s failed: %s" % (result_file_path, error))
+            return False
+        testsuites = tree.getroot()
+        testsuite_dic = {testsuite.get("name"): testsuite
+                         for testsuite in testsuites.iter("testsuite")}
+        case_set = {(testcase.get("classname"), testcase.get("name"))
+                    for testcase in testsuites.iter("testcase")}
+        added_count = 0
+        for suite_name, case_list in self.suite_dic.items():
+            for case in case_list:
+                if (suite_name, case.test_name) in case_set:
+                    continue
+                testsuite = testsuite_dic.get(suite_name)
+                if testsuite is None:
+                    testsuite = ET.SubElement(testsuites, "testsuite", {
+                        "name": suite_name, "tests": "0", "failures": "0",
+                        "disabled": "0", "errors": "0", "time": "0.000"})
+                    testsuite_dic[suite_name] = testsuite
+                self._add_case_element(testsuite, case, error_message)
+                for element in [testsuite, testsuites]:
+                    self._add_case_count(element, case)
+                added_count += 1
+        if added_count:
+            tree.write(result_file_path, encoding="UTF-8",
+                       xml_declaration=True)
+            LOG.info("Add %s test cases of %s from test output to %s" % (
+                added_count, self.suite_name, result_file_path))
+        return True
+
+    @classmethod
+    def _add_case_element(cls, testsuite, case, error_message=""):
+        testcase = ET.SubElement(testsuite, "testcase", {
+            "name": case.test_name,
+            "status": "notrun" if case.code ==
+            ResultCode.SKIPPED.value else "run",
+            "result": "completed" if case.is_completed else "suppressed",
+            "time": "%.3f" % (case.run_time / 1000.0),
+            "classname": case.class_name})
+        if case.code == ResultCode.FAILED.value:
+            stacktrace = case.stacktrace or error_message
+            failure = ET.SubElement(testcase, "failure", {
+                "message": stacktrace, "type": ""})
+            failure.text = stacktrace
+
+    @classmethod
+    def _add_case_count(cls, element, case):
+        attribute_list = ["tests"]
+        if case.code == ResultCode.FAILED.value:
+            attribute_list.append("failures")
+        elif case.code == ResultCode.SKIPPED.value:
+            attribute_list.append("disabled")
+        for attribute in attribute_list:
+            element.set(attribute,
+                        str(int(element.get(attribute, "0") or 0) + 1))
+
+    def write_result_file(self, result_file_path, error_message=""):
+        # 生成与gtest输出格式一致的结果xml
+        total_time = 0.0
+        failure_count = 0
+        disabled_count = 0
+        testsuites = ET.Element("testsuites", {
+            "name": self.suite_name,
+            "timestamp": time.strftime(
+                "%Y-%m-%dT%H:%M:%S", time.localtime(self.start_time))})
+        for suite_name, case_list in self.suite_dic.items():
+            suite_time = sum(case.run_time for case in case_list) / 1000.0
+            suite_failures = len([case for case in case_list
+                                  if case.code == ResultCode.FAILED.value])
+            suite_disabled = len([case for case in case_list
+                                  if case.code == ResultCode.SKIPPED.value])
+            testsuite = ET.SubElement(testsuites, "testsuite", {
+                "name": suite_name,
+                "tests": str(len(case_list)),
+                "failures": str(suite_failures),
+                "disabled": str(suite_disabled),
+                "errors": "0",
+                "time": "%.3f" % suite_time})
+            for case in case_list:
+                self._add_case_element(testsuite, case, error_message)
+            total_time += suite_time
+            failure_count += suite_failures
+            disabled_count += suite_disabled
+        testsuites.set("tests", str(self.case_count))
+        testsuites.set("failures", str(failure_count))
+        testsuites.set("disabled", str(disabled_count))
+        testsuites.set("errors", "0")
+        testsuites.set("time", "%.3f" % total_time)
+        os.makedirs(os.path.dirname(result_file_path), exist_ok=True)
+        ET.ElementTree(testsuites).write(result_file_path, encoding="UTF-8",
+                                         xml_declaration=True)
+        LOG.info("Generate result of %s from test output: %s" % (
+            self.suite_name, result_file_path))
+
+
+def get_live_listeners(listeners):
+    # 只向不依赖结果xml生成报告的监听器实时上报用例
+    return [listener for listener in listeners or []
+            if listener.__class__.__name__ not in XML_REPORT_LISTENER_SET]
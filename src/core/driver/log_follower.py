@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import time
+import threading
+
+from xdevice import platform_logger
+from core.testcase.suite_watcher import InotifyWatcher
+from core.testcase.suite_watcher import IN_MODIFY
+
+__all__ = ["DeviceLogFollower"]
+
+LOG = platform_logger("LogFollower")
+
+JSUNIT_END_MARK = "[end] run suites end"
+# 没有inotify时检查日志文件是否有新内容的间隔，单位秒
+POLL_INTERVAL = 0.2
+
+
+class DeviceLogFollower(object):
+    """
+    Follows a device log file on the host while it is written.
+
+    Lines holding the marker are collected in the same pass, and wait()
+    returns as soon as a collected line holds the end mark. New data is
+    signalled by inotify when available, otherwise the file is polled.
+    """
+
+    def __init__(self, log_file, marker, end_mark=JSUNIT_END_MARK):
+        self.log_file = os.path.abspath(log_file)
+        self.marker = marker.lower()
+        self.end_mark = end_mark
+        self.line_list = []
+        self.unfinished_line = ""
+        self.active_time = time.time()
+        self.is_inactive = False
+        self.file_desc = None
+        self.watcher = None
+        self.thread = None
+        self.changed_event = threading.Event()
+        self.end_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+
+    @property
+    def is_ended(self):
+        return self.end_event.is_set()
+
+    def start(self):
+        self.active_time = time.time()
+        self.file_desc = open(self.log_file, "r", encoding="utf-8",
+                              errors="ignore")
+        if InotifyWatcher.is_supported():
+            watcher = InotifyWatcher([os.path.dirname(self.log_file)],
+                                     self._on_changed, mask=IN_MODIFY,
+                                     recursive=False)
+            try:
+                watcher.start()
+                self.watcher = watcher
+            except OSError as error:
+                LOG.debug("Watch %s failed: %s" % (self.log_file, error))
+        self.thread = threading.Thread(target=self._run, name="LogFollower",
+                                       daemon=True)
+        self.thread.start()
+
+    def wait(self, timeout, inactivity_timeout=0):
+        # inactivity_timeout大于0时，超过该时间没有新的日志行也结束等待
+        if inactivity_timeout <= 0:
+            return self.end_event.wait(timeout)
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            if self.end_event.wait(min(remaining, 1)):
+                return True
+            if time.time() - self.active_time >= inactivity_timeout:
+                LOG.error("No new log in %s for %ss" % (self.log_file,
+                                                        inactivity_timeout))
+                self.is_inactive = True
+                return False
+
+    def stop(self):
+        self.stop_event.set()
+        self.changed_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+    def get_result_message(self):
+        # 停止后读取剩余的内容，与完整读取一遍日志文件的结果一致
+        if self.file_desc is not None:
+            if not self.is_ended:
+                self._read_lines()
+                if self.unfinished_line.lower().find(self.marker) != -1:
+                    self.line_list.append(self.unfinished_line)
+                self.unfinished_line = ""
+            self.file_desc.close()
+            self.file_desc = None
+        with self.lock:
+            return "".join(self.line_list)
+
+    def _on_changed(self, path, is_dir, is_structure_change):
+        if path is None or path == self.log_file:
+            self.changed_event.set()
+
+    def _run(self):
+        while not self.stop_event.is_set() and not self.is_ended:
+            self._read_lines()
+            if self.is_ended:
+                break
+            self.changed_event.wait(POLL_INTERVAL)
+            self.changed_event.clear()
+
+    def _read_lines(self):
+        while not self.is_ended:
+            data = self.file_desc.readline()
+            if not data:
+                return
+            if not data.endswith("\n"):
+                # 行尚未写完，等待后续内容
+                self.unfinished_line += data
+                continue
+            line = self.unfinished_line + data
+            self.unfinished_line = ""
+            if line.lower().find(self.marker) == -1:
+                continue
+            with self.lock:
+                self.line_list.append(line)
+            self.active_time = time.time()
+            if line.find(self.end_mark) != -1:
+                LOG.info("Found %s in %s" % (self.end_mark, self.log_file))
+                self.end_event.set()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import stat
+import queue
+import threading
+from collections import deque
+
+from xdevice import platform_logger
+from core.utils import get_decode
+from core.config.config_manager import UserConfigManager
+
+__all__ = ["CollectingOutputReceiver", "DisplayOutputReceiver",
+           "TeeOutputReceiver", "OutputTail", "get_output_max_size"]
+
+LOG = platform_logger("OutputReceiver")
+
+# 内存中保留的shell输出的默认大小，单位MB
+DEFAULT_OUTPUT_MAX_SIZE = 16
+
+FLAGS = os.O_WRONLY | os.O_CREAT | os.O_APPEND
+MODES = stat.S_IWUSR | stat.S_IRUSR
+
+_output_max_size = None
+
+
+def get_output_max_size():
+    # 在user_config.xml的<shell_output><max_size>中配置
+    global _output_max_size
+    if _output_max_size is None:
+        max_size = UserConfigManager().get_user_config(
+            "shell_output").get("max_size", "")
+        try:
+            _output_max_size = int(max_size or DEFAULT_OUTPUT_MAX_SIZE) \
+                * 1024 * 1024
+        except ValueError:
+            LOG.warning("max_size of shell_output is not a number")
+            _output_max_size = DEFAULT_OUTPUT_MAX_SIZE * 1024 * 1024
+    return _output_max_size
+
+
+class OutputTail(object):
+    """
+    The last max_size characters of a stream, kept as a list of chunks so
+    that appending does not copy what was received before.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = get_output_max_size() if max_size is None \
+            else max_size
+        self.chunk_list = deque()
+        self.size = 0
+        self.dropped_size = 0
+
+    def append(self, chunk):
+        if not chunk:
+            return
+        self.chunk_list.append(chunk)
+        self.size += len(chunk)
+        while self.size > self.max_size and self.chunk_list:
+            overflow = self.size - self.max_size
+            first_chunk = self.chunk_list[0]
+            if len(first_chunk) <= overflow:
+                self.chunk_list.popleft()
+                self.size -= len(first_chunk)
+                self.dropped_size += len(first_chunk)
+            else:
+                self.chunk_list[0] = first_chunk[overflow:]
+                self.size -= overflow
+                self.dropped_size += overflow
+
+    def get_value(self):
+        if len(self.chunk_list) > 1:
+            # 合并后只保留一块，重复读取时不再拼接
+            value = "".join(self.chunk_list)
+            self.chunk_list = deque([value])
+        return self.chunk_list[0] if self.chunk_list else ""
+
+    @classmethod
+    def truncate(cls, text, max_size=None):
+        output_tail = OutputTail(max_size)
+        output_tail.append(text)
+        return output_tail.get_value()
+
+
+class _OutputSpiller(object):
+    # 在后台线程中将完整的输出写入日志文件，不阻塞读取设备输出的线程
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.chunk_queue = queue.Queue()
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+
+    def put(self, chunk):
+        self.chunk_queue.put(chunk)
+
+    def close(self):
+        self.chunk_queue.put(None)
+        self.thread.join()
+
+    def _write(self):
+        file_desc = None
+        try:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            file_desc = os.fdopen(os.open(self.log_path, FLAGS, MODES), "w",
+                                  encoding="utf-8", errors="replace")
+        except OSError as error:
+            LOG.warning("Open %s failed: %s" % (self.log_path, error))
+        while True:
+            chunk = self.chunk_queue.get()
+            if chunk is None:
+                break
+            if file_desc is not None:
+                file_desc.write(chunk)
+        if file_desc is not None:
+            file_desc.close()
+
+
+class CollectingOutputReceiver(object):
+    """
+    Shell output receiver keeping only the tail of the output in memory.
+
+    When log_path is given, the complete output is written to that file.
+    """
+
+    def __init__(self, log_path="", max_size=None):
+        self.output_tail = OutputTail(max_size)
+        self.log_path = log_path
+        self.spiller = _OutputSpiller(log_path) if log_path else None
+
+    @property
+    def output(self):
+        output = self.output_tail.get_value()
+        if self.output_tail.dropped_size:
+            output = "...(%s characters omitted%s)\n%s" % (
+                self.output_tail.dropped_size,
+                ", see %s" % self.log_path if self.log_path else "", output)
+        return output
+
+    def __read__(self, output):
+        self.output_tail.append(output)
+        if self.spiller is not None:
+            self.spiller.put(output)
+
+    def __error__(self, message):
+        pass
+
+    def __done__(self, result_code="", message=""):
+        self.close()
+
+    def close(self):
+        if self.spiller is not None:
+            self.spiller.close()
+            self.spiller = None
+
+
+class DisplayOutputReceiver(CollectingOutputReceiver):
+    def __init__(self, log_path="", max_size=None):
+        super().__init__(log_path, max_size)
+        self.unfinished_line = ""
+
+    def __read__(self, output):
+        super().__read__(output)
+        lines = self._process_output(output)
+        for line in lines:
+            line = line.strip()
+            if line:
+                LOG.info(get_decode(line))
+
+    def _process_output(self, output, end_mark="\n"):
+        content = output
+        if self.unfinished_line:
+            content = "".join((self.unfinished_line, content))
+            self.unfinished_line = ""
+        lines = content.split(end_mark)
+        if content.endswith(end_mark):
+            return lines[:-1]
+        else:
+            self.unfinished_line = lines[-1]
+            return lines[:-1]
+
+
+class TeeOutputReceiver(object):
+    # 将同一份shell输出分发给多个接收器
+    def __init__(self, receiver_list):
+        self.receiver_list = receiver_list
+
+    def __read__(self, output):
+        for receiver in self.receiver_list:
+            receiver.__read__(output)
+
+    def __error__(self, message):
+        for receiver in self.receiver_list:
+            receiver.__error__(message)
+
+    def __done__(self, result_code="", message=""):
+        for receiver in self.receiver_list:
+            receiver.__done__(result_code, message)
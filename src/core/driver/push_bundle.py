@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import tarfile
+import tempfile
+
+from xdevice import platform_logger
+
+__all__ = ["PushBundle"]
+
+LOG = platform_logger("PushBundle")
+
+DEVICE_BUNDLE_DIR = "/data/local/tmp"
+BUNDLE_DONE_MARK = "PUSH_BUNDLE_DONE"
+
+
+class PushBundle(object):
+    """
+    Files and directories to push to a device, sent as one tar archive.
+
+    The archive is transferred with a single push_file and unpacked with a
+    single shell command, instead of one mkdir and one push per item. If
+    the archive can not be unpacked, the items are pushed one by one.
+    """
+
+    def __init__(self, device, bundle_name="push_bundle"):
+        self.device = device
+        self.bundle_name = bundle_name
+        self.push_list = []
+        self.direct_push_list = []
+
+    def add(self, src, dst):
+        # 与ResourceManager一致：src为文件时放到dst目录下，为目录时将目录内容放到dst目录下
+        if not os.path.exists(src):
+            LOG.warning("%s is not exist." % src)
+            return
+        if dst.startswith("/"):
+            self.push_list.append((src, dst.rstrip("/") or "/"))
+        else:
+            self.direct_push_list.append((src, dst))
+
+    def send(self, post_command=""):
+        for src, dst in self.direct_push_list:
+            self._push_item(src, dst)
+        if not self.push_list:
+            if post_command:
+                self.device.execute_shell_command(post_command)
+            return
+
+        file_desc, bundle_path = tempfile.mkstemp(
+            prefix="%s_" % self.bundle_name, suffix=".tar")
+        os.close(file_desc)
+        remote_path = "%s/%s" % (DEVICE_BUNDLE_DIR,
+                                 os.path.basename(bundle_path))
+        try:
+            self._write_bundle(bundle_path)
+            self.device.push_file(bundle_path, remote_path)
+        except (OSError, tarfile.TarError) as error:
+            LOG.warning("Create push bundle failed: %s" % error)
+            self._push_one_by_one(post_command)
+            return
+        finally:
+            os.remove(bundle_path)
+
+        dst_list = sorted(set([dst for _, dst in self.push_list]))
+        command = "mkdir -p {0} && tar -xf {1} -C / && echo {2}; rm -f {1}".format(
+            " ".join(dst_list), remote_path, BUNDLE_DONE_MARK)
+        if post_command:
+            command = "%s; %s" % (command, post_command)
+        output = self.device.execute_shell_command(command)
+        if BUNDLE_DONE_MARK not in str(output):
+            LOG.warning("Unpack push bundle on device failed, push files "
+                        "one by one: %s" % output)
+            self._push_one_by_one("")
+            return
+        LOG.info("Pushed %s items in one bundle" % len(self.push_list))
+
+    def _write_bundle(self, bundle_path):
+        with tarfile.open(bundle_path, "w") as bundle:
+            for src, dst in self.push_list:
+                if os.path.isdir(src):
+                    for name in sorted(os.listdir(src)):
+                        bundle.add(os.path.join(src, name),
+                                   arcname=self._get_arcname(dst, name),
+                                   filter=self._reset_owner)
+                else:
+                    bundle.add(src, arcname=self._get_arcname(
+                        dst, os.path.basename(src)),
+                        filter=self._reset_owner)
+
+    @classmethod
+    def _get_arcname(cls, dst, name):
+        # 包内路径为设备上的绝对路径去掉开头的"/"，在设备的根目录下解包
+        arc_dir = dst.strip("/")
+        return "%s/%s" % (arc_dir, name) if arc_dir else name
+
+    @classmethod
+    def _reset_owner(cls, tar_info):
+        tar_info.uid = 0
+        tar_info.gid = 0
+        tar_info.uname = "root"
+        tar_info.gname = "root"
+        return tar_info
+
+    def _push_item(self, src, dst):
+        self.device.execute_shell_command("mkdir -p %s" % dst)
+        self.device.push_file(src, dst)
+
+    def _push_one_by_one(self, post_command):
+        for src, dst in self.push_list:
+            self._push_item(src, dst)
+        if post_command:
+            self.device.execute_shell_command(post_command)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import time
+import uuid
+import atexit
+import select
+import shutil
+import platform
+import threading
+import subprocess
+
+from xdevice import platform_logger
+
+__all__ = ["ShellSession", "ShellSessionDevice"]
+
+LOG = platform_logger("ShellSession")
+
+HDC_TOOLS = "hdc"
+# 超过该超时时间(毫秒)的命令视为长命令，仍使用单独的hdc进程执行
+SHORT_COMMAND_TIMEOUT = 60 * 1000
+DEFAULT_COMMAND_TIMEOUT = 60 * 1000
+# 连续失败达到该次数后不再使用持久会话
+MAX_FAILURE_TIMES = 3
+# 会话启动后确认shell可用的超时时间，单位秒
+START_CHECK_TIMEOUT = 5
+READ_SIZE = 64 * 1024
+
+
+class ShellSession(object):
+    """
+    One long running "hdc shell" process per device, used to run short
+    commands without starting a new hdc process for each of them.
+
+    Commands are written to the shell one at a time, each run in a
+    subshell so that "cd" or "exit" do not change the session, and each
+    followed by an echo of a unique sentinel with the exit code; the output
+    up to the sentinel line is the output of the command.
+    """
+    _session_dic = {}
+    _lock = threading.Lock()
+
+    def __init__(self, command_list):
+        self.command_list = command_list
+        self.process = None
+        self.lock = threading.Lock()
+        self.failure_times = 0
+        self.buffer = b""
+        self.sentinel = "__DEVELOPER_TEST_%s__" % uuid.uuid4().hex
+
+    @classmethod
+    def get_session(cls, device):
+        serial = str(device.__get_serial__())
+        with cls._lock:
+            session = cls._session_dic.get(serial)
+            if session is None:
+                session = ShellSession(cls._get_hdc_command(device))
+                cls._session_dic[serial] = session
+            return session
+
+    @classmethod
+    def is_supported(cls):
+        # 读取会话输出时对管道使用select，Windows上不支持
+        return platform.system() == "Linux"
+
+    @classmethod
+    def close_all(cls):
+        with cls._lock:
+            for session in cls._session_dic.values():
+                session.close()
+            cls._session_dic = {}
+
+    @classmethod
+    def _get_hdc_command(cls, device):
+        command_list = [shutil.which(HDC_TOOLS) or HDC_TOOLS]
+        host = getattr(device, "host", "")
+        port = getattr(device, "port", "")
+        if host and port:
+            command_list.extend(["-s", "%s:%s" % (host, port)])
+        command_list.extend(["-t", device.device_sn, "shell"])
+        return command_list
+
+    @property
+    def is_usable(self):
+        return self.failure_times < MAX_FAILURE_TIMES
+
+    def execute(self, command, timeout=DEFAULT_COMMAND_TIMEOUT):
+        # 返回(输出, 退出码)，会话不可用时返回None，由调用方改用单独的hdc进程执行
+        with self.lock:
+            if not self.is_usable or not self._start():
+                return None
+            line = "( %s\n) </dev/null 2>&1; printf '\\n%s %%s\\n' $?\n" % (
+                command, self.sentinel)
+            try:
+                self.process.stdin.write(line.encode("utf-8"))
+                self.process.stdin.flush()
+                result = self._read_output(timeout / 1000.0)
+            except (OSError, EOFError) as error:
+                # 会话进程已退出，下次执行时重新启动会话，本条命令改用单独的hdc进程执行
+                self._fail("is closed: %s" % (str(error) or "end of output"))
+                return None
+            if result is None:
+                # 命令已经发出，超时后不再重复执行，返回空输出
+                self._fail("command timeout: %s" % command)
+                return "", None
+            self.failure_times = 0
+            return result
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+        self.process = None
+
+    def _start(self):
+        if self.process is not None and self.process.poll() is None:
+            return True
+        try:
+            self.process = subprocess.Popen(
+                self.command_list, stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except OSError as error:
+            self._fail("start %s failed: %s" % (self.command_list, error))
+            return False
+        self.buffer = b""
+        # hdc不支持非交互式的shell时不再尝试，避免每条命令都等到超时
+        try:
+            self.process.stdin.write(("printf '\\n%s %%s\\n' 0\n" %
+                                      self.sentinel).encode("utf-8"))
+            self.process.stdin.flush()
+        except OSError:
+            pass
+        try:
+            result = self._read_output(START_CHECK_TIMEOUT)
+        except (OSError, ValueError, EOFError) as error:
+            LOG.warning("Read shell session output failed: %s" % error)
+            result = None
+        if result is None:
+            self.failure_times = MAX_FAILURE_TIMES - 1
+            self._fail("is not supported by %s" % self.command_list[0])
+            return False
+        return True
+
+    def _read_output(self, timeout):
+        # 返回(输出, 退出码)，超时返回None，会话进程的输出结束时抛出EOFError
+        marker = ("\n%s " % self.sentinel).encode("utf-8")
+        deadline = time.time() + timeout
+        while True:
+            index = self.buffer.find(marker)
+            if index != -1:
+                end_index = self.buffer.find(b"\n", index + len(marker))
+                if end_index != -1:
+                    output = self.buffer[:index]
+                    exit_code = self.buffer[index + len(marker):end_index]
+                    self.buffer = self.buffer[end_index + 1:]
+                    try:
+                        exit_code = int(exit_code.strip())
+                    except ValueError:
+                        exit_code = None
+                    return output.decode("utf-8", "ignore"), exit_code
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            readable, _, _ = select.select([self.process.stdout], [], [],
+                                           remaining)
+            if not readable:
+                continue
+            data = os.read(self.process.stdout.fileno(), READ_SIZE)
+            if not data:
+                raise EOFError()
+            self.buffer += data
+
+    def _fail(self, message):
+        self.failure_times += 1
+        LOG.warning("Shell session %s" % message)
+        self.close()
+
+
+class ShellSessionDevice(object):
+    """
+    Device wrapper running short shell commands through the persistent
+    ShellSession of the device. Everything else, and any command the
+    session can not run, goes to the wrapped device.
+    """
+    _device_dic = {}
+    _lock = threading.Lock()
+
+    def __init__(self, device):
+        self.device = device
+        self.session = ShellSession.get_session(device)
+
+    @classmethod
+    def wrap(cls, device):
+        # 同一设备复用同一个包装对象，使按设备缓存的状态保持有效
+        serial = str(device.__get_serial__())
+        with cls._lock:
+            session_device = cls._device_dic.get(serial)
+            if session_device is None or session_device.device is not device:
+                session_device = ShellSessionDevice(device)
+                cls._device_dic[serial] = session_device
+            return session_device
+
+    def __getattr__(self, name):
+        return getattr(self.device, name)
+
+    def execute_shell_command(self, command, **kwargs):
+        timeout = kwargs.get("timeout", DEFAULT_COMMAND_TIMEOUT)
+        if kwargs.get("receiver") is None and \
+                timeout <= SHORT_COMMAND_TIMEOUT and \
+                self.session.is_usable:
+            result = self.session.execute(command, timeout)
+            if result is not None:
+                output, exit_code = result
+                if exit_code:
+                    LOG.debug("%s exited with %s" % (command, exit_code))
+                return output
+        return self.device.execute_shell_command(command, **kwargs)
+
+    def is_file_exist(self, file_path):
+        output = self.execute_shell_command(
+            "ls %s >/dev/null 2>&1 && echo FILE_EXIST" % file_path)
+        return "FILE_EXIST" in str(output)
+
+
+atexit.register(ShellSession.close_all)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+# 对比单独的hdc进程与持久shell会话执行短命令的耗时，在src目录下执行：
+# python3 -m core.driver.shell_session_benchmark --commands 100
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from core.driver.shell_session import ShellSession
+
+
+def _benchmark(command_count, latency):
+    # 用本地的sh模拟hdc：每次启动hdc进程都有连接耗时latency
+    fake_hdc = os.path.join(tempfile.mkdtemp(), "hdc")
+    with open(fake_hdc, "w") as file_desc:
+        file_desc.write("#!/bin/sh\nsleep %s\nshift 2\nif [ \"$1\" = shell ] "
+                        "&& [ $# -gt 1 ]; then shift; exec sh -c \"$*\"; fi\n"
+                        "exec sh\n" % latency)
+    os.chmod(fake_hdc, 0o755)
+    command_list = [fake_hdc, "-t", "fake", "shell"]
+
+    start_time = time.time()
+    for index in range(command_count):
+        subprocess.run(command_list + ["echo %s" % index],
+                       stdout=subprocess.PIPE, check=False)
+    one_shot_time = time.time() - start_time
+
+    session = ShellSession(command_list)
+    start_time = time.time()
+    for index in range(command_count):
+        session.execute("echo %s" % index)
+    session_time = time.time() - start_time
+    session.close()
+    shutil.rmtree(os.path.dirname(fake_hdc))
+    return one_shot_time, session_time
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare one-shot hdc commands with a shell session")
+    parser.add_argument("--commands", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds to start a fake hdc process")
+    args = parser.parse_args()
+    if not ShellSession.is_supported():
+        print("Shell session is only supported on Linux")
+        return
+    one_shot_time, session_time = _benchmark(args.commands, args.latency)
+    print("one-shot: %.3fs total, %.1fms per command" % (
+        one_shot_time, one_shot_time * 1000 / args.commands))
+    print("session:  %.3fs total, %.1fms per command" % (
+        session_time, session_time * 1000 / args.commands))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import math
+import shutil
+import tarfile
+import tempfile
+import threading
+
+from xdevice import platform_logger
+from xdevice import ExecuteTerminate
+from xdevice import DeviceError
+from core.config.suite_duration import SuiteDurationHistory
+from core.driver.push_bundle import PushBundle
+from core.driver.output_receiver import CollectingOutputReceiver
+from core.driver.suite_timeout import get_kill_command
+
+__all__ = ["SuiteBatchRunner", "BatchSuiteResult"]
+
+LOG = platform_logger("SuiteBatch")
+
+# 以"."开头，不会被每个测试套执行前的"rm -rf <target_test_path>/*"删除
+BATCH_DIR_NAME = ".batch"
+BATCH_SCRIPT_NAME = "run_batch.sh"
+BATCH_PID_NAME = "run_batch.pid"
+BATCH_RESULT_NAME = "batch_result.tar.gz"
+BATCH_DONE_MARK = "SUITE_BATCH_DONE"
+# 历史耗时超过该值的测试套单独执行，单位秒
+BATCH_MAX_DURATION = 5
+# 整批的超时时间为各测试套超时时间之和加上该余量，单位秒
+BATCH_TIMEOUT_MARGIN = 60
+# timeout命令结束进程时的退出码
+TIMEOUT_EXIT_CODES = ["124", "137"]
+# 测试套没有结果文件时作为错误信息保留的输出末尾大小
+OUTPUT_TAIL_SIZE = 64 * 1024
+
+
+class BatchSuiteResult(object):
+    def __init__(self, suite_file):
+        self.suite_file = suite_file
+        self.filename = os.path.basename(suite_file)
+        self.xml_file = ""
+        self.exit_code = ""
+        self.message = ""
+        self.event = threading.Event()
+
+
+class SuiteBatchRunner(object):
+    """
+    Runs many short gtest suites on a device with one generated script.
+
+    The binaries and the script are pushed in one bundle; the script runs
+    the suites one after another, each with its own timeout, and keeps
+    the xml, the output and the exit code of every suite. All of them are
+    pulled back as one archive. Each suite is claimed by the batch that
+    runs it, so when its own request reaches a driver, on any device, the
+    driver only takes the result of the suite with take_result(). A driver
+    never waits for a batch on another device: a suite whose batch has not
+    finished yet is run by its own driver, and a suite already taken by
+    its driver is not claimed by later batches.
+    """
+    _result_dic = {}
+    _taken_set = set()
+    _temp_dir_list = []
+    _lock = threading.Lock()
+
+    def __init__(self, device, batch_size, test_path, get_suite_setting,
+                 get_log_file, hilog_command=""):
+        # get_suite_setting(suite_file)返回(测试参数, 超时时间)
+        # get_log_file(serial, name)返回保存shell输出的文件
+        self.device = device
+        self.batch_size = batch_size
+        self.batch_dir = "%s/%s" % (test_path.rstrip("/"), BATCH_DIR_NAME)
+        self.get_suite_setting = get_suite_setting
+        self.get_log_file = get_log_file
+        self.hilog_command = hilog_command
+
+    @classmethod
+    def is_short_suite(cls, suite_file):
+        # 没有历史耗时的测试套可能执行很久，先单独执行，记录耗时后再参与批量执行
+        history = SuiteDurationHistory.get_instance()
+        duration = history.get_duration(suite_file)
+        if duration is None or duration > BATCH_MAX_DURATION:
+            return False
+        sample_list = history.get_samples(suite_file)
+        return not sample_list or max(sample_list) <= BATCH_MAX_DURATION
+
+    @classmethod
+    def record_duration(cls, suite_file, result_file):
+        # 从结果文件中读取测试套的耗时，用于判断之后是否可以批量执行
+        history = SuiteDurationHistory.get_instance()
+        duration = history.get_report_duration(result_file)
+        if duration is not None:
+            history.record_duration(suite_file, duration)
+
+    @classmethod
+    def take_result(cls, suite_file):
+        # 返回测试套所在批次的结果，测试套不在批次中或批次尚未完成时返回None，
+        # 由调用方单独执行，不等待其他设备上的批次
+        with cls._lock:
+            cls._taken_set.add(suite_file)
+            batch_result = cls._result_dic.get(suite_file)
+        if batch_result is None:
+            return None
+        if not batch_result.event.is_set():
+            LOG.info("Batch of %s is not finished, run it alone" %
+                     batch_result.filename)
+            return None
+        return batch_result
+
+    @classmethod
+    def clear_all(cls):
+        with cls._lock:
+            temp_dir_list = cls._temp_dir_list
+            cls._temp_dir_list = []
+            cls._result_dic = {}
+            cls._taken_set = set()
+        for temp_dir in temp_dir_list:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def run_batch(self, suite_file, suite_list, is_batchable):
+        # 认领suite_file及其后尚未被认领、也未开始执行的测试套，
+        # 至少两个时整批执行并返回True
+        if suite_file not in suite_list:
+            return False
+        candidate_list = []
+        for next_suite in suite_list[suite_list.index(suite_file):]:
+            if len(candidate_list) >= self.batch_size:
+                break
+            if next_suite == suite_file or \
+                    (not self._is_taken(next_suite) and
+                     is_batchable(next_suite)):
+                candidate_list.append(next_suite)
+        with self._lock:
+            if suite_file in self._result_dic:
+                return False
+            # 二进制按文件名push到批次目录，结果也按文件名区分，同名的测试套不放在同一批
+            filename_set = set([os.path.basename(suite_file)])
+            result_list = [BatchSuiteResult(suite_file)]
+            for next_suite in candidate_list:
+                if next_suite == suite_file or \
+                        next_suite in self._result_dic or \
+                        next_suite in self._taken_set or \
+                        os.path.basename(next_suite) in filename_set:
+                    continue
+                filename_set.add(os.path.basename(next_suite))
+                result_list.append(BatchSuiteResult(next_suite))
+            if len(result_list) < 2:
+                return False
+            for batch_result in result_list:
+                self._result_dic[batch_result.suite_file] = batch_result
+            temp_dir = tempfile.mkdtemp(prefix="suite_batch_")
+            self._temp_dir_list.append(temp_dir)
+
+        LOG.info("Run %s test suites in one batch on %s" % (
+            len(result_list), self.device.device_sn))
+        try:
+            self._execute_batch(result_list, temp_dir)
+        except (ExecuteTerminate, DeviceError, OSError,
+                tarfile.TarError) as error:
+            LOG.error("Run test suite batch failed: %s" % error)
+            for batch_result in result_list:
+                if not batch_result.message and not batch_result.xml_file:
+                    batch_result.message = "Batch failed: %s" % error
+        finally:
+            for batch_result in result_list:
+                batch_result.event.set()
+        return True
+
+    @classmethod
+    def _is_taken(cls, suite_file):
+        with cls._lock:
+            return suite_file in cls._result_dic or \
+                suite_file in cls._taken_set
+
+    def _execute_batch(self, result_list, temp_dir):
+        timeout_list = []
+        script_path = os.path.join(temp_dir, BATCH_SCRIPT_NAME)
+        with open(script_path, "w", encoding="utf-8", newline="\n") as \
+                file_desc:
+            file_desc.write(self._get_script(result_list, timeout_list))
+
+        self.device.execute_shell_command("rm -rf %s" % self.batch_dir)
+        push_bundle = PushBundle(self.device, "suite_batch")
+        for batch_result in result_list:
+            push_bundle.add(batch_result.suite_file, self.batch_dir)
+        push_bundle.add(script_path, self.batch_dir)
+        push_bundle.send()
+
+        serial = self.device.__get_serial__()
+        receiver = CollectingOutputReceiver(
+            self.get_log_file(serial, "shell_output_batch"))
+        try:
+            self.device.execute_shell_command(
+                "sh %s/%s" % (self.batch_dir, BATCH_SCRIPT_NAME),
+                receiver=receiver,
+                timeout=int((sum(timeout_list) + BATCH_TIMEOUT_MARGIN) * 1000),
+                retry=0)
+        except (ExecuteTerminate, DeviceError) as error:
+            LOG.warning("Run test suite batch failed: %s" % error)
+        finally:
+            receiver.close()
+        if BATCH_DONE_MARK not in receiver.output:
+            # 整批超时或脚本异常结束时，结束仍在执行的进程，收集已执行完的测试套的结果
+            LOG.warning("Test suite batch is not completed: %s" %
+                        receiver.output)
+            # 先结束脚本进程，避免其继续执行下一个测试套
+            kill_list = ["kill -9 $(cat %s/%s)" % (self.batch_dir,
+                                                   BATCH_PID_NAME)] + \
+                [get_kill_command(batch_result.filename)
+                 for batch_result in result_list]
+            self.device.execute_shell_command("%s; (cd %s && %s)" % (
+                "; ".join(kill_list), self.batch_dir,
+                self._get_pack_command()))
+
+        local_archive = os.path.join(temp_dir, BATCH_RESULT_NAME)
+        self.device.pull_file("%s/%s" % (self.batch_dir, BATCH_RESULT_NAME),
+                              local_archive)
+        self.device.execute_shell_command("rm -rf %s" % self.batch_dir)
+        with tarfile.open(local_archive, "r:gz") as archive:
+            archive.extractall(temp_dir,
+                               members=self._get_safe_members(archive))
+        for batch_result in result_list:
+            self._read_result(batch_result, temp_dir, serial)
+
+    def _get_script(self, result_list, timeout_list):
+        # 没有timeout命令时不限制单个测试套的时间，由整批的超时时间兜底
+        line_list = [
+            "cd %s || exit 1" % self.batch_dir,
+            "echo $$ > %s" % BATCH_PID_NAME,
+            "chmod +x *",
+            "run_suite() {",
+            "    if command -v timeout >/dev/null 2>&1; then",
+            "        timeout -s KILL \"$@\"",
+            "    else",
+            "        shift",
+            "        \"$@\"",
+            "    fi",
+            "}"
+        ]
+        for batch_result in result_list:
+            test_para, timeout = self.get_suite_setting(
+                batch_result.suite_file)
+            timeout = int(math.ceil(timeout))
+            timeout_list.append(timeout)
+            filename = batch_result.filename
+            if self.hilog_command:
+                line_list.append("%s %s/%s" % (self.hilog_command,
+                                               self.batch_dir, filename))
+            line_list.append("rm -f %s.xml" % filename)
+            line_list.append(
+                "run_suite {0} ./{1} {2} --gtest_output=xml:{3}/{1}.xml "
+                "> {1}.out 2>&1".format(timeout, filename, test_para,
+                                        self.batch_dir))
+            line_list.append("echo $? > %s.code" % filename)
+        line_list.append("%s && echo %s" % (self._get_pack_command(),
+                                             BATCH_DONE_MARK))
+        return "\n".join(line_list) + "\n"
+
+    @classmethod
+    def _get_pack_command(cls):
+        return "tar -czf %s $(ls *.xml *.out *.code 2>/dev/null)" % \
+            BATCH_RESULT_NAME
+
+    def _read_result(self, batch_result, temp_dir, serial):
+        filename = batch_result.filename
+        xml_file = os.path.join(temp_dir, "%s.xml" % filename)
+        out_file = os.path.join(temp_dir, "%s.out" % filename)
+        code_file = os.path.join(temp_dir, "%s.code" % filename)
+        if os.path.exists(code_file):
+            with open(code_file, "r") as file_desc:
+                batch_result.exit_code = file_desc.read().strip()
+        output = ""
+        if os.path.exists(out_file):
+            # 与单独执行时一样保存每个测试套的shell输出
+            shutil.copyfile(out_file, self.get_log_file(
+                serial, "shell_output_%s" % filename))
+            with open(out_file, "rb") as file_desc:
+                file_desc.seek(max(os.path.getsize(out_file) -
+                                   OUTPUT_TAIL_SIZE, 0))
+                output = file_desc.read().decode("utf-8", errors="ignore")
+        if os.path.exists(xml_file) and os.path.getsize(xml_file) > 0:
+            batch_result.xml_file = xml_file
+            self.record_duration(batch_result.suite_file, xml_file)
+        elif batch_result.exit_code in TIMEOUT_EXIT_CODES:
+            batch_result.message = "Timeout in batch. %s" % output
+        elif batch_result.exit_code:
+            batch_result.message = "Exit code %s in batch. %s" % (
+                batch_result.exit_code, output)
+        else:
+            batch_result.message = "Not executed in batch. %s" % output
+
+    @classmethod
+    def _get_safe_members(cls, archive):
+        # 结果包内只有批次目录下的普通文件
+        for member in archive.getmembers():
+            if member.isfile() and \
+                    os.path.basename(member.name) == member.name:
+                yield member
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import threading
+
+from xdevice import platform_logger
+from xdevice import ExecuteTerminate
+from xdevice import DeviceError
+
+__all__ = ["SuitePipeline"]
+
+LOG = platform_logger("SuitePipeline")
+
+# 以"."开头，不会被每个测试套执行前的"rm -rf <target_test_path>/*"删除
+STAGE_DIR_NAME = ".pipeline"
+STAGE_DONE_MARK = "PIPELINE_STAGE_DONE"
+
+
+class _StageJob(object):
+    def __init__(self, suite_file, stage_dir):
+        self.suite_file = suite_file
+        self.stage_dir = stage_dir
+        self.is_staged = False
+        self.thread = None
+
+
+class SuitePipeline(object):
+    """
+    Overlaps host to device transfers with the execution of test suites
+    on one device.
+
+    While a suite runs, the binary of the suite expected next is pushed
+    to its own staging directory under target_test_path, and moved into
+    place with one shell command when that suite starts. Coverage data
+    of a finished suite is pulled in a background job while the next
+    suite runs; wait_all() waits for these jobs at the end of the run.
+    """
+    _pipeline_dic = {}
+    _claimed_set = set()
+    _lock = threading.Lock()
+
+    def __init__(self, device, target_test_path):
+        self.device = device
+        self.stage_root = "%s/%s" % (target_test_path.rstrip("/"),
+                                     STAGE_DIR_NAME)
+        self.stage_job = None
+        self.job_list = []
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get_pipeline(cls, device, target_test_path):
+        serial = str(device.__get_serial__())
+        with cls._lock:
+            pipeline = cls._pipeline_dic.get(serial)
+            if pipeline is None or pipeline.device is not device:
+                pipeline = SuitePipeline(device, target_test_path)
+                cls._pipeline_dic[serial] = pipeline
+            return pipeline
+
+    @classmethod
+    def wait_all(cls):
+        with cls._lock:
+            pipeline_list = list(cls._pipeline_dic.values())
+            cls._pipeline_dic = {}
+            cls._claimed_set = set()
+        for pipeline in pipeline_list:
+            pipeline.wait_jobs()
+
+    @classmethod
+    def _claim_next_suite(cls, suite_file, suite_list):
+        # 多设备时各设备从同一队列取用例，只预取尚未被任何设备预取或执行的用例
+        with cls._lock:
+            cls._claimed_set.add(suite_file)
+            if suite_file not in suite_list:
+                return None
+            for next_suite in suite_list[suite_list.index(suite_file) + 1:]:
+                if next_suite not in cls._claimed_set:
+                    cls._claimed_set.add(next_suite)
+                    return next_suite
+        return None
+
+    def _get_stage_dir(self, suite_file):
+        return "%s/suite/%s" % (self.stage_root, os.path.basename(suite_file))
+
+    def take_staged_suite(self, suite_file, target_test_path):
+        # 下一个测试套已预取时移动到测试目录，返回True；否则由调用方正常推送
+        with self.lock:
+            stage_job = self.stage_job
+            self.stage_job = None
+        if stage_job is None:
+            return False
+        stage_job.thread.join()
+        if stage_job.suite_file != suite_file or not stage_job.is_staged:
+            self._execute("rm -rf %s" % stage_job.stage_dir)
+            return False
+        output = self._execute("mv -f {0}/{1} {2}/ && echo {3}; rm -rf {0}".format(
+            stage_job.stage_dir, os.path.basename(suite_file),
+            target_test_path.rstrip("/"), STAGE_DONE_MARK))
+        if STAGE_DONE_MARK not in str(output):
+            LOG.warning("Move staged %s failed: %s" % (suite_file, output))
+            return False
+        LOG.info("Use %s staged during the previous test suite" %
+                 os.path.basename(suite_file))
+        return True
+
+    def stage_next_suite(self, suite_file, suite_list):
+        next_suite = self._claim_next_suite(suite_file, suite_list)
+        if next_suite is None or not os.path.isfile(next_suite):
+            return
+        stage_job = _StageJob(next_suite, self._get_stage_dir(next_suite))
+        stage_job.thread = threading.Thread(
+            target=self._stage, args=(stage_job,), daemon=True)
+        with self.lock:
+            last_stage_job = self.stage_job
+            self.stage_job = stage_job
+        if last_stage_job is not None:
+            last_stage_job.thread.join()
+        stage_job.thread.start()
+
+    def _stage(self, stage_job):
+        try:
+            # 每个设备只保留一个预取的测试套
+            self._execute("rm -rf {0}/suite; mkdir -p {1}".format(
+                self.stage_root, stage_job.stage_dir))
+            self.device.push_file(stage_job.suite_file, stage_job.stage_dir)
+            stage_job.is_staged = True
+        except (ExecuteTerminate, DeviceError, OSError) as error:
+            LOG.warning("Stage %s failed: %s" % (stage_job.suite_file, error))
+
+    def move_to_stage(self, remote_file, name):
+        # 将设备上的文件移出测试目录，避免被下一个测试套清理，返回新的路径
+        stage_file = "%s/out/%s" % (self.stage_root, name)
+        output = self._execute("mkdir -p {0}/out && mv -f {1} {2} && echo {3}".format(
+            self.stage_root, remote_file, stage_file, STAGE_DONE_MARK))
+        return stage_file if STAGE_DONE_MARK in str(output) else None
+
+    def submit(self, name, func, *args):
+        thread = threading.Thread(target=self._run_job, args=(name, func, args),
+                                  daemon=True)
+        with self.lock:
+            self.job_list = [job for job in self.job_list if job.is_alive()]
+            self.job_list.append(thread)
+        thread.start()
+
+    def wait_jobs(self):
+        with self.lock:
+            job_list = self.job_list
+            self.job_list = []
+        if job_list:
+            LOG.info("Wait for %s background pull jobs" % len(job_list))
+        for job in job_list:
+            job.join()
+        with self.lock:
+            stage_job = self.stage_job
+            self.stage_job = None
+        if stage_job is not None:
+            stage_job.thread.join()
+            self._execute("rm -rf %s" % stage_job.stage_dir)
+
+    @classmethod
+    def _run_job(cls, name, func, args):
+        try:
+            func(*args)
+        except (ExecuteTerminate, DeviceError, OSError) as error:
+            LOG.warning("Background job %s failed: %s" % (name, error))
+
+    def _execute(self, command):
+        try:
+            return self.device.execute_shell_command(command)
+        except (ExecuteTerminate, DeviceError) as error:
+            LOG.warning("Execute %s failed: %s" % (command, error))
+            return ""
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import math
+import time
+import threading
+
+from xdevice import platform_logger
+from xdevice import ExecuteTerminate
+from xdevice import DeviceError
+from core.config.config_manager import UserConfigManager
+from core.config.suite_duration import SuiteDurationHistory
+
+__all__ = ["SuiteTimeoutModel", "InactivityWatchdog", "get_percentile",
+           "get_kill_command"]
+
+LOG = platform_logger("SuiteTimeout")
+
+# 以下默认值可在user_config.xml的<suite_timeout>中配置，时间单位为秒
+DEFAULT_TIMEOUT_FACTOR = 3.0
+DEFAULT_TIMEOUT_FLOOR = 60
+DEFAULT_TIMEOUT_CEILING = 3600
+DEFAULT_INACTIVITY_TIMEOUT = 300
+TIMEOUT_PERCENT = 99
+# 历史耗时少于该个数时仍使用默认超时时间
+MIN_DURATION_SAMPLES = 3
+WATCHDOG_INTERVAL = 1
+
+
+def get_percentile(sample_list, percent):
+    # 最近秩法，样本较少时p99即为最大值
+    if not sample_list:
+        return None
+    sorted_list = sorted(sample_list)
+    rank = max(int(math.ceil(percent / 100.0 * len(sorted_list))), 1)
+    return sorted_list[rank - 1]
+
+
+def get_kill_command(process_name):
+    # pidof按进程名精确匹配，不会结束名称包含该名字的其他测试套和启动用例的shell
+    return "pids=$(pidof %s) && kill -9 $pids" % process_name
+
+
+class SuiteTimeoutModel(object):
+    """
+    Per suite timeouts learned from the local duration history.
+
+    The timeout of a suite with enough history is the p99 of its recent
+    execution times multiplied by a factor, kept between a floor and a
+    ceiling; other suites use the default timeout of the driver.
+    """
+    _config_dic = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get_config(cls):
+        with cls._lock:
+            if cls._config_dic is None:
+                cls._config_dic = cls._load_config()
+            return cls._config_dic
+
+    @classmethod
+    def _load_config(cls):
+        config_dic = UserConfigManager().get_user_config("suite_timeout")
+        default_dic = {"factor": DEFAULT_TIMEOUT_FACTOR,
+                       "floor": DEFAULT_TIMEOUT_FLOOR,
+                       "ceiling": DEFAULT_TIMEOUT_CEILING,
+                       "inactivity": DEFAULT_INACTIVITY_TIMEOUT}
+        for key, default_value in default_dic.items():
+            try:
+                default_dic[key] = float(config_dic.get(key, "") or
+                                         default_value)
+            except ValueError:
+                LOG.warning("%s of suite_timeout is not a number" % key)
+        return default_dic
+
+    @classmethod
+    def get_timeout(cls, suite_file, default_timeout):
+        # 超时时间单位与default_timeout一致，均为秒
+        sample_list = SuiteDurationHistory.get_instance().get_samples(
+            suite_file)
+        if len(sample_list) < MIN_DURATION_SAMPLES:
+            return default_timeout
+        config_dic = cls._get_config()
+        timeout = get_percentile(sample_list, TIMEOUT_PERCENT) * \
+            config_dic.get("factor")
+        timeout = min(max(timeout, config_dic.get("floor")),
+                      config_dic.get("ceiling"))
+        LOG.info("Timeout of %s is %.1fs from %s history durations" % (
+            SuiteDurationHistory.get_suite_name(suite_file), timeout,
+            len(sample_list)))
+        return timeout
+
+    @classmethod
+    def get_inactivity_timeout(cls, timeout):
+        # 没有输出的时间超过该值时认为用例已挂死，不超过用例的超时时间，0表示不检测
+        inactivity = cls._get_config().get("inactivity")
+        if inactivity <= 0:
+            return 0
+        return min(inactivity, timeout)
+
+    @classmethod
+    def record(cls, suite_file, duration):
+        SuiteDurationHistory.get_instance().add_sample(suite_file, duration)
+
+    @classmethod
+    def save(cls):
+        SuiteDurationHistory.get_instance().save()
+
+
+class InactivityWatchdog(object):
+    """
+    Calls on_timeout once when no output has been received for timeout
+    seconds. Used as a shell output receiver, alone or in a
+    TeeOutputReceiver, so that every output chunk counts as activity.
+    """
+
+    def __init__(self, timeout, on_timeout, name=""):
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+        self.name = name
+        self.active_time = time.time()
+        self.is_triggered = False
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.timeout <= 0:
+            return
+        self.active_time = time.time()
+        self.thread = threading.Thread(target=self._run, daemon=True,
+                                       name="InactivityWatchdog")
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def touch(self):
+        self.active_time = time.time()
+
+    def __read__(self, output):
+        self.touch()
+
+    def __error__(self, message):
+        pass
+
+    def __done__(self, result_code="", message=""):
+        pass
+
+    def _run(self):
+        while not self.stop_event.wait(WATCHDOG_INTERVAL):
+            if time.time() - self.active_time < self.timeout:
+                continue
+            self.is_triggered = True
+            LOG.error("No output from %s in %ss, stop it as hung" % (
+                self.name, self.timeout))
+            try:
+                self.on_timeout()
+            except (ExecuteTerminate, DeviceError) as error:
+                LOG.warning("Stop %s failed: %s" % (self.name, error))
+            return
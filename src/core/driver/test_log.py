@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import re
+import gzip
+import stat
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from xdevice import platform_logger
+
+__all__ = ["scan_test_log", "TestLogCompressor"]
+
+LOG = platform_logger("TestLog")
+
+READ_SIZE = 1024 * 1024
+# 作为错误信息保留的日志末尾大小
+TAIL_SIZE = 64 * 1024
+# 标记所在行前后最多保留的长度，也是相邻两块之间重叠扫描的长度
+MARKER_LINE_SIZE = 512
+MAX_MARKER_LINES = 50
+# 生成用例结果时需要判断的标记，包括fuzz用例崩溃和执行完成的输出
+MARKER_PATTERN = re.compile(
+    rb"AddressSanitizer|LeakSanitizer|Segmentation fault|\[  FAILED  \]|"
+    rb"Done \d+ runs in \d+ second")
+
+FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+MODES = stat.S_IWUSR | stat.S_IRUSR
+
+
+def _get_marker_line(buffer, start, end):
+    line_start = max(start - MARKER_LINE_SIZE, 0)
+    newline_pos = buffer.rfind(b"\n", line_start, start)
+    if newline_pos != -1:
+        line_start = newline_pos + 1
+    line_end = buffer.find(b"\n", end, end + MARKER_LINE_SIZE)
+    if line_end == -1:
+        line_end = min(end + MARKER_LINE_SIZE, len(buffer))
+    return buffer[line_start:line_end]
+
+
+def scan_test_log(log_path):
+    # 分块读取日志，不把整个日志读入内存，返回作为错误信息的文本：
+    # 末尾TAIL_SIZE之前出现的标记所在行，加上日志末尾TAIL_SIZE的内容
+    marker_list = []
+    tail = b""
+    window = b""
+    offset = 0
+    scanned_end = 0
+    with open(log_path, "rb") as file_desc:
+        for chunk in iter(lambda: file_desc.read(READ_SIZE), b""):
+            # 与上一块末尾重叠扫描，避免标记或其所在行被分块截断
+            buffer = window + chunk
+            buffer_offset = offset - len(window)
+            for match in MARKER_PATTERN.finditer(buffer):
+                if buffer_offset + match.start() < scanned_end:
+                    continue
+                scanned_end = buffer_offset + match.end()
+                if len(marker_list) < MAX_MARKER_LINES:
+                    marker_list.append((buffer_offset + match.start(),
+                                        _get_marker_line(buffer, match.start(),
+                                                         match.end())))
+            offset += len(chunk)
+            window = buffer[-MARKER_LINE_SIZE * 2:]
+            tail = (tail + chunk)[-TAIL_SIZE:]
+    tail_start = offset - len(tail)
+    content = b"\n".join([line for marker_offset, line in marker_list
+                          if marker_offset < tail_start])
+    if content:
+        content += b"\n...\n"
+    if tail_start > 0:
+        LOG.info("%s is %s bytes, keep the last %s bytes as message" % (
+            log_path, offset, len(tail)))
+    return (content + tail).decode("utf-8", errors="ignore")
+
+
+class TestLogCompressor(object):
+    """
+    Compresses the test logs pulled with --hidelog to <log>.gz on a
+    worker thread and removes the plain log, so that a large log neither
+    delays the next suite nor stays uncompressed in the report.
+    """
+    _executor = None
+    _future_list = []
+    _lock = threading.Lock()
+
+    @classmethod
+    def submit(cls, log_path):
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="TestLogCompressor")
+            cls._future_list.append(cls._executor.submit(cls.compress,
+                                                         log_path))
+
+    @classmethod
+    def wait_all(cls):
+        with cls._lock:
+            future_list = cls._future_list
+            cls._future_list = []
+        if future_list:
+            LOG.info("Wait for %s test logs to be compressed" %
+                     len(future_list))
+        for future in future_list:
+            future.result()
+
+    @classmethod
+    def compress(cls, log_path):
+        gzip_path = "%s.gz" % log_path
+        try:
+            if os.path.exists(gzip_path):
+                os.remove(gzip_path)
+            with open(log_path, "rb") as src_file, \
+                    os.fdopen(os.open(gzip_path, FLAGS, MODES), "wb") as \
+                    dst_file, \
+                    gzip.GzipFile(filename=os.path.basename(log_path),
+                                  mode="wb", fileobj=dst_file) as gzip_file:
+                shutil.copyfileobj(src_file, gzip_file, READ_SIZE)
+            os.remove(log_path)
+        except OSError as error:
+            LOG.error("Compress %s failed: %s" % (log_path, error))
+            if os.path.exists(gzip_path) and os.path.exists(log_path):
+                os.remove(gzip_path)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import sys
+import json
+import stat
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+from json import JSONDecodeError
+
+from xdevice import platform_logger
+
+__all__ = ["HapMetadata", "HapMetadataCache"]
+
+LOG = platform_logger("HapMetadataCache")
+
+HAP_METADATA_CACHE_FILE_NAME = "hap_metadata_cache.json"
+HAP_METADATA_CACHE_VERSION = 1
+
+FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+MODES = stat.S_IWUSR | stat.S_IRUSR
+
+
+@dataclass
+class HapMetadata(object):
+    driver_type: str = ""
+    kits: list = field(default_factory=list)
+    test_file_names: list = field(default_factory=list)
+    part_name: str = ""
+
+    @property
+    def has_test_file(self):
+        return len(self.test_file_names) > 0
+
+
+class HapMetadataCache(object):
+    """
+    Cache of the metadata of test suites, parsed once from the .json and
+    .moduleInfo files next to each suite file.
+
+    Records are persisted across runs and reused while the (mtime, size)
+    of both files are unchanged. When the tree is watched for changes,
+    records checked once are trusted until the watcher invalidates them.
+    """
+
+    def __init__(self, cache_path=""):
+        if cache_path == "":
+            # 变量注释 cache_path = OpenHarmony/test/developer_test/reports/hap_metadata_cache.json
+            cache_path = os.path.join(sys.framework_root_dir, "reports",
+                                      HAP_METADATA_CACHE_FILE_NAME)
+        self.cache_path = cache_path
+        self.record_dic = {}
+        self.is_modified = False
+        self.is_watched = False
+        self.trusted_file_set = set()
+        self._load()
+
+    @classmethod
+    def get_json_file_path(cls, suite_file):
+        if suite_file.endswith(".hap"):
+            return suite_file.replace(".hap", ".json")
+        return ""
+
+    @classmethod
+    def get_module_info_file_path(cls, suite_file):
+        if suite_file.endswith(".hap"):
+            return suite_file.replace(".hap", ".moduleInfo")
+        elif "." not in suite_file:
+            return suite_file + ".moduleInfo"
+        return ""
+
+    @classmethod
+    def _get_file_signature(cls, file_path):
+        if not file_path:
+            return None
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return None
+        return [file_stat.st_mtime_ns, file_stat.st_size]
+
+    @classmethod
+    def _load_json_file(cls, file_path):
+        if not file_path or not os.path.exists(file_path):
+            return {}
+        try:
+            with open(file_path, "r") as json_file:
+                data_dic = json.load(json_file)
+        except (OSError, JSONDecodeError) as error:
+            LOG.warning("Parse %s failed: %s" % (file_path, error))
+            return {}
+        return data_dic if isinstance(data_dic, dict) else {}
+
+    def clear(self):
+        self.record_dic = {}
+        self.trusted_file_set = set()
+        self.is_modified = True
+
+    def invalidate_file(self, file_path):
+        # .json和.moduleInfo文件变化时，对应的测试套记录需要重新校验
+        base_path, suffix = os.path.splitext(file_path)
+        if suffix in [".json", ".moduleInfo"]:
+            self.trusted_file_set.discard(base_path + ".hap")
+            self.trusted_file_set.discard(base_path)
+        self.trusted_file_set.discard(file_path)
+
+    def invalidate_tree(self, path):
+        prefix = path + os.sep
+        self.trusted_file_set = set(
+            suite_file for suite_file in self.trusted_file_set
+            if not suite_file.startswith(prefix))
+
+    def invalidate_all(self):
+        self.trusted_file_set = set()
+
+    def get_metadata(self, suite_file):
+        json_file_path = self.get_json_file_path(suite_file)
+        info_file_path = self.get_module_info_file_path(suite_file)
+        if not json_file_path and not info_file_path:
+            return HapMetadata()
+        record = self.record_dic.get(suite_file)
+        if self.is_watched and record and suite_file in self.trusted_file_set:
+            return HapMetadata(**record.get("metadata"))
+        if self.is_watched:
+            self.trusted_file_set.add(suite_file)
+        json_signature = self._get_file_signature(json_file_path)
+        info_signature = self._get_file_signature(info_file_path)
+
+        if record and record.get("json") == json_signature \
+                and record.get("info") == info_signature:
+            return HapMetadata(**record.get("metadata"))
+
+        metadata = self._parse_metadata(suite_file, json_file_path,
+                                        info_file_path)
+        self.record_dic[suite_file] = {
+            "json": json_signature,
+            "info": info_signature,
+            "metadata": asdict(metadata)
+        }
+        self.is_modified = True
+        return metadata
+
+    def save(self):
+        if not self.is_modified:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = "%s.tmp" % self.cache_path
+            with os.fdopen(os.open(temp_path, FLAGS, MODES), "w") as file_desc:
+                json.dump({"version": HAP_METADATA_CACHE_VERSION,
+                           "records": self.record_dic}, file_desc)
+            os.replace(temp_path, self.cache_path)
+            self.is_modified = False
+        except OSError as error:
+            LOG.warning("Save hap metadata cache %s failed: %s" %
+                        (self.cache_path, error))
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r") as file_desc:
+                data_dic = json.load(file_desc)
+            if data_dic.get("version") == HAP_METADATA_CACHE_VERSION:
+                self.record_dic = data_dic.get("records", {})
+        except (OSError, JSONDecodeError, AttributeError) as error:
+            LOG.warning("Load hap metadata cache %s failed: %s" %
+                        (self.cache_path, error))
+            self.record_dic = {}
+
+    def _parse_metadata(self, suite_file, json_file_path, info_file_path):
+        metadata = HapMetadata()
+        data_dic = self._load_json_file(json_file_path)
+        if "driver" in data_dic.keys():
+            driver_dict = data_dic.get("driver")
+            if driver_dict:
+                metadata.driver_type = driver_dict.get("type") or ""
+            else:
+                LOG.error("%s has not set driver." % suite_file)
+
+        kits_list = data_dic.get("kits")
+        if isinstance(kits_list, list):
+            metadata.kits = kits_list
+            for kits_dict in kits_list:
+                if isinstance(kits_dict, dict) and \
+                        "test-file-name" in kits_dict.keys():
+                    metadata.test_file_names.append(
+                        kits_dict.get("test-file-name"))
+
+        info_dic = self._load_json_file(info_file_path)
+        metadata.part_name = info_dic.get("part", "")
+        return metadata
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+
+from xdevice import platform_logger
+from core.config.config_manager import FilterConfigManager
+
+__all__ = ["SelectionPlan", "PathPrefixTrie"]
+
+LOG = platform_logger("SelectionPlan")
+
+
+class PathPrefixTrie(object):
+    """
+    Trie of directory prefixes such as "part" or "part/module".
+
+    A path matches when one of its parent directories is a stored prefix,
+    which is the same as str.startswith(prefix + os.sep) but costs one dict
+    lookup per path component.
+    """
+    _END = ""
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, prefix_item_list):
+        node = self.root
+        for item in prefix_item_list:
+            for name in item.split(os.sep):
+                if name:
+                    node = node.setdefault(name, {})
+        node[self._END] = True
+
+    def match(self, sub_path):
+        node = self.root
+        # 最后一个元素为文件名，只匹配其所在的目录
+        for name in sub_path.split(os.sep)[:-1]:
+            node = node.get(name)
+            if node is None:
+                return False
+            if self._END in node:
+                return True
+        return False
+
+
+class SelectionPlan(object):
+    """
+    Suite selection rules compiled once per run from the run options,
+    filter_config.xml and the --testcasefile json.
+    """
+
+    def __init__(self, options):
+        self.is_valid = True
+        self.testsuit = options.testsuit
+        self.testmodule = options.testmodule
+        self.partname_list = options.partname_list
+        self.testpart = options.testpart
+
+        filter_manager = FilterConfigManager()
+        self.filter_part_set = set(filter_manager.get_filtering_list(
+            "subsystem_name", options.productform))
+        self.filter_file_set = set(filter_manager.get_filtering_list(
+            "testfile_name", options.productform))
+
+        command_list = options.current_raw_cmd.split(" ")
+        self.is_part_specified = "-ss" in command_list or \
+            "-tp" in command_list
+        self.partname_set = set(self.partname_list)
+
+        # -ts参数对于native用例使用","分隔，对于stage用例使用";"分隔
+        self.testsuit_set = set(self.testsuit.split(","))
+        self.stage_testsuit_set = set(self.testsuit.split(";"))
+
+        self.part_module_trie = PathPrefixTrie()
+        module_list = self.testmodule.split(",") if self.testmodule else []
+        for partname in self.partname_list:
+            if module_list:
+                for module in module_list:
+                    self.part_module_trie.add([partname, module])
+            else:
+                self.part_module_trie.add([partname])
+
+        self.testcase_json_dic = {}
+        testcase_json = options.testcasefile
+        if testcase_json and not os.path.exists(testcase_json):
+            LOG.error("%s is not exist." % testcase_json)
+            self.is_valid = False
+        elif testcase_json.endswith(".json"):
+            with open(testcase_json, "r") as json_file:
+                self.testcase_json_dic = json.load(json_file)
+
+    def is_part_selected(self, part_name):
+        if self.is_part_specified and part_name not in self.partname_set:
+            return False
+        if self.testcase_json_dic and part_name not in self.testcase_json_dic:
+            return False
+        # 如果子系统在fiter_config.xml配置文件的<subsystem_name>下面配置过，则过滤
+        if part_name in self.filter_part_set:
+            return False
+        return True
+
+    def is_file_filtered(self, file_name):
+        # 如果文件在fiter_config.xml配置文件的<testfile_name>下面配置过，则过滤
+        return file_name in self.filter_file_set
+
+    def is_valid_suite_file(self, test_case_out_path, suite_file):
+        if not suite_file.startswith(test_case_out_path):
+            return False
+
+        if self.testsuit != "":
+            short_name, _ = os.path.splitext(os.path.basename(suite_file))
+            return short_name in self.testsuit_set
+
+        if len(self.partname_list) == 0:
+            return self.testmodule == ""
+
+        suitfile_subpath = suite_file.replace(test_case_out_path, "")
+        suitfile_subpath = suitfile_subpath.strip(os.sep)
+        return self.part_module_trie.match(suitfile_subpath)
+
+    def is_stage_part_matched(self, part_name):
+        # 如果stage测试指定了-tp，只有部件名与moduleInfo中part一致的HAP包才会加入最终执行的队列
+        return self.testpart == [] or self.testpart[0] == part_name
+
+    def is_stage_suite_matched(self, prefix_name):
+        # 如果stage测试指定了-ts，只有完全匹配的HAP包才会加入最终执行的队列
+        return self.testsuit == "" or prefix_name in self.stage_testsuit_set
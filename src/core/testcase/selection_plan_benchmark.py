@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# 对比SelectionPlan与原有列表遍历筛选用例文件的耗时，在src目录下执行：
+# python3 -m core.testcase.selection_plan_benchmark --parts 100 --modules 5
+
+import os
+import sys
+import time
+import argparse
+from argparse import Namespace
+
+TEST_CASE_OUT_PATH = os.path.join(os.sep, "out", "tests", "unittest")
+
+
+def _old_valid_suite_file(test_case_out_path, suite_file, options):
+    # SelectionPlan之前的实现：逐个部件和模块做startswith匹配
+    if not suite_file.startswith(test_case_out_path):
+        return False
+    is_valid_status = False
+    suitfile_subpath = suite_file.replace(test_case_out_path, "")
+    suitfile_subpath = suitfile_subpath.strip(os.sep)
+    if len(options.partname_list) == 0:
+        return options.testmodule == ""
+    for partname in options.partname_list:
+        if options.testmodule != "":
+            for module in options.testmodule.split(","):
+                if suitfile_subpath.startswith(
+                        partname + os.sep + module + os.sep):
+                    is_valid_status = True
+                    break
+        elif suitfile_subpath.startswith(partname + os.sep):
+            is_valid_status = True
+            break
+    return is_valid_status
+
+
+def _get_options(part_count, module_count):
+    partname_list = ["part_%d" % index for index in range(part_count)]
+    return Namespace(
+        testsuit="",
+        testmodule=",".join("module_%d" % index
+                            for index in range(module_count)),
+        partname_list=partname_list,
+        testpart=partname_list,
+        productform="phone",
+        current_raw_cmd="run -t UT -tp %s" % ",".join(partname_list),
+        testcasefile="")
+
+
+def _get_suite_file_list(part_count, module_count, file_count):
+    # 一半的文件在未指定的模块目录下，不会被选中
+    suite_file_list = []
+    for part_index in range(part_count):
+        for module_index in range(module_count * 2):
+            for file_index in range(file_count):
+                suite_file_list.append(os.path.join(
+                    TEST_CASE_OUT_PATH, "part_%d" % part_index,
+                    "module_%d" % module_index, "Test%d" % file_index))
+    return suite_file_list
+
+
+def _benchmark(part_count, module_count, file_count, filter_count):
+    options = _get_options(part_count, module_count)
+    suite_file_list = _get_suite_file_list(part_count, module_count,
+                                           file_count)
+    filter_file_list = ["Filtered%d" % index for index in range(filter_count)]
+
+    start_time = time.time()
+    old_count = 0
+    for suite_file in suite_file_list:
+        if os.path.basename(suite_file) in filter_file_list:
+            continue
+        if _old_valid_suite_file(TEST_CASE_OUT_PATH, suite_file, options):
+            old_count += 1
+    old_time = time.time() - start_time
+
+    from core.testcase.selection_plan import SelectionPlan
+    start_time = time.time()
+    selection_plan = SelectionPlan(options)
+    selection_plan.filter_file_set = set(filter_file_list)
+    plan_count = 0
+    for suite_file in suite_file_list:
+        if selection_plan.is_file_filtered(os.path.basename(suite_file)):
+            continue
+        if selection_plan.is_valid_suite_file(TEST_CASE_OUT_PATH,
+                                              suite_file):
+            plan_count += 1
+    plan_time = time.time() - start_time
+    if old_count != plan_count:
+        print("Selected count mismatch: list scan %s, plan %s" % (
+            old_count, plan_count))
+    return len(suite_file_list), plan_count, old_time, plan_time
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare SelectionPlan with the list scans it replaced")
+    parser.add_argument("--parts", type=int, default=100,
+                        help="parts given by -tp")
+    parser.add_argument("--modules", type=int, default=5,
+                        help="modules given by -tm")
+    parser.add_argument("--files", type=int, default=10,
+                        help="test files per module directory")
+    parser.add_argument("--filters", type=int, default=200,
+                        help="testfile_name entries in filter_config.xml")
+    args = parser.parse_args()
+    if not hasattr(sys, "framework_res_dir"):
+        # 单独执行时没有经过main初始化，filter_config.xml从developer_test目录下读取
+        sys.framework_res_dir = os.path.abspath(os.path.join(
+            os.path.dirname(__file__), "..", "..", ".."))
+    file_count, selected_count, old_time, plan_time = _benchmark(
+        args.parts, args.modules, args.files, args.filters)
+    print("%s test files, %s selected" % (file_count, selected_count))
+    print("list scan:      %.3fs" % old_time)
+    print("selection plan: %.3fs" % plan_time)
+
+
+if __name__ == "__main__":
+    main()
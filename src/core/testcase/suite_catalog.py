@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import threading
+
+from xdevice import platform_logger
+from core.testcase.suite_index import SuiteIndex
+from core.testcase.hap_metadata import HapMetadataCache
+from core.testcase.suite_watcher import InotifyWatcher
+
+__all__ = ["SuiteCatalog"]
+
+LOG = platform_logger("SuiteCatalog")
+
+
+class SuiteCatalog(object):
+    """
+    Suite index, HAP metadata and resource xml locations kept in memory
+    between runs of the console while the watch command is active.
+
+    With inotify the catalog is updated from file system events and
+    unchanged directories are answered without any stat. Without inotify
+    it falls back to polling, that is checking the mtime of each catalog
+    directory when a run starts.
+    """
+    __instance = None
+
+    def __init__(self):
+        self.suite_index = SuiteIndex()
+        self.hap_metadata_cache = HapMetadataCache()
+        self.resource_xml_dic = {}
+        self.watch_path_list = []
+        self.watcher = None
+        self.change_lock = threading.Lock()
+        self.change_list = []
+
+    @classmethod
+    def get_watching_catalog(cls):
+        return cls.__instance
+
+    @classmethod
+    def start_watch(cls, path_list):
+        if cls.__instance is not None:
+            LOG.info("Suite catalog is already watching %s" %
+                     cls.__instance.watch_path_list)
+            return cls.__instance
+        suite_catalog = SuiteCatalog()
+        suite_catalog._start_watcher(
+            [path for path in path_list if os.path.isdir(path)])
+        cls.__instance = suite_catalog
+        return suite_catalog
+
+    @classmethod
+    def stop_watch(cls):
+        if cls.__instance is None:
+            return
+        cls.__instance._stop_watcher()
+        cls.__instance.suite_index.save()
+        cls.__instance.hap_metadata_cache.save()
+        cls.__instance = None
+
+    @property
+    def is_inotify_mode(self):
+        return self.watcher is not None
+
+    def apply_changes(self):
+        # 在每次用例发现前调用，将监控线程收集到的变化同步到索引中
+        if self.watcher is not None and not self.watcher.is_healthy:
+            LOG.warning("Inotify watcher is incomplete, fallback to polling")
+            self._stop_watcher()
+        with self.change_lock:
+            change_list = self.change_list
+            self.change_list = []
+        for path, is_dir, is_structure_change in change_list:
+            self._apply_change(path, is_dir, is_structure_change)
+
+    def get_resource_xml_file_path(self, suite_file, find_func):
+        if not self.is_inotify_mode:
+            return find_func(suite_file)
+        suite_dir = os.path.dirname(suite_file)
+        xml_filepath = self.resource_xml_dic.get(suite_dir)
+        if xml_filepath is None:
+            xml_filepath = find_func(suite_file)
+            self.resource_xml_dic[suite_dir] = xml_filepath
+        return xml_filepath
+
+    def _start_watcher(self, path_list):
+        self.watch_path_list = path_list
+        if InotifyWatcher.is_supported():
+            watcher = InotifyWatcher(path_list, self._on_changed)
+            try:
+                watcher.start()
+                self.watcher = watcher
+            except OSError as error:
+                LOG.warning("Start inotify watcher failed: %s" % error)
+        self.suite_index.is_watched = self.is_inotify_mode
+        self.hap_metadata_cache.is_watched = self.is_inotify_mode
+        if not self.is_inotify_mode:
+            LOG.info("Inotify is not available, poll %s for changes" %
+                     path_list)
+
+    def _stop_watcher(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        self.suite_index.is_watched = False
+        self.suite_index.invalidate_all()
+        self.hap_metadata_cache.is_watched = False
+        self.hap_metadata_cache.invalidate_all()
+        self.resource_xml_dic = {}
+
+    def _on_changed(self, path, is_dir, is_structure_change):
+        with self.change_lock:
+            self.change_list.append((path, is_dir, is_structure_change))
+
+    def _apply_change(self, path, is_dir, is_structure_change):
+        if path is None:
+            self.suite_index.invalidate_all()
+            self.hap_metadata_cache.invalidate_all()
+            self.resource_xml_dic = {}
+            return
+        if is_structure_change:
+            # 文件或目录的增删改名会改变所在目录的内容，resource目录的位置也可能变化
+            self.suite_index.invalidate_dir(os.path.dirname(path))
+            self.resource_xml_dic = {}
+        if is_dir:
+            self.suite_index.invalidate_tree(path)
+            self.hap_metadata_cache.invalidate_tree(path)
+        else:
+            self.hap_metadata_cache.invalidate_file(path)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import sys
+import json
+import stat
+from json import JSONDecodeError
+
+from xdevice import platform_logger
+
+__all__ = ["SuiteIndex"]
+
+LOG = platform_logger("SuiteIndex")
+
+SUITE_INDEX_FILE_NAME = "suite_index.json"
+SUITE_INDEX_VERSION = 1
+
+FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+MODES = stat.S_IWUSR | stat.S_IRUSR
+
+
+class SuiteIndex(object):
+    """
+    Persistent index of the test case output directories.
+
+    Each directory is stored with its mtime and inode, together with the
+    names of the files and sub directories it holds. A directory is listed
+    again only when its mtime or inode changed since the last run, so an
+    unchanged tests tree is answered without listdir/isfile per entry.
+
+    When the tree is watched for changes, directories checked once are
+    trusted without stat until the watcher invalidates them.
+    """
+
+    def __init__(self, index_path=""):
+        if index_path == "":
+            # 变量注释 index_path = OpenHarmony/test/developer_test/reports/suite_index.json
+            index_path = os.path.join(sys.framework_root_dir, "reports",
+                                      SUITE_INDEX_FILE_NAME)
+        self.index_path = index_path
+        self.dir_dic = {}
+        self.is_modified = False
+        self.is_watched = False
+        self.trusted_dir_set = set()
+        self._load()
+
+    def clear(self):
+        LOG.info("Rebuild suite index %s" % self.index_path)
+        self.dir_dic = {}
+        self.trusted_dir_set = set()
+        self.is_modified = True
+
+    def invalidate_dir(self, path):
+        self.trusted_dir_set.discard(os.path.abspath(path))
+
+    def invalidate_tree(self, path):
+        path = os.path.abspath(path)
+        prefix = path + os.sep
+        self.trusted_dir_set = set(
+            dir_path for dir_path in self.trusted_dir_set
+            if dir_path != path and not dir_path.startswith(prefix))
+
+    def invalidate_all(self):
+        self.trusted_dir_set = set()
+
+    def get_sub_dir_list(self, path):
+        # 返回目录下的一级子目录名称列表，对应测试用例输出目录下的部件名
+        dir_info = self._get_dir_info(os.path.abspath(path))
+        if not dir_info:
+            return []
+        return dir_info.get("dirs") + dir_info.get("links")
+
+    def get_file_list(self, path):
+        # 获取目录下每一个文件，顺序与os.walk自顶向下遍历一致
+        file_list = []
+        self._append_file_list(os.path.abspath(path), file_list)
+        return file_list
+
+    def save(self):
+        if not self.is_modified:
+            return
+        index_dir = os.path.dirname(self.index_path)
+        try:
+            os.makedirs(index_dir, exist_ok=True)
+            temp_path = "%s.tmp" % self.index_path
+            with os.fdopen(os.open(temp_path, FLAGS, MODES), "w") as file_desc:
+                json.dump({"version": SUITE_INDEX_VERSION,
+                           "dirs": self.dir_dic}, file_desc)
+            os.replace(temp_path, self.index_path)
+            self.is_modified = False
+        except OSError as error:
+            LOG.warning("Save suite index %s failed: %s" %
+                        (self.index_path, error))
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r") as file_desc:
+                data_dic = json.load(file_desc)
+            if data_dic.get("version") == SUITE_INDEX_VERSION:
+                self.dir_dic = data_dic.get("dirs", {})
+        except (OSError, JSONDecodeError, AttributeError) as error:
+            LOG.warning("Load suite index %s failed: %s" %
+                        (self.index_path, error))
+            self.dir_dic = {}
+
+    def _append_file_list(self, current_dir, file_list):
+        dir_info = self._get_dir_info(current_dir)
+        if not dir_info:
+            return
+        for file_name in dir_info.get("files"):
+            file_list.append(os.path.join(current_dir, file_name))
+        for dir_name in dir_info.get("dirs"):
+            self._append_file_list(os.path.join(current_dir, dir_name),
+                                   file_list)
+
+    def _get_dir_info(self, current_dir):
+        if self.is_watched and current_dir in self.trusted_dir_set:
+            return self.dir_dic.get(current_dir)
+        dir_info = self._check_dir_info(current_dir)
+        if self.is_watched and dir_info:
+            self.trusted_dir_set.add(current_dir)
+        return dir_info
+
+    def _check_dir_info(self, current_dir):
+        try:
+            dir_stat = os.stat(current_dir)
+        except OSError:
+            self._remove_dir_info(current_dir)
+            return None
+
+        dir_info = self.dir_dic.get(current_dir)
+        if dir_info and dir_info.get("mtime") == dir_stat.st_mtime_ns \
+                and dir_info.get("inode") == dir_stat.st_ino:
+            return dir_info
+
+        file_names = []
+        dir_names = []
+        link_names = []
+        try:
+            with os.scandir(current_dir) as entries:
+                for entry in entries:
+                    # 与os.walk保持一致：软链接目录只记录，不进入遍历
+                    if entry.is_dir(follow_symlinks=False):
+                        dir_names.append(entry.name)
+                    elif entry.is_dir():
+                        link_names.append(entry.name)
+                    elif entry.is_file():
+                        file_names.append(entry.name)
+        except OSError as error:
+            LOG.warning("Scan %s failed: %s" % (current_dir, error))
+            return None
+
+        dir_info = {
+            "mtime": dir_stat.st_mtime_ns,
+            "inode": dir_stat.st_ino,
+            "files": file_names,
+            "dirs": dir_names,
+            "links": link_names
+        }
+        self.dir_dic[current_dir] = dir_info
+        self.is_modified = True
+        return dir_info
+
+    def _remove_dir_info(self, current_dir):
+        if current_dir in self.dir_dic:
+            self.dir_dic.pop(current_dir)
+            self.is_modified = True
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+# 对比os.walk遍历与冷/热用例索引获取用例文件列表的耗时，在src目录下执行：
+# python3 -m core.testcase.suite_index_benchmark --parts 50 --dirs 20 --files 10
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+from core.testcase.suite_index import SuiteIndex
+
+
+def _create_tree(root_path, part_count, dir_count, file_count):
+    # 模拟tests目录：部件/模块目录/用例文件
+    for part_index in range(part_count):
+        for dir_index in range(dir_count):
+            dir_path = os.path.join(root_path, "part_%d" % part_index,
+                                    "module_%d" % dir_index)
+            os.makedirs(dir_path)
+            for file_index in range(file_count):
+                file_path = os.path.join(dir_path, "Test%d" % file_index)
+                with open(file_path, "w") as file_desc:
+                    file_desc.write("")
+
+
+def _walk_file_list(root_path):
+    # 不使用索引时的遍历方式
+    file_list = []
+    for part_name in os.listdir(root_path):
+        for dir_path, _, file_names in os.walk(
+                os.path.join(root_path, part_name)):
+            file_list.extend(os.path.join(dir_path, file_name)
+                             for file_name in file_names
+                             if os.path.isfile(
+                                 os.path.join(dir_path, file_name)))
+    return file_list
+
+
+def _index_file_list(suite_index, root_path):
+    file_list = []
+    for part_name in suite_index.get_sub_dir_list(root_path):
+        file_list.extend(suite_index.get_file_list(
+            os.path.join(root_path, part_name)))
+    return file_list
+
+
+def _benchmark(part_count, dir_count, file_count):
+    work_path = tempfile.mkdtemp()
+    root_path = os.path.join(work_path, "tests")
+    index_path = os.path.join(work_path, "suite_index.json")
+    _create_tree(root_path, part_count, dir_count, file_count)
+
+    start_time = time.time()
+    walk_count = len(_walk_file_list(root_path))
+    walk_time = time.time() - start_time
+
+    # 冷启动：没有索引文件，需要扫描所有目录并保存索引
+    start_time = time.time()
+    suite_index = SuiteIndex(index_path)
+    cold_count = len(_index_file_list(suite_index, root_path))
+    suite_index.save()
+    cold_time = time.time() - start_time
+
+    # 热启动：新进程加载索引文件，目录未变化时只stat不listdir
+    start_time = time.time()
+    suite_index = SuiteIndex(index_path)
+    warm_count = len(_index_file_list(suite_index, root_path))
+    warm_time = time.time() - start_time
+    shutil.rmtree(work_path)
+    if not walk_count == cold_count == warm_count:
+        print("File count mismatch: walk %s, cold %s, warm %s" % (
+            walk_count, cold_count, warm_count))
+    return walk_count, walk_time, cold_time, warm_time
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare os.walk with cold and warm suite index scans")
+    parser.add_argument("--parts", type=int, default=50)
+    parser.add_argument("--dirs", type=int, default=20,
+                        help="module directories per part")
+    parser.add_argument("--files", type=int, default=10,
+                        help="test files per module directory")
+    args = parser.parse_args()
+    file_count, walk_time, cold_time, warm_time = _benchmark(
+        args.parts, args.dirs, args.files)
+    print("%s test files" % file_count)
+    print("os.walk:     %.3fs" % walk_time)
+    print("cold index:  %.3fs" % cold_time)
+    print("warm index:  %.3fs" % warm_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+#
+# Copyright (c) 2022 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import ctypes
+import ctypes.util
+import errno
+import platform
+import select
+import struct
+import threading
+
+from xdevice import platform_logger
+
+__all__ = ["InotifyWatcher", "WATCH_MASK", "IN_MODIFY"]
+
+LOG = platform_logger("SuiteWatcher")
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+    IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | \
+    IN_ONLYDIR
+STRUCTURE_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+    IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+EVENT_BUFFER_SIZE = 64 * 1024
+SELECT_TIMEOUT = 1
+
+
+class InotifyWatcher(object):
+    """
+    Recursive inotify watcher of directory trees.
+
+    Each event is reported as callback(path, is_dir, is_structure_change),
+    where a structure change is a file or directory created, deleted or
+    moved. An event queue overflow is reported as callback(None, True, True).
+    is_healthy turns False once a new directory could not be watched, after
+    which the reported events are no longer complete.
+
+    mask selects the reported events, and with recursive set to False only
+    the given directories are watched, not their sub directories.
+    """
+    _libc = None
+
+    def __init__(self, path_list, callback, mask=WATCH_MASK, recursive=True):
+        self.path_list = [os.path.abspath(path) for path in path_list]
+        self.callback = callback
+        self.mask = mask | IN_ONLYDIR
+        self.recursive = recursive
+        self.inotify_fd = -1
+        self.wd_dic = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.is_healthy = True
+
+    @classmethod
+    def is_supported(cls):
+        if platform.system() != "Linux":
+            return False
+        return cls._get_libc() is not None
+
+    @classmethod
+    def _get_libc(cls):
+        if cls._libc is None:
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",
+                                   use_errno=True)
+                libc.inotify_init1.argtypes = [ctypes.c_int]
+                libc.inotify_add_watch.argtypes = [ctypes.c_int,
+                                                   ctypes.c_char_p,
+                                                   ctypes.c_uint32]
+                cls._libc = libc
+            except (OSError, AttributeError) as error:
+                LOG.debug("inotify is not available: %s" % error)
+                return None
+        return cls._libc
+
+    def start(self):
+        libc = self._get_libc()
+        self.inotify_fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.inotify_fd < 0:
+            error_no = ctypes.get_errno()
+            raise OSError(error_no, os.strerror(error_no))
+        try:
+            for path in self.path_list:
+                self._add_watch_tree(path)
+        except OSError:
+            self._close()
+            raise
+        LOG.info("Watching %s directories under %s" % (
+            len(self.wd_dic), self.path_list))
+        self.thread = threading.Thread(target=self._run,
+                                       name="SuiteWatcher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self._close()
+
+    def _close(self):
+        if self.inotify_fd >= 0:
+            os.close(self.inotify_fd)
+            self.inotify_fd = -1
+        self.wd_dic = {}
+
+    def _add_watch(self, path):
+        wd = self._get_libc().inotify_add_watch(
+            self.inotify_fd, os.fsencode(path), self.mask)
+        if wd < 0:
+            error_no = ctypes.get_errno()
+            # 目录在添加监控前被删除，忽略即可；监控数量超过上限则抛出异常
+            if error_no in [errno.ENOENT, errno.ENOTDIR]:
+                return
+            raise OSError(error_no, "%s: %s" % (os.strerror(error_no), path))
+        self.wd_dic[wd] = path
+
+    def _add_watch_tree(self, path):
+        if not os.path.isdir(path):
+            return
+        if not self.recursive:
+            self._add_watch(path)
+            return
+        for current_dir, _, _ in os.walk(path):
+            self._add_watch(current_dir)
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                readable, _, _ = select.select([self.inotify_fd], [], [],
+                                               SELECT_TIMEOUT)
+                if not readable:
+                    continue
+                data = os.read(self.inotify_fd, EVENT_BUFFER_SIZE)
+            except BlockingIOError:
+                continue
+            except OSError as error:
+                LOG.error("Read inotify events failed: %s" % error)
+                self.is_healthy = False
+                self.callback(None, True, True)
+                return
+            self._process_events(data)
+
+    def _process_events(self, data):
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b"\0")
+            offset += name_length
+
+            if mask & IN_Q_OVERFLOW:
+                LOG.warning("inotify event queue overflow")
+                self.callback(None, True, True)
+                continue
+            watch_dir = self.wd_dic.get(wd)
+            if mask & IN_IGNORED:
+                self.wd_dic.pop(wd, None)
+                continue
+            if watch_dir is None:
+                continue
+
+            path = os.path.join(watch_dir, os.fsdecode(name)) \
+                if name else watch_dir
+            is_dir = bool(mask & IN_ISDIR) or not name
+            if is_dir and self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    self._add_watch_tree(path)
+                except OSError as error:
+                    LOG.warning("Watch %s failed: %s" % (path, error))
+                    self.is_healthy = False
+                    self.callback(None, True, True)
+            self.callback(path, is_dir, bool(mask & STRUCTURE_MASK))
@@ -24,8 +24,11 @@ from json import JSONDecodeError
 from core.utils import get_build_output_path
 from core.common import is_open_source_product
 
-from core.utils import get_file_list_by_postfix
-from core.config.config_manager import FilterConfigManager
+from core.utils import iter_dir_file_list
+from core.testcase.suite_index import SuiteIndex
+from core.testcase.hap_metadata import HapMetadataCache
+from core.testcase.suite_catalog import SuiteCatalog
+from core.testcase.selection_plan import SelectionPlan
 from xdevice import platform_logger
 from xdevice import DeviceTestType
 from xdevice import Binder
@@ -48,6 +51,48 @@ FILTER_SUFFIX_NAME_LIST = [".TOC", ".info", ".pyc"]
 
 
 class TestCaseManager(object):
+    def __init__(self):
+        self.suite_index = None
+        self.hap_metadata_cache = None
+
+    def get_suite_index(self, options):
+        if self.suite_index is None:
+            # console处于watch模式时复用常驻内存的用例目录索引
+            suite_catalog = SuiteCatalog.get_watching_catalog()
+            if suite_catalog is not None:
+                suite_catalog.apply_changes()
+                self.suite_index = suite_catalog.suite_index
+            else:
+                self.suite_index = SuiteIndex()
+            if getattr(options, "rebuild_index", False):
+                self.suite_index.clear()
+        return self.suite_index
+
+    def get_hap_metadata_cache(self, options):
+        if self.hap_metadata_cache is None:
+            suite_catalog = SuiteCatalog.get_watching_catalog()
+            if suite_catalog is not None:
+                suite_catalog.apply_changes()
+                self.hap_metadata_cache = suite_catalog.hap_metadata_cache
+            else:
+                self.hap_metadata_cache = HapMetadataCache()
+            if getattr(options, "rebuild_index", False):
+                self.hap_metadata_cache.clear()
+        return self.hap_metadata_cache
+
+    @classmethod
+    def get_scan_dir_list(cls, part_case_dir, options):
+        # 指定了部件和模块时，只需要遍历部件下对应模块的目录
+        if options.testsuit != "" or options.testmodule == "" or \
+                len(options.partname_list) == 0:
+            return [part_case_dir]
+        scan_dir_list = []
+        for module in options.testmodule.split(","):
+            module_dir = os.path.join(part_case_dir, module)
+            if os.path.isdir(module_dir):
+                scan_dir_list.append(module_dir)
+        return scan_dir_list
+
     @classmethod
     def get_valid_suite_file(cls, test_case_out_path, suite_file, options):
         partlist = options.partname_list
@@ -238,155 +283,165 @@ class TestCaseManager(object):
         }
         test_level_dict = {}
         suite_file_dictionary = copy.deepcopy(TESTFILE_TYPE_DATA_DIC)
-        filter_part_list = FilterConfigManager().get_filtering_list(
-            "subsystem_name", options.productform)
-        filter_list_test_file = FilterConfigManager().get_filtering_list(
-            "testfile_name", options.productform)
-        # 遍历测试用例输出目录下面的所有文件夹，每个文件夹对应一个子系统
-        command_list = options.current_raw_cmd.split(" ")
-        # testcase_json
-        testcase_json = options.testcasefile
-        if testcase_json and not os.path.exists(testcase_json):
-            return suite_file_dictionary
+        for type_key, suite_file in self.iter_all_test_file(
+                test_case_out_path, options, testcase_dict, test_level_dict):
+            suite_file_dictionary.get(type_key).append(suite_file)
 
-        testcase_json_dic = {}
-        if os.path.exists(testcase_json) and testcase_json.endswith(".json"):
-            testcase_json_dic = json.load(open(testcase_json))
+        if "testcase_dict" in vars(options) and "test_level_dict" in vars(options):
+            testcase_dict.update(options.testcase_dict)
+            test_level_dict.update(options.test_level_dict)
 
-        for part_name in os.listdir(test_case_out_path):
-            if "-ss" in command_list or "-tp" in command_list:
-                if part_name not in options.partname_list:
-                    continue
-            if testcase_json_dic and part_name not in testcase_json_dic:
+        options.testcase_dict = testcase_dict
+        options.test_level_dict = test_level_dict
+        return suite_file_dictionary
+
+    def iter_test_files(self, test_case_path, options):
+        # 流式获取用例：每分类出一个用例文件就返回(用例类型, 用例文件)，不等待整个目录遍历完成
+        LOG.info("test case path: " + test_case_path)
+        LOG.info("test type list: " + str(options.testtype))
+        options.testcase_dict = {key: {} for key in TESTFILE_TYPE_DATA_DIC}
+        options.test_level_dict = {}
+        if not os.path.exists(test_case_path):
+            LOG.error("%s is not exist." % test_case_path)
+            return
+        for test_type in options.testtype:
+            test_case_out_path = os.path.join(test_case_path, test_type)
+            if not os.path.exists(test_case_out_path):
+                LOG.error("Test case dir does not exist. %s" % test_case_out_path)
+                continue
+            LOG.info("The test case directory: %s" % test_case_out_path)
+            yield from self.iter_all_test_file(test_case_out_path, options,
+                                               options.testcase_dict,
+                                               options.test_level_dict)
+
+    def iter_all_test_file(self, test_case_out_path, options, testcase_dict,
+                           test_level_dict):
+        # 根据运行参数、filter_config.xml和testcase_json生成用例筛选计划
+        selection_plan = SelectionPlan(options)
+        if not selection_plan.is_valid:
+            return
+        testcase_json_dic = selection_plan.testcase_json_dic
+
+        # 遍历测试用例输出目录下面的所有文件夹，每个文件夹对应一个子系统
+        suite_index = self.get_suite_index(options)
+        hap_metadata_cache = self.get_hap_metadata_cache(options)
+        scan_dir_dic = {}
+        for part_name in suite_index.get_sub_dir_list(test_case_out_path):
+            if not selection_plan.is_part_selected(part_name):
                 continue
 
             part_case_dir = os.path.join(test_case_out_path, part_name)
-            if not os.path.isdir(part_case_dir):
+            if testcase_json_dic:
+                scan_dir_list = [part_case_dir]
+            else:
+                scan_dir_list = self.get_scan_dir_list(part_case_dir, options)
+            for scan_dir in scan_dir_list:
+                scan_dir_dic[scan_dir] = (part_name, part_case_dir)
+
+        # 多个子系统目录在线程池中并发遍历，先遍历完成的子系统可以先进行过滤
+        for scan_dir, suite_file in iter_dir_file_list(
+                list(scan_dir_dic.keys()), list_func=suite_index.get_file_list):
+            part_name, part_case_dir = scan_dir_dic.get(scan_dir)
+            # 如果文件在resource目录下面，需要过滤
+            if -1 != suite_file.replace(test_case_out_path, "").find(
+                    os.sep + "resource" + os.sep):
                 continue
 
-            # 如果子系统在fiter_config.xml配置文件的<subsystem_name>下面配置过，则过滤
-            if part_name in filter_part_list:
+            file_name = os.path.basename(suite_file)
+            if selection_plan.is_file_filtered(file_name):
                 continue
 
-            # 获取子系统目录下面的所有文件路径列表
-            suite_file_list = get_file_list_by_postfix(part_case_dir)
-            for suite_file in suite_file_list:
-                # 如果文件在resource目录下面，需要过滤
-                if -1 != suite_file.replace(test_case_out_path, "").find(
-                        os.sep + "resource" + os.sep):
-                    continue
+            prefix_name, suffix_name = os.path.splitext(file_name)
+            if suffix_name in FILTER_SUFFIX_NAME_LIST:
+                continue
 
-                file_name = os.path.basename(suite_file)
-                # 如果文件在fiter_config.xml配置文件的<testfile_name>下面配置过，则过滤
-                if file_name in filter_list_test_file:
-                    continue
+            testcase_list = []
+            level = ""
+            if testcase_json_dic:
+                part_test_dic = testcase_json_dic.get(part_name, {})
+                if "level" in part_test_dic.keys():
+                    level = part_test_dic.pop("level", "")
 
-                prefix_name, suffix_name = os.path.splitext(file_name)
-                if suffix_name in FILTER_SUFFIX_NAME_LIST:
+                module_name = suite_file.replace(part_case_dir, "").replace(
+                    "\\", "/").strip("/").split("/")[0]
+
+                if part_test_dic and module_name not in part_test_dic:
                     continue
 
-                testcase_list = []
-                level = ""
-                if testcase_json_dic:
-                    part_test_dic = testcase_json_dic.get(part_name, {})
-                    if "level" in part_test_dic.keys():
-                        level = part_test_dic.pop("level", "")
+                module_test_dic = part_test_dic.get(module_name, {})
+                if "level" in module_test_dic.keys():
+                    level = module_test_dic.pop("level", "")
 
-                    module_name = suite_file.replace(part_case_dir, "").replace(
-                        "\\", "/").strip("/").split("/")[0]
+                if module_test_dic and prefix_name not in module_test_dic:
+                    continue
 
-                    if part_test_dic and module_name not in part_test_dic:
-                        continue
+                if suffix_name not in [".dex", ".hap", ".py", ".bin", ""]:
+                    continue
 
-                    module_test_dic = part_test_dic.get(module_name, {})
-                    if "level" in module_test_dic.keys():
-                        level = module_test_dic.pop("level", "")
+                if module_test_dic and module_test_dic.get(prefix_name):
+                    testcase_list = module_test_dic.get(prefix_name).get("testcase", [])
+                    if not testcase_list:
+                        level = module_test_dic.get(prefix_name).get("level", "")
 
-                    if module_test_dic and prefix_name not in module_test_dic:
-                        continue
+                if level in ["0", "1", "2", "3", "4"]:
+                    test_level_dict[suite_file] = level
+            else:
+                if not selection_plan.is_valid_suite_file(test_case_out_path,
+                                                          suite_file):
+                    continue
 
-                    if suffix_name not in [".dex", ".hap", ".py", ".bin", ""]:
+            if suffix_name == ".dex":
+                if testcase_list:
+                    testcase_dict["DEX"][prefix_name] = ":".join(testcase_list)
+                yield "DEX", suite_file
+            elif suffix_name == ".hap":
+                hap_metadata = hap_metadata_cache.get_metadata(suite_file)
+                if hap_metadata.driver_type == "OHJSUnitTest":
+                    if not selection_plan.is_stage_part_matched(hap_metadata.part_name):
                         continue
-
-                    if module_test_dic and module_test_dic.get(prefix_name):
-                        testcase_list = module_test_dic.get(prefix_name).get("testcase", [])
-                        if not testcase_list:
-                            level = module_test_dic.get(prefix_name).get("level", "")
-
-                    if level in ["0", "1", "2", "3", "4"]:
-                        test_level_dict[suite_file] = level
-                else:
-                    if not self.get_valid_suite_file(test_case_out_path,
-                                                    suite_file,
-                                                    options):
+                    if not selection_plan.is_stage_suite_matched(prefix_name):
                         continue
-
-                if suffix_name == ".dex":
-                    suite_file_dictionary.get("DEX").append(suite_file)
-                    if testcase_list:
-                        testcase_dict["DEX"][prefix_name] = ":".join(testcase_list)
-                elif suffix_name == ".hap":
-                    if self.get_hap_test_driver(suite_file) == "OHJSUnitTest":
-                        # 如果stage测试指定了-tp，只有部件名与moduleInfo中part一致的HAP包才会加入最终执行的队列
-                        if options.testpart != [] and options.testpart[0] != self.get_part_name_test_file(
-                                suite_file):
-                            continue
-                        # 如果stage测试指定了-ts，只有完全匹配的HAP包才会加入最终执行的队列
-                        if options.testsuit != "":
-                            testsuit_list = options.testsuit.split(";")
-                            is_match = False
-                            for suite_item in testsuit_list:
-                                if suite_item == prefix_name:
-                                    is_match = True
-                                    break
-                            if not is_match:
-                                continue
-                        if not self.check_hap_test_file(suite_file):
-                            continue
-
-                        suite_file_dictionary.get("OHJST").append(suite_file)
-                        if testcase_list:
-                            testcase_dict["OHJST"][prefix_name] = ":".join(testcase_list)
-                    if self.get_hap_test_driver(suite_file) == "JSUnitTest":
-                        suite_file_dictionary.get("JST").append(suite_file)
-                        if testcase_list:
-                            testcase_dict["JST"][prefix_name] = ":".join(testcase_list)
-                elif suffix_name == ".py":
-                    if not self.check_python_test_file(suite_file):
+                    if not hap_metadata.has_test_file:
                         continue
 
-                    suite_file_dictionary.get("PYT").append(suite_file)
-                    if testcase_list:
-                        testcase_dict["PYT"][prefix_name] = ":".join(testcase_list)
-                elif suffix_name == "":
-                    if file_name.startswith("rust_"):
-                        Binder.get_tdd_config().update_test_type_in_source(
-                            "OHRust", DeviceTestType.oh_rust_test)
-                        suite_file_dictionary.get("OHRust").append(suite_file)
-                        if testcase_list:
-                            testcase_dict["OHRust"][prefix_name] = ":".join(testcase_list)
-                    else:
-                        suite_file_dictionary.get("CXX").append(suite_file)
-                        if testcase_list:
-                            testcase_dict["CXX"][prefix_name] = ":".join(testcase_list)
-                elif suffix_name == ".bin":
-                    suite_file_dictionary.get("BIN").append(suite_file)
                     if testcase_list:
-                        testcase_dict["BIN"][prefix_name] = ":".join(testcase_list)
-                # 将arktstdd的测试文件加入测试文件字典
-                elif (suffix_name == ".abc" and not os.path.dirname(suite_file).endswith("out")
-                    and not os.path.dirname(suite_file).endswith("hypium")):
-                    suite_file_dictionary.get("ABC").append(suite_file)
+                        testcase_dict["OHJST"][prefix_name] = ":".join(testcase_list)
+                    yield "OHJST", suite_file
+                if hap_metadata.driver_type == "JSUnitTest":
                     if testcase_list:
-                        testcase_dict["ABC"][prefix_name] = ":".join(testcase_list)
-        
-        if "testcase_dict" in vars(options) and "test_level_dict" in vars(options):
-            testcase_dict.update(options.testcase_dict)
-            test_level_dict.update(options.test_level_dict)
+                        testcase_dict["JST"][prefix_name] = ":".join(testcase_list)
+                    yield "JST", suite_file
+            elif suffix_name == ".py":
+                if not self.check_python_test_file(suite_file):
+                    continue
 
-        options.testcase_dict = testcase_dict
-        options.test_level_dict = test_level_dict
-        return suite_file_dictionary
+                if testcase_list:
+                    testcase_dict["PYT"][prefix_name] = ":".join(testcase_list)
+                yield "PYT", suite_file
+            elif suffix_name == "":
+                if file_name.startswith("rust_"):
+                    Binder.get_tdd_config().update_test_type_in_source(
+                        "OHRust", DeviceTestType.oh_rust_test)
+                    if testcase_list:
+                        testcase_dict["OHRust"][prefix_name] = ":".join(testcase_list)
+                    yield "OHRust", suite_file
+                else:
+                    if testcase_list:
+                        testcase_dict["CXX"][prefix_name] = ":".join(testcase_list)
+                    yield "CXX", suite_file
+            elif suffix_name == ".bin":
+                if testcase_list:
+                    testcase_dict["BIN"][prefix_name] = ":".join(testcase_list)
+                yield "BIN", suite_file
+            # 将arktstdd的测试文件加入测试文件字典
+            elif (suffix_name == ".abc" and not os.path.dirname(suite_file).endswith("out")
+                and not os.path.dirname(suite_file).endswith("hypium")):
+                if testcase_list:
+                    testcase_dict["ABC"][prefix_name] = ":".join(testcase_list)
+                yield "ABC", suite_file
+
+        suite_index.save()
+        hap_metadata_cache.save()
 
     def get_part_deps_files(self, external_deps_path, testpart):
         LOG.info("external_deps_path:" + external_deps_path)
@@ -409,7 +464,9 @@ class TestCaseManager(object):
         
     def check_xts_config_match(self, options, prefix_name, xts_suite_file):
         # 如果xts测试指定了-tp，只有部件名与moduleInfo中part一致的文件才会加入最终执行的队列
-        if options.testpart != [] and options.testpart[0] != self.get_part_name_test_file(xts_suite_file):
+        part_name = self.get_hap_metadata_cache(options).get_metadata(
+            xts_suite_file).part_name
+        if options.testpart != [] and options.testpart[0] != part_name:
             return False
         # 如果xts测试指定了-ts，只有完全匹配的文件才会加入最终执行的队列
         if options.testsuit != "":
@@ -449,14 +506,18 @@ class TestCaseManager(object):
             testcase_json_dic = json.load(open(testcase_json))
 
         # 获取XTS测试用例输出目录下面的所有文件路径列表
-        xts_suite_file_list = get_file_list_by_postfix(xts_test_case_path)
+        suite_index = self.get_suite_index(options)
+        xts_suite_file_list = suite_index.get_file_list(xts_test_case_path)
+        suite_index.save()
+        hap_metadata_cache = self.get_hap_metadata_cache(options)
         for xts_suite_file in xts_suite_file_list:
             file_name = os.path.basename(xts_suite_file)
             prefix_name, suffix_name = os.path.splitext(file_name)
             if not self.check_xts_config_match(options, prefix_name, xts_suite_file):
                 continue
 
-            json_config_part = self.get_part_name_test_file(xts_suite_file)
+            hap_metadata = hap_metadata_cache.get_metadata(xts_suite_file)
+            json_config_part = hap_metadata.part_name
             level = ""
             testcase_list = []
             if testcase_json_dic:
@@ -491,15 +552,16 @@ class TestCaseManager(object):
                     if testcase_list:
                         testcase_dict["CXX"][prefix_name] = ",".join(testcase_list)
             elif suffix_name == ".hap":
-                if self.get_hap_test_driver(xts_suite_file) == "OHJSUnitTest":
+                if hap_metadata.driver_type == "OHJSUnitTest":
                     xts_suit_file_dic.get("OHJST").append(xts_suite_file)
                     if testcase_list:
                         testcase_dict["OHJST"][prefix_name] = ",".join(testcase_list)
-                if self.get_hap_test_driver(xts_suite_file) == "JSUnitTest":
+                if hap_metadata.driver_type == "JSUnitTest":
                     xts_suit_file_dic.get("JST").append(xts_suite_file)
                     if testcase_list:
                         testcase_dict["JST"][prefix_name] = ",".join(testcase_list)
 
+        hap_metadata_cache.save()
         options.testcase_dict = testcase_dict
         options.test_level_dict = test_level_dict
         return xts_suit_file_dic
@@ -21,6 +21,7 @@ import os
 import platform
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from core.config.config_manager import UserConfigManager, FrameworkConfigManager
 
 
@@ -52,15 +53,43 @@ def get_file_list(find_path, postfix=""):
 
 # 获取目录下每一个文件，并放到一个列表里
 def get_file_list_by_postfix(path, postfix=""):
-    file_list = []
-    for dirs in os.walk(path):
-        files = get_file_list(find_path=dirs[0], postfix=postfix)
-        for file_name in files:
-            if "" != file_name and -1 == file_name.find(__file__):
-                file_name = os.path.join(dirs[0], file_name)
-                if os.path.isfile(file_name):
-                    file_list.append(file_name)
-    return file_list
+    return list(iter_file_list_by_postfix(path, postfix))
+
+
+# 基于os.scandir遍历目录，逐个返回以postfix结尾的文件，遍历顺序与os.walk自顶向下一致
+def iter_file_list_by_postfix(path, postfix=""):
+    sub_dir_list = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    sub_dir_list.append(entry.path)
+                elif entry.name.endswith(postfix) and entry.is_file():
+                    yield entry.path
+    except OSError:
+        return
+    for sub_dir in sub_dir_list:
+        yield from iter_file_list_by_postfix(sub_dir, postfix)
+
+
+# 在线程池中并发遍历多个目录，按path_list的顺序返回(目录, 文件路径)
+# 前面的目录遍历完成即可返回结果，调用方无需等待全部目录遍历结束
+def iter_dir_file_list(path_list, postfix="", list_func=None, max_workers=8):
+    if list_func is None:
+        def list_func(path):
+            return get_file_list_by_postfix(path, postfix)
+
+    if len(path_list) <= 1:
+        for path in path_list:
+            for file_path in list_func(path):
+                yield path, file_path
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(list_func, path_list)
+        for path, file_list in zip(path_list, results):
+            for file_path in file_list:
+                yield path, file_path
 
 
 def get_device_log_file(report_path, serial=None, log_name="device_log"):